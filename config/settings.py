@@ -49,21 +49,112 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'first_app.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'first_app.profiling.QueryProfilerMiddleware',
+    'first_app.routers.ReplicaRoutingMiddleware',
 ]
 
 REST_FRAMEWORK = {
     # 'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     # 'DEFAULT_PAGINATION_CLASS': 'first_app.pagination.MyCursorPagination',
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    # 'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_PAGINATION_CLASS': 'first_app.pagination.CachedCountPagination',
     'PAGE_SIZE': 2,
+    'DEFAULT_RENDERER_CLASSES': [
+        'first_app.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'first_app.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# JSON через orjson (first_app/renderers.py, first_app/parsers.py); без orjson - стандартный json
+FAST_JSON = env.bool('FAST_JSON', default=True)
+
+# Сжатие ответов API (first_app/compression.py): brotli (если установлен) или gzip,
+# только для тел не меньше API_COMPRESSION_MIN_SIZE байт; потоковая выгрузка сжимается всегда
+API_COMPRESSION = env.bool('API_COMPRESSION', default=True)
+API_COMPRESSION_MIN_SIZE = env.int('API_COMPRESSION_MIN_SIZE', default=1024)
+API_COMPRESSION_GZIP_LEVEL = env.int('API_COMPRESSION_GZIP_LEVEL', default=6)
+API_COMPRESSION_BROTLI_QUALITY = env.int('API_COMPRESSION_BROTLI_QUALITY', default=5)
+
+# Подсчёт в постраничной выдаче (first_app.pagination.CachedCountPagination), клиент может выбрать ?count=:
+# exact - COUNT(*) на каждый запрос, cached - из кэша по набору фильтров, estimated - оценка, none - без count
+PAGINATION_COUNT_MODE = env.str('PAGINATION_COUNT_MODE', default='cached')
+PAGINATION_COUNT_CACHE_TIMEOUT = env.int('PAGINATION_COUNT_CACHE_TIMEOUT', default=60)
+# Предел COUNT(*) для режима estimated на базах без оценки по плану запроса (SQLite)
+PAGINATION_COUNT_ESTIMATE_LIMIT = env.int('PAGINATION_COUNT_ESTIMATE_LIMIT', default=10000)
+
+# Фасеты /books/?facets=...: сколько значений отдавать для publisher/genre/author
+# и верхние границы ценовых диапазонов (последний диапазон - от последней границы и выше)
+BOOKS_FACET_LIMIT = env.int('BOOKS_FACET_LIMIT', default=20)
+BOOKS_PRICE_BUCKETS = env.list('BOOKS_PRICE_BUCKETS', cast=int, default=[50, 100, 200, 500])
+
+# Пагинация /books/ по умолчанию: 'page' (номер страницы) или 'cursor' (keyset по published_date, id)
+BOOKS_PAGINATION = env.str('BOOKS_PAGINATION', default='page')
+
+# max-age для ответов с ETag/Last-Modified; 0 - клиент всегда перепроверяет данные условным запросом
+CONDITIONAL_GET_MAX_AGE = env.int('CONDITIONAL_GET_MAX_AGE', default=0)
+
+# Admission control (first_app/admission.py): пулы дорогих представлений. CONCURRENCY запросов пула
+# выполняются одновременно, ещё QUEUE ждут места до QUEUE_TIMEOUT секунд, остальным - 503 с Retry-After
+ADMISSION_CONTROL = {
+    'ENABLED': env.bool('ADMISSION_CONTROL', default=True),
+    'QUEUE_TIMEOUT': env.float('ADMISSION_QUEUE_TIMEOUT', default=2),
+    'RETRY_AFTER': env.int('ADMISSION_RETRY_AFTER', default=1),
+    # С какого OFFSET страница /books/ считается глубокой и попадает в пул BookListCreateView
+    'DEEP_PAGE_OFFSET': env.int('ADMISSION_DEEP_PAGE_OFFSET', default=5000),
+    'POOLS': {
+        'ExpensiveBooksView': {
+            'CONCURRENCY': env.int('ADMISSION_EXPENSIVE_CONCURRENCY', default=4),
+            'QUEUE': env.int('ADMISSION_EXPENSIVE_QUEUE', default=16),
+        },
+        'GenreViewSet': {
+            'CONCURRENCY': env.int('ADMISSION_GENRE_STATISTIC_CONCURRENCY', default=2),
+            'QUEUE': env.int('ADMISSION_GENRE_STATISTIC_QUEUE', default=8),
+        },
+        'BookListCreateView': {
+            'CONCURRENCY': env.int('ADMISSION_BOOK_LIST_CONCURRENCY', default=8),
+            'QUEUE': env.int('ADMISSION_BOOK_LIST_QUEUE', default=32),
+        },
+    },
+}
+
+# Кэш Django: средняя цена, счётчики страниц, представления книг. По умолчанию - LocMemCache, он свой
+# у каждого процесса; если процессов несколько, нужен общий кэш (например, CACHE_URL=redis://...)
+CACHES = {
+    'default': env.cache_url('CACHE_URL', default='locmemcache://?max_entries=10000'),
+}
+
+# Кэш представления книги для GET /books/<pk>/ (first_app/cache.py, get_cached_book), сбрасывается при записи
+BOOK_CACHE = env.bool('BOOK_CACHE', default=True)
+BOOK_CACHE_TIMEOUT = env.int('BOOK_CACHE_TIMEOUT', default=600)
+
+# Сколько id можно запросить одним GET /books/batch/?ids=...
+BOOKS_BATCH_MAX_IDS = env.int('BOOKS_BATCH_MAX_IDS', default=100)
+
+# Время жизни закэшированной средней цены для /books/expensive/ (сбрасывается при изменении книг)
+AVERAGE_PRICE_CACHE_TIMEOUT = env.int('AVERAGE_PRICE_CACHE_TIMEOUT', default=300)
+
+# Полнотекстовый поиск для /books/?search= (FTS5 в SQLite, FULLTEXT в MySQL); False - поиск через LIKE
+FULLTEXT_SEARCH = env.bool('FULLTEXT_SEARCH', default=True)
+
+# Пакетная загрузка книг через POST /books/ (массив JSON или NDJSON)
+BOOKS_BULK_MAX_ITEMS = env.int('BOOKS_BULK_MAX_ITEMS', default=50000)
+BOOKS_BULK_BATCH_SIZE = env.int('BOOKS_BULK_BATCH_SIZE', default=500)
+
+# Размер порции строк при потоковой выгрузке каталога (/books/export.ndjson, /books/export.csv, export_books)
+BOOKS_EXPORT_CHUNK_SIZE = env.int('BOOKS_EXPORT_CHUNK_SIZE', default=2000)
+
 ROOT_URLCONF = 'config.urls'
 
 
@@ -106,10 +197,49 @@ else:
     DATABASES = {
         'default': {
             'ENGINE': 'django.db.backends.sqlite3',
-            'NAME': BASE_DIR / 'db.sqlite3',
+            'NAME': env.str('SQLITE_PATH', default=BASE_DIR / 'db.sqlite3'),  # Отдельный файл, например, для бенчмарков
         },
     }
 
+    # Профиль 'concurrent': WAL (читатели не ждут писателя), synchronous=NORMAL, mmap и увеличенный
+    # кэш страниц; запись идёт через одного писателя (first_app/backends/sqlite3), остальные ждут
+    # в очереди до SQLITE_BUSY_TIMEOUT секунд вместо мгновенного 'database is locked'
+    SQLITE_CONCURRENT_ENGINE = 'first_app.backends.sqlite3'
+    SQLITE_CONCURRENT_OPTIONS = {
+        'timeout': env.float('SQLITE_BUSY_TIMEOUT', default=20),
+        'transaction_mode': 'IMMEDIATE',
+        'init_command': ';'.join([
+            'PRAGMA journal_mode=WAL',
+            f"PRAGMA synchronous={env.str('SQLITE_SYNCHRONOUS', default='NORMAL')}",
+            f"PRAGMA mmap_size={env.int('SQLITE_MMAP_SIZE', default=256 * 1024 * 1024)}",
+            # Отрицательное значение - размер в КиБ, а не в страницах
+            f"PRAGMA cache_size=-{env.int('SQLITE_CACHE_SIZE_KB', default=64 * 1024)}",
+            'PRAGMA temp_store=MEMORY',
+        ]),
+    }
+    if env.str('SQLITE_PROFILE', default='default') == 'concurrent':
+        DATABASES['default'].update({'ENGINE': SQLITE_CONCURRENT_ENGINE, 'OPTIONS': SQLITE_CONCURRENT_OPTIONS})
+
+# Реплики для чтения (first_app/routers.py): для MySQL - хосты через запятую в DB_REPLICA_HOSTS,
+# для SQLite - пути к файлам в SQLITE_REPLICA_PATHS (копию основной базы делает `manage.py sync_sqlite_replicas`)
+if env.bool('MYSQL', default=False):
+    for number, host in enumerate(env.list('DB_REPLICA_HOSTS', default=[]), start=1):
+        DATABASES[f'replica_{number}'] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+else:
+    for number, path in enumerate(env.list('SQLITE_REPLICA_PATHS', default=[]), start=1):
+        DATABASES[f'replica_{number}'] = {**DATABASES['default'], 'NAME': path, 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['first_app.routers.ReplicaRouter']
+
+# Тестовые SQLite-базы создаются из снимка схемы, миграции прогоняются только при их изменении
+# (first_app/testing.py); TEST_DB_SNAPSHOT=False - обычное создание через migrate
+TEST_RUNNER = 'first_app.testing.SnapshotTestRunner'
+TEST_DB_SNAPSHOT = env.bool('TEST_DB_SNAPSHOT', default=True)
+TEST_DB_SNAPSHOT_DIR = env.str('TEST_DB_SNAPSHOT_DIR', default=BASE_DIR / '.test_db_snapshots')
+
+# Сколько секунд после записи клиент читает с основной базы (read-your-writes)
+REPLICA_STICKY_SECONDS = env.int('REPLICA_STICKY_SECONDS', default=5)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -152,6 +282,19 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Профилировщик SQL-запросов (first_app/profiling.py): выборочно, без блокирующего I/O на пути запроса;
+# при ENABLED=False middleware не встаёт в цепочку.
+# Собранные данные выводит команда `python manage.py query_profile`.
+QUERY_PROFILER = {
+    'ENABLED': env.bool('QUERY_PROFILER', default=False),
+    'SAMPLE_RATE': env.float('QUERY_PROFILER_SAMPLE_RATE', default=0.1),  # Доля профилируемых запросов
+    'SLOW_QUERY_MS': env.float('QUERY_PROFILER_SLOW_QUERY_MS', default=100),
+    'DUPLICATE_THRESHOLD': env.int('QUERY_PROFILER_DUPLICATE_THRESHOLD', default=3),  # Повторов для пометки N+1
+    'BUFFER_SIZE': env.int('QUERY_PROFILER_BUFFER_SIZE', default=1000),  # Профилей в кольцевом буфере процесса
+    'FLUSH_INTERVAL': env.int('QUERY_PROFILER_FLUSH_INTERVAL', default=5),  # Секунд между сбросами буфера в файл
+    'DUMP_DIR': env.str('QUERY_PROFILER_DUMP_DIR', default=os.path.join(BASE_DIR, 'query_profiles')),
+}
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
@@ -160,16 +303,23 @@ LOGGING = {
             'level': 'DEBUG',
             'class': 'logging.StreamHandler',
         },
-        'file': {
-            'level': 'DEBUG',
-            'class': 'logging.FileHandler',
-            'filename': os.path.join(BASE_DIR, 'db.log'),  # Путь к файлу логов
+        'query_profiler': {
+            'level': 'INFO',
+            'class': 'first_app.profiling.ProfilerQueueHandler',
         },
     },
     'loggers': {
-        'django.db.backends': {
-            'handlers': ['console', 'file'],
-            'level': 'DEBUG',
+        'first_app.query_profiler': {
+            'handlers': ['query_profiler'],
+            'level': 'INFO',
+            'propagate': False,
         },
     },
 }
+
+# Построчный лог всех SQL-запросов в консоль - только для локальной отладки
+if env.bool('SQL_CONSOLE_LOG', default=False):
+    LOGGING['loggers']['django.db.backends'] = {
+        'handlers': ['console'],
+        'level': 'DEBUG',
+    }
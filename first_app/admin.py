@@ -1,16 +1,88 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 # Register your models here.
 from first_app.models import Book, Publisher, Author # Post
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import Group
-from .models.book import CustomUser
+from .models.book import CustomUser, Genre
+from .pagination import EstimatedCountPaginator
 
 
 admin.site.register(CustomUser)
 admin.site.unregister(Group)
 admin.site.register(Group)
-admin.site.register(Publisher)
-admin.site.register(Book)
-admin.site.register(Author)
+
+
+# Поиск только по префиксу (^): LIKE 'abc%' может использовать индекс, '%abc%' - всегда полный просмотр.
+# show_full_result_count = False убирает второй COUNT(*) по всей таблице на каждой странице списка.
+
+@admin.register(Publisher)
+class PublisherAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'established_date')
+    search_fields = ('^name',)
+    ordering = ('name', 'id')
+    show_full_result_count = False
+
+
+@admin.register(Author)
+class AuthorAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name')
+    search_fields = ('^name',)
+    ordering = ('name', 'id')
+    show_full_result_count = False
+
+
+@admin.register(Genre)
+class GenreAdmin(admin.ModelAdmin):
+    # Нужен для autocomplete_fields у книги
+    list_display = ('id', 'name', 'book_count')
+    search_fields = ('name',)
+    ordering = ('name',)
+
+
+@admin.register(Book)
+class BookAdmin(admin.ModelAdmin):
+    list_display = ('id', 'title', 'author', 'publisher', 'published_date', 'price', 'is_banned', 'is_deleted')
+    list_select_related = ('publisher', 'author')
+    list_filter = ('is_deleted', 'is_banned')
+    # Префиксный поиск по title обслуживает индекс title_auth_index (title, author)
+    search_fields = ('^title',)
+    # Обе колонки в одном направлении - список читается по pub_date_id_index без сортировки
+    ordering = ('-published_date', '-id')
+    autocomplete_fields = ('publisher', 'author', 'genres')
+    readonly_fields = ('updated_at', 'deleted_at')
+    show_full_result_count = False
+    # Вместо COUNT(*) по всей выборке - оценка (на SQLite - COUNT с ограничением),
+    # точный COUNT - только для страниц дальше оценки
+    paginator = EstimatedCountPaginator
+    actions = ('soft_delete_selected', 'restore_selected', 'ban_selected', 'unban_selected')
+
+    def get_queryset(self, request):
+        # Удалённые книги тоже видны, иначе их нельзя восстановить
+        return Book.all_objects.all()
+
+    def get_actions(self, request):
+        # Стандартное удаление грузит все объекты и их связи для страницы подтверждения
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def report(self, request, updated, verb):
+        self.message_user(request, f'{updated} book(s) {verb}.', messages.SUCCESS)
+
+    @admin.action(description='Soft delete selected books', permissions=['change'])
+    def soft_delete_selected(self, request, queryset):
+        self.report(request, queryset.soft_delete(), 'deleted')
+
+    @admin.action(description='Restore selected books', permissions=['change'])
+    def restore_selected(self, request, queryset):
+        self.report(request, queryset.restore(), 'restored')
+
+    @admin.action(description='Ban selected books', permissions=['change'])
+    def ban_selected(self, request, queryset):
+        self.report(request, queryset.set_banned(True), 'banned')
+
+    @admin.action(description='Unban selected books', permissions=['change'])
+    def unban_selected(self, request, queryset):
+        self.report(request, queryset.set_banned(False), 'unbanned')
 #admin.site.register(Post)
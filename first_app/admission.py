@@ -0,0 +1,216 @@
+"""
+Admission control: ограничение числа одновременно выполняющихся дорогих запросов.
+
+У каждого ограниченного представления свой пул (по умолчанию - имя класса представления,
+настройки - ADMISSION_CONTROL['POOLS']): не больше CONCURRENCY запросов выполняются
+одновременно, ещё до QUEUE ждут своей очереди (FIFO) не дольше QUEUE_TIMEOUT секунд.
+Остальные сразу получают 503 с Retry-After - при всплеске дорогие запросы не копятся
+в базе и не тянут за собой дешёвые, которые в пулы не входят.
+
+Для DRF-представлений место в пуле занимает ConcurrencyThrottle (обычный хук throttle_classes),
+освобождается оно после ответа в AdmissionControlMixin.dispatch(). async-представления
+используют admission() как async-контекст. Счётчики пулов - в admission_stats(),
+они свои у каждого процесса.
+"""
+import asyncio
+import contextlib
+import threading
+from collections import deque
+
+from django.conf import settings
+from rest_framework.exceptions import Throttled
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+
+class ServiceOverloaded(Throttled):
+    status_code = 503
+    default_detail = 'Server is busy, try again later.'
+    default_code = 'overloaded'
+
+
+class ConcurrencyLimiter:
+    """
+    Семафор с ограниченной очередью ожидания для потоков и корутин.
+
+    Освободившееся место передаётся первому ожидающему напрямую (active не уменьшается),
+    поэтому новый запрос не обгоняет очередь. Чьё место - решается под замком по тому,
+    остался ли ожидающий в очереди: так таймаут и передача места не могут разминуться.
+    """
+
+    def __init__(self, name, concurrency, queue_size, timeout):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._waiters = deque()
+        self.active = 0
+        self.admitted = 0
+        self.queued = 0
+        self.shed = 0
+        self.timed_out = 0
+        self.max_queue_depth = 0
+
+    def _enter_or_enqueue(self, wake):
+        """True - место занято сразу, False - очередь полна, иначе - ожидающий в очереди."""
+        with self._lock:
+            if self.active < self.concurrency and not self._waiters:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if len(self._waiters) >= self.queue_size:
+                self.shed += 1
+                return False
+            waiter = [wake]
+            self._waiters.append(waiter)
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, len(self._waiters))
+            return waiter
+
+    def _leave_queue(self, waiter):
+        """После таймаута или отмены: True, если место всё же успели передать."""
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                self.timed_out += 1
+                self.shed += 1
+                return False
+            return True
+
+    def acquire(self):
+        event = threading.Event()
+        waiter = self._enter_or_enqueue(event.set)
+        if isinstance(waiter, bool):
+            return waiter
+        if event.wait(self.timeout):
+            return True
+        return self._leave_queue(waiter)
+
+    async def aacquire(self):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = self._enter_or_enqueue(wake)
+        if isinstance(waiter, bool):
+            return waiter
+        try:
+            await asyncio.wait_for(future, self.timeout)
+            return True
+        except asyncio.TimeoutError:
+            return self._leave_queue(waiter)
+        except asyncio.CancelledError:
+            # Клиент ушёл, пока запрос ждал: место, если его уже передали, возвращается в пул
+            if self._leave_queue(waiter):
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft()[0]()
+                self.admitted += 1
+            else:
+                self.active -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'concurrency': self.concurrency,
+                'queue_size': self.queue_size,
+                'active': self.active,
+                'queue_depth': len(self._waiters),
+                'max_queue_depth': self.max_queue_depth,
+                'admitted': self.admitted,
+                'queued': self.queued,
+                'shed': self.shed,
+                'timed_out': self.timed_out,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_config():
+    return settings.ADMISSION_CONTROL
+
+
+def get_limiter(pool):
+    """Пул по имени или None, если ограничение выключено или пул не настроен."""
+    config = get_config()
+    if pool is None or not config['ENABLED'] or pool not in config['POOLS']:
+        return None
+    options = (config['POOLS'][pool]['CONCURRENCY'], config['POOLS'][pool]['QUEUE'], config['QUEUE_TIMEOUT'])
+    with _limiters_lock:
+        limiter = _limiters.get(pool)
+        # Настройки поменялись (override_settings): новые запросы идут в новый пул,
+        # уже вошедшие освободят место в старом
+        if limiter is None or (limiter.concurrency, limiter.queue_size, limiter.timeout) != options:
+            limiter = _limiters[pool] = ConcurrencyLimiter(pool, *options)
+        return limiter
+
+
+def admission_stats():
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.stats() for limiter in limiters}
+
+
+def overloaded():
+    return ServiceOverloaded(wait=get_config()['RETRY_AFTER'])
+
+
+class ConcurrencyThrottle(BaseThrottle):
+    """
+    Throttle DRF, который занимает место в пуле view.get_admission_pool(request).
+    Если места нет, сразу отвечает 503 (ServiceOverloaded), а не 429, как обычный throttle:
+    клиент тут ни при чём, перегружен сервер.
+    """
+
+    def allow_request(self, request, view):
+        limiter = get_limiter(view.get_admission_pool(request))
+        if limiter is None:
+            return True
+        if not limiter.acquire():
+            raise overloaded()
+        request.admission_limiter = limiter
+        return True
+
+
+class AdmissionControlMixin:
+    """
+    Для DRF-представлений: ConcurrencyThrottle после throttle-классов по умолчанию
+    и освобождение места после ответа. get_admission_pool() можно переопределить,
+    чтобы ограничивать только дорогие запросы (None - без ограничения).
+    """
+    throttle_classes = [*api_settings.DEFAULT_THROTTLE_CLASSES, ConcurrencyThrottle]
+
+    def get_admission_pool(self, request):
+        return type(self).__name__
+
+    def dispatch(self, request, *args, **kwargs):
+        # Место освобождается и тогда, когда исключение не обработано DRF (500)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            limiter = getattr(self.request, 'admission_limiter', None)
+            if limiter is not None:
+                self.request.admission_limiter = None
+                limiter.release()
+
+
+@contextlib.asynccontextmanager
+async def admission(view):
+    """async-вариант ConcurrencyThrottle + AdmissionControlMixin для представлений из async_views."""
+    limiter = get_limiter(view.get_admission_pool(view.request))
+    if limiter is not None and not await limiter.aacquire():
+        raise overloaded()
+    try:
+        yield
+    finally:
+        if limiter is not None:
+            limiter.release()
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class FirstAppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'first_app'
+
+    def ready(self):
+        # Подключение обработчиков сигналов
+        from first_app import signals  # noqa: F401
+
+        from django.conf import settings
+        if settings.QUERY_PROFILER['ENABLED']:
+            from first_app.profiling import start_listener
+            start_listener()
@@ -0,0 +1,197 @@
+"""
+Async-версии read-эндпоинтов для запуска под ASGI (uvicorn config.asgi:application).
+
+Фильтры, пагинация и формат ответа те же, что у синхронных представлений из views.py:
+классы представлений используются как источник настроек, а строки читаются через
+async ORM (async for / acount / afirst) и сериализуются RowSerializer'ами. Списки отвечают
+на условные GET (ETag, Last-Modified, 304) так же, как синхронные (conditional.py).
+"""
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed
+from rest_framework.exceptions import APIException
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .admission import admission
+from .cache import aget_average_price, aget_cached_book, aget_cached_books
+from .conditional import abook_collection_version, aconditional_get, agenre_collection_version
+from .facets import acompute_facets, parse_facets
+from .fieldsets import get_requested_fields, select_fields
+from .models.book import Book, Genre
+from .serializers import BookRowSerializer, BookSerializer, GenreRowSerializer
+from .views import (BookBatchView, BookListCreateView, BookDetailUpdateDeleteView, ExpensiveBooksView, GenreViewSet,
+                    get_date_range, book_not_found, is_discounted)
+
+# Параметры, при которых фильтрация обращается к БД ещё до выполнения запроса
+# (ModelChoiceFilter проверяет publisher, полнотекстовый поиск проверяет наличие индекса).
+# author фильтруется по имени через JOIN и в БД заранее не ходит
+SYNC_FILTER_PARAMS = {'publisher', 'search', 'ordering'}
+
+
+def async_api_view(view):
+    """
+    Обёртка для async-представлений: только GET/HEAD, ответ рендерится первым рендерером
+    из DEFAULT_RENDERER_CLASSES, ошибки DRF превращаются в тот же JSON, что отдают синхронные представления.
+    """
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        status, retry_after = 200, None
+        try:
+            data = await view(Request(request), *args, **kwargs)
+        except Http404:
+            data, status = {'detail': 'Not found.'}, 404
+        except APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            status = exc.status_code
+            # Как в APIView.handle_exception: 429/503 с подсказкой, когда повторить
+            if getattr(exc, 'wait', None):
+                retry_after = '%d' % exc.wait
+        renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+        response = HttpResponse(renderer.render(data), status=status, content_type='application/json')
+        if retry_after is not None:
+            response['Retry-After'] = retry_after
+        return response
+
+    return wrapper
+
+
+def make_view(view_class, request, **kwargs):
+    view = view_class(request=request, format_kwarg=None, args=(), kwargs=kwargs)
+    view.headers = {}
+    return view
+
+
+async def filter_queryset(view, queryset):
+    if SYNC_FILTER_PARAMS.intersection(view.request.query_params):
+        # В общем потоке ORM: у отдельных потоков пула свои соединения, которые по request_finished не закрываются
+        return await sync_to_async(view.filter_queryset)(queryset)
+    return view.filter_queryset(queryset)
+
+
+async def paginated_rows(view, serializer, queryset, facets=()):
+    paginator = view.paginator
+    page = await paginator.apaginate_queryset(serializer.get_queryset(queryset), view.request, view)
+    if page is None:
+        return await serializer.ato_representation_many(serializer.get_queryset(queryset))
+    data = paginator.get_paginated_response(await serializer.ato_representation_many(page)).data
+    if facets:
+        data['facets'] = await acompute_facets(queryset, facets)
+    return data
+
+
+@aconditional_get(abook_collection_version)
+@async_api_view
+async def book_list_view(request):
+    view = make_view(BookListCreateView, request)
+    serializer = view.get_row_serializer()
+    facets = parse_facets(view.request.query_params.get('facets'))
+    async with admission(view):
+        queryset = await filter_queryset(view, view.get_queryset())
+        return await paginated_rows(view, serializer, queryset, facets)
+
+
+async def abuild_book_entries(pks):
+    # Те же записи кэша, что у views.build_book_entries()
+    serializer = BookRowSerializer(key_columns=('id', 'price', 'discounted_price', 'updated_at'))
+    queryset = Book.objects.using(DEFAULT_DB_ALIAS).filter(pk__in=pks, is_banned=False)
+    rows = [row async for row in serializer.get_queryset(queryset)]
+    entries = {}
+    for row, data in zip(rows, await serializer.ato_representation_many(rows)):
+        data['is_discounted'] = is_discounted(row)
+        entries[row.id] = {'data': data, 'updated_at': row.updated_at}
+    return entries
+
+
+@async_api_view
+async def book_detail_view(request, pk):
+    view = make_view(BookDetailUpdateDeleteView, request, pk=pk)
+    if settings.BOOK_CACHE:
+        entry = await aget_cached_book(pk, abuild_book_entries)
+        if entry is None:
+            raise book_not_found(pk)
+        return select_fields(entry['data'], view.get_requested_fields())
+    serializer = BookRowSerializer(context=view.get_serializer_context(),
+                                   key_columns=('id', 'price', 'discounted_price'))
+    row = await serializer.get_queryset(view.queryset.filter(pk=pk, is_banned=False)).afirst()
+    if row is None:
+        raise book_not_found(pk)
+    data = (await serializer.ato_representation_many([row]))[0]
+    fields = view.get_requested_fields()
+    if fields is None or 'is_discounted' in fields:
+        data['is_discounted'] = is_discounted(row)
+    return data
+
+
+@async_api_view
+async def book_batch_view(request):
+    view = make_view(BookBatchView, request)
+    ids = view.get_ids()
+    context = view.get_serializer_context()
+    if settings.BOOK_CACHE and not context['include_related']:
+        entries = await aget_cached_books(ids, abuild_book_entries)
+        return view.batch_response_data(ids, {pk: entry['data'] for pk, entry in entries.items()})
+
+    fields = view.get_requested_fields()
+    serializer = BookRowSerializer(context=context, key_columns=('id', 'price', 'discounted_price'))
+    rows = [row async for row in serializer.get_queryset(Book.objects.filter(pk__in=ids, is_banned=False))]
+    found = {}
+    for row, data in zip(rows, await serializer.ato_representation_many(rows)):
+        if fields is None or 'is_discounted' in fields:
+            data['is_discounted'] = is_discounted(row)
+        found[row.id] = data
+    return view.batch_response_data(ids, found)
+
+
+@async_api_view
+async def expensive_books_view(request):
+    view = make_view(ExpensiveBooksView, request)
+    serializer = view.get_row_serializer()
+    async with admission(view):
+        average_price = await aget_average_price()
+        if average_price is None:
+            queryset = Book.objects.none()
+        else:
+            queryset = Book.objects.filter(price__gt=average_price)
+        return await paginated_rows(view, serializer, queryset)
+
+
+@async_api_view
+async def books_by_date_view(request, year, month=None, day=None):
+    start, end = get_date_range(year, month, day)
+    books = Book.objects.filter(published_date__gte=start, published_date__lt=end)
+    fields = get_requested_fields(request, BookSerializer)
+    serializer = BookRowSerializer(context={'fields': fields} if fields is not None else None)
+    date = '-'.join(part for part in (year, month, day) if part is not None)
+    return {'date': date, 'books': await serializer.ato_representation_many(serializer.get_queryset(books))}
+
+
+@aconditional_get(agenre_collection_version)
+@async_api_view
+async def genre_list_view(request):
+    view = make_view(GenreViewSet, request)
+    view.action = 'list'
+    serializer = GenreRowSerializer(context=view.get_serializer_context())
+    return await paginated_rows(view, serializer, Genre.objects.all())
+
+
+@aconditional_get(agenre_collection_version)
+@async_api_view
+async def genre_statistic_view(request):
+    view = make_view(GenreViewSet, request)
+    view.action = 'statistic'
+    async with admission(view):
+        return [
+            {
+                "id": genre_id,
+                "genre": name,
+                "book_count": book_count
+            }
+            async for genre_id, name, book_count in Genre.objects.values_list('id', 'name', 'book_count')
+        ]
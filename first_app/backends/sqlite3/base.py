@@ -0,0 +1,147 @@
+"""
+SQLite-бэкенд с одним писателем.
+
+SQLite допускает только одну пишущую транзакцию; остальные писатели ждут в busy-обработчике,
+опрашивая блокировку, и при конкуренции получают 'database is locked'. Здесь запись
+сериализуется заранее: транзакция (BEGIN ... COMMIT/ROLLBACK) и одиночный INSERT/UPDATE/DELETE
+в autocommit держат блокировку писателя - threading.Lock внутри процесса и flock на файле
+рядом с базой между процессами (например, воркерами gunicorn). Читатели в WAL-режиме не ждут.
+"""
+import os
+import threading
+import time
+
+from django.db.backends.sqlite3 import base
+from django.db.utils import OperationalError
+
+try:
+    import fcntl
+except ImportError:  # Windows: только блокировка внутри процесса
+    fcntl = None
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLAC')
+
+
+class WriterLock:
+    def __init__(self, path):
+        self.thread_lock = threading.Lock()
+        self.path = f'{path}-writer.lock' if path else None
+        self.file = None
+        self.pid = None
+
+    def acquire(self, timeout):
+        deadline = time.monotonic() + timeout
+        if not self.thread_lock.acquire(timeout=timeout):
+            raise OperationalError('database is locked (writer queue timeout)')
+        if fcntl is None or self.path is None:
+            return
+        if self.pid != os.getpid():
+            # flock привязан к открытому файлу; после fork у процесса должен быть свой дескриптор
+            self.file = open(self.path, 'a')
+            self.pid = os.getpid()
+        delay = 0.001
+        while True:
+            try:
+                fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                if time.monotonic() >= deadline:
+                    self.thread_lock.release()
+                    raise OperationalError('database is locked (writer queue timeout)')
+                time.sleep(delay)
+                delay = min(delay * 2, 0.02)
+
+    def release(self):
+        if fcntl is not None and self.path is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.thread_lock.release()
+
+
+_writer_locks = {}
+_writer_locks_guard = threading.Lock()
+
+
+def get_writer_lock(path):
+    with _writer_locks_guard:
+        if path not in _writer_locks:
+            _writer_locks[path] = WriterLock(path)
+        return _writer_locks[path]
+
+
+class CursorWrapper(base.SQLiteCursorWrapper):
+    def execute(self, query, params=None):
+        with self.db_wrapper.autocommit_write(query):
+            return super().execute(query, params)
+
+    def executemany(self, query, param_list):
+        with self.db_wrapper.autocommit_write(query):
+            return super().executemany(query, param_list)
+
+
+class AutocommitWrite:
+    def __init__(self, wrapper, query):
+        self.wrapper = wrapper
+        self.locked = (not wrapper.writer_lock_held and not wrapper.in_atomic_block
+                       and query.lstrip()[:6].upper() in WRITE_STATEMENTS)
+
+    def __enter__(self):
+        if self.locked:
+            self.wrapper.acquire_writer_lock()
+
+    def __exit__(self, *exc_info):
+        if self.locked:
+            self.wrapper.release_writer_lock()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    writer_lock_held = False
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        self.busy_timeout = params.get('timeout', 5)
+        path = None if self.is_in_memory_db() else os.path.abspath(str(self.settings_dict['NAME']))
+        self.writer_lock = get_writer_lock(path)
+        return params
+
+    def create_cursor(self, name=None):
+        cursor = self.connection.cursor(factory=CursorWrapper)
+        cursor.db_wrapper = self
+        return cursor
+
+    def autocommit_write(self, query):
+        return AutocommitWrite(self, query)
+
+    def acquire_writer_lock(self):
+        self.writer_lock.acquire(self.busy_timeout)
+        self.writer_lock_held = True
+
+    def release_writer_lock(self):
+        if self.writer_lock_held:
+            self.writer_lock_held = False
+            self.writer_lock.release()
+
+    def _start_transaction_under_autocommit(self):
+        self.acquire_writer_lock()
+        try:
+            super()._start_transaction_under_autocommit()
+        except Exception:
+            self.release_writer_lock()
+            raise
+
+    def _commit(self):
+        try:
+            return super()._commit()
+        finally:
+            self.release_writer_lock()
+
+    def _rollback(self):
+        try:
+            return super()._rollback()
+        finally:
+            self.release_writer_lock()
+
+    def _close(self):
+        try:
+            return super()._close()
+        finally:
+            self.release_writer_lock()
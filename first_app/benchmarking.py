@@ -0,0 +1,57 @@
+import os
+import statistics
+import tempfile
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.db import connections
+
+
+def percentile(values, percent):
+    # Ближайший ранг по отсортированной выборке
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def latency_summary(latencies):
+    """min/mean/p50/p95/p99/max в миллисекундах для списка задержек."""
+    if not latencies:
+        return None
+    return {
+        'min': round(min(latencies), 3),
+        'mean': round(statistics.fmean(latencies), 3),
+        'p50': round(percentile(latencies, 50), 3),
+        'p95': round(percentile(latencies, 95), 3),
+        'p99': round(percentile(latencies, 99), 3),
+        'max': round(max(latencies), 3),
+    }
+
+
+@contextmanager
+def temporary_database(engine='django.db.backends.sqlite3', options=None):
+    """
+    Подменяет базу default временной SQLite-базой с применёнными миграциями: бенчмарки
+    засевают её сами и не зависят от данных (и уникальных названий) рабочей базы.
+    После выхода настройки default возвращаются.
+    """
+    database = connections.settings['default']
+    original = dict(database)
+    with tempfile.TemporaryDirectory() as directory:
+        _switch_default(database, {'ENGINE': engine, 'NAME': os.path.join(directory, 'benchmark.sqlite3'),
+                                   'OPTIONS': dict(options or {})})
+        try:
+            call_command('migrate', verbosity=0)
+            yield
+        finally:
+            _switch_default(database, original)
+
+
+def _switch_default(database, values):
+    connections.close_all()
+    database.update(values)
+    # Обёртка соединения создаётся заново уже с новыми настройками
+    if any(connection.alias == 'default' for connection in connections.all(initialized_only=True)):
+        del connections['default']
@@ -0,0 +1,257 @@
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Avg
+from django.utils import timezone
+
+from first_app.models.book import Book
+
+AVERAGE_PRICE_GENERATION_KEY = 'books:average_price:generation'
+
+
+def _new_version():
+    # Случайная метка, а не счётчик: если ключ версии вытеснен из кэша (LocMemCache при MAX_ENTRIES),
+    # новая версия не совпадёт ни с одной старой и не поднимет из кэша устаревшую запись
+    return uuid.uuid4().hex
+
+
+def _generation(key):
+    generation = cache.get(key)
+    if generation is None:
+        # add(), а не set(): параллельный читатель мог уже записать своё поколение
+        candidate = _new_version()
+        cache.add(key, candidate, timeout=None)
+        generation = cache.get(key, candidate)
+    return generation
+
+
+async def _ageneration(key):
+    generation = await cache.aget(key)
+    if generation is None:
+        candidate = _new_version()
+        await cache.aadd(key, candidate, timeout=None)
+        generation = await cache.aget(key, candidate)
+    return generation
+
+
+def _bump_generation(key):
+    cache.set(key, _new_version(), timeout=None)
+
+
+def _average_price_generation():
+    return _generation(AVERAGE_PRICE_GENERATION_KEY)
+
+
+def get_average_price():
+    """
+    Средняя цена живых книг из кэша.
+
+    Значение хранится под ключом с поколением: запись, начавшаяся до
+    инвалидации, попадёт под старый ключ и не перезапишет свежее значение.
+    """
+    key = f'books:average_price:{_average_price_generation()}'
+    average_price = cache.get(key)
+    if average_price is None:
+        # Кэшируемое значение читается с основной базы: значение с отстающей реплики
+        # прожило бы в кэше весь таймаут
+        average_price = Book.objects.using(DEFAULT_DB_ALIAS).aggregate(average_price=Avg('price'))['average_price']
+        cache.set(key, average_price, timeout=settings.AVERAGE_PRICE_CACHE_TIMEOUT)
+    return average_price
+
+
+async def _aaverage_price_generation():
+    return await _ageneration(AVERAGE_PRICE_GENERATION_KEY)
+
+
+async def aget_average_price():
+    """Async-вариант get_average_price() с теми же ключами кэша."""
+    key = f'books:average_price:{await _aaverage_price_generation()}'
+    average_price = await cache.aget(key)
+    if average_price is None:
+        average_price = (await Book.objects.using(DEFAULT_DB_ALIAS)
+                         .aaggregate(average_price=Avg('price')))['average_price']
+        await cache.aset(key, average_price, timeout=settings.AVERAGE_PRICE_CACHE_TIMEOUT)
+    return average_price
+
+
+def invalidate_average_price():
+    _bump_generation(AVERAGE_PRICE_GENERATION_KEY)
+
+
+def _count_generation_key(model):
+    return f'pagination:count:{model._meta.label_lower}:generation'
+
+
+def _count_key(queryset, generation):
+    # Ключ - SQL выборки без сортировки и лишних колонок: одинаковые наборы фильтров дают
+    # одинаковый SQL независимо от порядка параметров в URL
+    sql, params = queryset.order_by().values_list('pk').query.sql_with_params()
+    digest = hashlib.md5(f'{sql}:{params!r}'.encode()).hexdigest()
+    # База в ключе: число с отстающей реплики не отдаётся чтению с основной базы и наоборот
+    return f'pagination:count:{queryset.model._meta.label_lower}:{queryset.db}:{generation}:{digest}'
+
+
+def get_cached_count(queryset):
+    """
+    COUNT(*) выборки из кэша. Как и средняя цена, хранится под ключом с поколением модели,
+    которое сбрасывает invalidate_counts() при записи. Считается на той же базе, что и сама
+    выборка, поэтому queryset должен быть привязан к базе (using) - иначе роутер может выбрать
+    для счётчика и для страницы разные реплики.
+    """
+    key = _count_key(queryset, _generation(_count_generation_key(queryset.model)))
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout=settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+async def aget_cached_count(queryset):
+    key = _count_key(queryset, await _ageneration(_count_generation_key(queryset.model)))
+    count = await cache.aget(key)
+    if count is None:
+        count = await queryset.acount()
+        await cache.aset(key, count, timeout=settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def invalidate_counts(model):
+    _bump_generation(_count_generation_key(model))
+    invalidate_collection(model)
+
+
+def _collection_version_key(model):
+    return f'collection:{model._meta.label_lower}:version'
+
+
+def _new_collection_version():
+    return _new_version(), timezone.now()
+
+
+def get_collection_versions(*models):
+    """
+    Версии коллекций [(метка, время изменения), ...] для ETag и Last-Modified списков: вместо
+    COUNT/MAX(updated_at) по всей таблице на каждый запрос. Меняются в invalidate_collection(),
+    которую вызывают invalidate_counts() и инвалидации книг после коммита записи. Если версия
+    вытеснена из кэша, новая получает текущее время - клиент просто перечитает список.
+    """
+    keys = [_collection_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    missing = {key: _new_collection_version() for key in keys if key not in versions}
+    if missing:
+        # Как в _generation(): add(), чтобы не перебить версию параллельного читателя
+        for key, version in missing.items():
+            cache.add(key, version, timeout=None)
+        versions.update(cache.get_many(missing))
+    return [versions.get(key, missing.get(key)) for key in keys]
+
+
+async def aget_collection_versions(*models):
+    keys = [_collection_version_key(model) for model in models]
+    versions = await cache.aget_many(keys)
+    missing = {key: _new_collection_version() for key in keys if key not in versions}
+    if missing:
+        for key, version in missing.items():
+            await cache.aadd(key, version, timeout=None)
+        versions.update(await cache.aget_many(missing))
+    return [versions.get(key, missing.get(key)) for key in keys]
+
+
+def invalidate_collection(model):
+    cache.set(_collection_version_key(model), _new_collection_version(), timeout=None)
+
+
+BOOKS_VERSION_KEY = 'books:book:version'
+# Запись для книги, которой нет (или она удалена, забанена): повторные запросы таких id тоже не идут в БД.
+# Создание книги меняет её версию (post_save), массовая вставка и восстановление - общую версию
+MISSING_BOOK = 'missing'
+
+
+def _book_version_key(pk):
+    return f'books:book:{pk}:version'
+
+
+def _book_cache_keys(versions, pks):
+    return {pk: f'books:book:{pk}:{versions[BOOKS_VERSION_KEY]}:{versions[_book_version_key(pk)]}' for pk in pks}
+
+
+def _missing_versions(versions, version_keys):
+    # Новая случайная версия только делает недостижимыми записи под прежней, поэтому хватает set_many
+    # без add(): перезапись версии параллельным читателем или инвалидацией устаревшую запись не вернёт
+    return {key: _new_version() for key in version_keys if key not in versions}
+
+
+def get_cached_books(pks, build):
+    """
+    Закэшированные представления книг {pk: запись}: build(pks) вызывается одним пакетом
+    для промахов и возвращает {pk: запись}. Книг, которых нет, в результате нет.
+
+    Ключ записи содержит версию книги и общую версию всех книг, их меняют invalidate_books()
+    и invalidate_all_books() после коммита записи. Чтение, начавшееся до инвалидации,
+    положит результат под старую версию, и его уже никто не прочитает.
+    """
+    version_keys = [BOOKS_VERSION_KEY, *map(_book_version_key, pks)]
+    versions = cache.get_many(version_keys)
+    missing = _missing_versions(versions, version_keys)
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    keys = _book_cache_keys(versions, pks)
+
+    cached = cache.get_many(keys.values())
+    entries = {pk: cached[key] for pk, key in keys.items() if key in cached}
+    misses = [pk for pk in pks if pk not in entries]
+    if misses:
+        built = build(misses)
+        cache.set_many({keys[pk]: built.get(pk, MISSING_BOOK) for pk in misses},
+                       timeout=settings.BOOK_CACHE_TIMEOUT)
+        entries.update(built)
+    return {pk: entry for pk, entry in entries.items() if entry != MISSING_BOOK}
+
+
+async def aget_cached_books(pks, abuild):
+    """Async-вариант get_cached_books() с теми же ключами кэша; abuild - корутина."""
+    version_keys = [BOOKS_VERSION_KEY, *map(_book_version_key, pks)]
+    versions = await cache.aget_many(version_keys)
+    missing = _missing_versions(versions, version_keys)
+    if missing:
+        await cache.aset_many(missing, timeout=None)
+        versions.update(missing)
+    keys = _book_cache_keys(versions, pks)
+
+    cached = await cache.aget_many(keys.values())
+    entries = {pk: cached[key] for pk, key in keys.items() if key in cached}
+    misses = [pk for pk in pks if pk not in entries]
+    if misses:
+        built = await abuild(misses)
+        await cache.aset_many({keys[pk]: built.get(pk, MISSING_BOOK) for pk in misses},
+                              timeout=settings.BOOK_CACHE_TIMEOUT)
+        entries.update(built)
+    return {pk: entry for pk, entry in entries.items() if entry != MISSING_BOOK}
+
+
+def get_cached_book(pk, build):
+    """Одна книга из get_cached_books() или None."""
+    return get_cached_books([pk], build).get(pk)
+
+
+async def aget_cached_book(pk, abuild):
+    return (await aget_cached_books([pk], abuild)).get(pk)
+
+
+def invalidate_books(pks):
+    cache.set_many({_book_version_key(pk): _new_version() for pk in pks}, timeout=None)
+    invalidate_collection(Book)
+
+
+def invalidate_book(pk):
+    invalidate_books([pk])
+
+
+def invalidate_all_books():
+    # Для массовых UPDATE, где перечислять затронутые книги дороже, чем сбросить все записи
+    cache.set(BOOKS_VERSION_KEY, _new_version(), timeout=None)
+    invalidate_collection(Book)
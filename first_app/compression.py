@@ -0,0 +1,160 @@
+"""
+Сжатие ответов API: brotli или gzip по заголовку Accept-Encoding.
+
+Сжимаются только ответы с телом не меньше API_COMPRESSION_MIN_SIZE байт и с типом из
+COMPRESSIBLE_TYPES - на маленьких ответах сжатие стоит дороже, чем экономит. brotli
+используется, если установлен пакет brotli и клиент его принимает, иначе gzip.
+Потоковые ответы (выгрузка /books/export/) сжимаются по мере отдачи, без порога по размеру:
+он заранее неизвестен, а выгрузка обычно большая. Каждая порция выгрузки сбрасывается в
+сжатый поток сразу, чтобы клиент получал данные без ожидания конца ответа.
+"""
+import gzip
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # brotli не обязателен, без него остаётся gzip
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/csv')
+
+
+def parse_accept_encoding(header):
+    """{кодировка: q} из Accept-Encoding; кодировки с q=0 клиент явно не принимает."""
+    encodings = {}
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings[name] = quality
+    return encodings
+
+
+def choose_encoding(header):
+    """'br', 'gzip' или None. При равном q предпочитается brotli - он сжимает JSON заметно лучше."""
+    encodings = parse_accept_encoding(header)
+    available = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_quality = None, 0.0
+    for name in available:
+        quality = encodings.get(name, encodings.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+def compress(content, encoding):
+    if encoding == 'br':
+        return brotli.compress(content, quality=settings.API_COMPRESSION_BROTLI_QUALITY)
+    # mtime=0 - одинаковый результат для одинакового тела
+    return gzip.compress(content, compresslevel=settings.API_COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+class StreamCompressor:
+    """Потоковое сжатие: compress(chunk) отдаёт сжатые байты порции, finish() - хвост потока."""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=settings.API_COMPRESSION_BROTLI_QUALITY)
+        else:
+            # wbits=31 - формат gzip (заголовок с mtime=0 и CRC), как у gzip.compress()
+            self.compressor = zlib.compressobj(settings.API_COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, chunk):
+        if self.encoding == 'br':
+            return self.compressor.process(chunk) + self.compressor.flush()
+        return self.compressor.compress(chunk) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        if self.encoding == 'br':
+            return self.compressor.finish()
+        return self.compressor.flush()
+
+
+def compress_stream(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.finish()
+
+
+async def acompress_stream(chunks, encoding):
+    compressor = StreamCompressor(encoding)
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы API (см. модуль). Стоит в начале MIDDLEWARE, чтобы сжимать уже готовое тело.
+    ETag становится слабым: сжатое и несжатое тела различаются побайтно, а значение ETag
+    вычисляется по версии данных (first_app/conditional.py) и одинаково для обоих.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.API_COMPRESSION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type not in COMPRESSIBLE_TYPES:
+            return response
+
+        # Ответ зависит от Accept-Encoding даже тогда, когда он оказался слишком маленьким для сжатия
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if not response.streaming and len(response.content) < settings.API_COMPRESSION_MIN_SIZE:
+            return response
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = acompress_stream(response.streaming_content, encoding)
+            else:
+                response.streaming_content = compress_stream(response.streaming_content, encoding)
+            del response['Content-Length']
+        else:
+            compressed = compress(response.content, encoding)
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = encoding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,121 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from first_app.cache import aget_collection_versions, get_collection_versions
+from first_app.models.book import Book, Genre
+
+
+def book_collection_version(view, request, *args, **kwargs):
+    # Версии из кэша, их меняют инвалидации после коммита (signals.py, managers.py, ingest.py):
+    # без агрегата по всей таблице книг на каждый запрос списка
+    return _combine_versions(get_collection_versions(Book, Genre))
+
+
+async def abook_collection_version(request, *args, **kwargs):
+    return _combine_versions(await aget_collection_versions(Book, Genre))
+
+
+def _combine_versions(versions):
+    return tuple(token for token, _ in versions), max(modified for _, modified in versions)
+
+
+def book_version(view, request, *args, **kwargs):
+    if settings.BOOK_CACHE:
+        # Версия - из закэшированного представления книги: при попадании в кэш запроса к БД нет
+        entry = view.get_cached_book()
+        updated_at = entry['updated_at'] if entry is not None else None
+    else:
+        updated_at = (Book.objects.filter(pk=kwargs.get('pk'), is_banned=False)
+                      .values_list('updated_at', flat=True).first())
+    if updated_at is None:
+        return None, None
+    return (), updated_at
+
+
+def genre_collection_version(view, request, *args, **kwargs):
+    state = Genre.objects.aggregate(count=Count('pk'), last_modified=Max('updated_at'))
+    return (state['count'],), state['last_modified']
+
+
+async def agenre_collection_version(request, *args, **kwargs):
+    state = await Genre.objects.aaggregate(count=Count('pk'), last_modified=Max('updated_at'))
+    return (state['count'],), state['last_modified']
+
+
+def genre_version(view, request, *args, **kwargs):
+    updated_at = Genre.objects.filter(pk=kwargs.get('pk')).values_list('updated_at', flat=True).first()
+    if updated_at is None:
+        return None, None
+    return (), updated_at
+
+
+def conditional_get(version_func):
+    """
+    Декоратор для GET-обработчиков: по дешёвой версии ресурса строит ETag и
+    Last-Modified и отвечает 304 до выполнения запроса и сериализатора.
+
+    version_func(view, request, *args, **kwargs) возвращает пару (state, last_modified),
+    где state - кортеж значений, меняющихся при изменении данных (например, число строк).
+    Если last_modified равен None, ресурс не найден и запрос обрабатывается как обычно.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            state, last_modified = version_func(self, request, *args, **kwargs)
+            if last_modified is None:
+                return method(self, request, *args, **kwargs)
+
+            etag, timestamp = _validators(request, state, last_modified)
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+            return _patch_response(response, etag, timestamp)
+        return wrapper
+    return decorator
+
+
+def aconditional_get(version_func):
+    """
+    conditional_get() для async-представлений (async_views.py) с теми же ETag и Last-Modified:
+    view(request, *args, **kwargs) и version_func(request, *args, **kwargs) - корутины.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await view(request, *args, **kwargs)
+            state, last_modified = await version_func(request, *args, **kwargs)
+            if last_modified is None:
+                return await view(request, *args, **kwargs)
+
+            etag, timestamp = _validators(request, state, last_modified)
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = await view(request, *args, **kwargs)
+            return _patch_response(response, etag, timestamp)
+        return wrapper
+    return decorator
+
+
+def _validators(request, state, last_modified):
+    raw = '|'.join([
+        request.get_full_path(),
+        request.META.get('HTTP_ACCEPT', ''),
+        *map(str, state),
+        last_modified.isoformat(),
+    ])
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest()), int(last_modified.timestamp())
+
+
+def _patch_response(response, etag, timestamp):
+    if response.status_code in (200, 304):
+        response.headers.setdefault('ETag', etag)
+        response.headers.setdefault('Last-Modified', http_date(timestamp))
+        patch_cache_control(response, max_age=settings.CONDITIONAL_GET_MAX_AGE, must_revalidate=True)
+        patch_vary_headers(response, ['Accept'])
+    return response
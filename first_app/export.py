@@ -0,0 +1,101 @@
+import csv
+
+from django.db import connections
+from django.http import HttpRequest, QueryDict
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+
+# Те же поля, что отдаёт BookSerializer в списке (без genres)
+EXPORT_FIELDS = ['id', 'title', 'author', 'published_date', 'registered', 'managed', 'page_count', 'price',
+                 'discounted_price', 'is_banned', 'is_deleted', 'updated_at', 'deleted_at', 'publisher']
+
+# Столбцы values_list для полей, которые в выгрузке выглядят так же, как в сериализаторе:
+# publisher - это id (PrimaryKeyRelatedField), author - имя автора (AuthorNameField)
+EXPORT_COLUMNS = {
+    'publisher': 'publisher_id',
+    'author': 'author__name',
+}
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+class Echo:
+    """Псевдо-файл для csv.writer: write() просто возвращает строку."""
+
+    def write(self, value):
+        return value
+
+
+def iterate_rows(queryset, chunk_size):
+    """
+    Построчно читает values_list-выборку, держа в памяти не больше chunk_size строк.
+
+    В MySQL обычный курсор mysqlclient загружает весь результат на клиент,
+    поэтому там используется серверный курсор SSCursor с теми же конвертерами
+    значений, что применяет Django.
+    """
+    if connections[queryset.db].vendor != 'mysql':
+        yield from queryset.iterator(chunk_size=chunk_size)
+        return
+
+    from MySQLdb.cursors import SSCursor
+
+    compiler = queryset.query.get_compiler(using=queryset.db)
+    sql, params = compiler.as_sql()
+    fields = [select[0] for select in compiler.select[:compiler.col_count]]
+    converters = compiler.get_converters(fields)
+
+    compiler.connection.ensure_connection()
+    cursor = compiler.connection.connection.cursor(SSCursor)
+    try:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            if converters:
+                rows = compiler.apply_converters(rows, converters)
+            yield from rows
+    finally:
+        cursor.close()
+
+
+def _batched(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def stream_books(queryset, export_format, chunk_size):
+    """Генератор строк выгрузки в формате ndjson или csv."""
+    columns = [EXPORT_COLUMNS.get(field, field) for field in EXPORT_FIELDS]
+    rows = iterate_rows(queryset.values_list(*columns), chunk_size)
+
+    if export_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(EXPORT_FIELDS)
+        for batch in _batched(rows, chunk_size):
+            yield ''.join(writer.writerow(row) for row in batch)
+    else:
+        encoder = JSONEncoder(ensure_ascii=False)
+        for batch in _batched(rows, chunk_size):
+            yield ''.join(encoder.encode(dict(zip(EXPORT_FIELDS, row))) + '\n' for row in batch)
+
+
+def make_filter_request(params):
+    """DRF-запрос с заданными query-параметрами - чтобы применять фильтры вида вне HTTP (например, в командах)."""
+    request = HttpRequest()
+    request.method = 'GET'
+    request.GET = QueryDict(mutable=True)
+    for key, value in params.items():
+        if value is not None:
+            request.GET[key] = str(value)
+    return Request(request)
@@ -0,0 +1,107 @@
+"""
+Фасеты для /books/?facets=...: число книг по издательствам, жанрам, авторам и ценовым
+диапазонам в текущей выборке (с учётом всех активных фильтров).
+
+Каждый фасет - один GROUP BY-запрос (ценовые диапазоны - одна агрегация с условными COUNT),
+так что полный набор стоит четыре запроса независимо от числа значений.
+"""
+from django.conf import settings
+from django.db.models import Count, Q
+from rest_framework.exceptions import ValidationError
+
+from first_app.models.book import Book
+
+FACETS = ('publisher', 'genre', 'author', 'price')
+
+
+def parse_facets(value):
+    """'true' или '1' - все фасеты, иначе список имён через запятую; пустое значение - без фасетов."""
+    if not value or value.lower() in ('false', '0'):
+        return ()
+    if value.lower() in ('true', '1'):
+        return FACETS
+    names = tuple(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in names if name not in FACETS]
+    if unknown:
+        raise ValidationError({'facets': [f'Unknown facets: {", ".join(unknown)}. '
+                                          f'Available: {", ".join(FACETS)}.']})
+    return names
+
+
+def get_price_buckets():
+    """Границы из BOOKS_PRICE_BUCKETS превращаются в полуинтервалы [min, max); последний без верхней границы."""
+    bounds = [0, *settings.BOOKS_PRICE_BUCKETS]
+    return [(low, high) for low, high in zip(bounds, [*bounds[1:], None])]
+
+
+def _bucket_key(low, high):
+    return f'{low}-{high}' if high is not None else f'{low}+'
+
+
+def build_facet_queries(queryset, names):
+    """Возвращает {имя: (выборка, функция форматирования строк)}; выборки ещё не выполнены."""
+    # Сортировка (в том числе по релевантности поиска) для группировки не нужна
+    queryset = queryset.order_by()
+    limit = settings.BOOKS_FACET_LIMIT
+    queries = {}
+
+    if 'publisher' in names:
+        rows = (queryset.values('publisher', 'publisher__name')
+                .annotate(count=Count('pk'))
+                .order_by('-count', 'publisher')[:limit]
+                .values_list('publisher', 'publisher__name', 'count'))
+        queries['publisher'] = (rows, lambda rows: [{'id': pk, 'name': name, 'count': count}
+                                                    for pk, name, count in rows])
+
+    if 'genre' in names:
+        rows = (Book.genres.through.objects
+                .filter(book__in=queryset.values('pk'))
+                .values('genre', 'genre__name')
+                .annotate(count=Count('book'))
+                .order_by('-count', 'genre')[:limit]
+                .values_list('genre', 'genre__name', 'count'))
+        queries['genre'] = (rows, lambda rows: [{'id': pk, 'name': name, 'count': count}
+                                                for pk, name, count in rows])
+
+    if 'author' in names:
+        rows = (queryset.values('author', 'author__name')
+                .annotate(count=Count('pk'))
+                .order_by('-count', 'author')[:limit]
+                .values_list('author', 'author__name', 'count'))
+        queries['author'] = (rows, lambda rows: [{'id': pk, 'name': name, 'count': count}
+                                                 for pk, name, count in rows])
+
+    if 'price' in names:
+        buckets = get_price_buckets()
+        aggregates = {}
+        for index, (low, high) in enumerate(buckets):
+            condition = Q(price__gte=low) if high is None else Q(price__gte=low, price__lt=high)
+            aggregates[f'bucket_{index}'] = Count('pk', filter=condition)
+        queries['price'] = (
+            (queryset, aggregates),
+            lambda counts: [{'bucket': _bucket_key(low, high), 'min': low, 'max': high,
+                             'count': counts[f'bucket_{index}']} for index, (low, high) in enumerate(buckets)],
+        )
+    return queries
+
+
+def compute_facets(queryset, names):
+    facets = {}
+    for name, (query, format_rows) in build_facet_queries(queryset, names).items():
+        if name == 'price':
+            price_queryset, aggregates = query
+            facets[name] = format_rows(price_queryset.aggregate(**aggregates))
+        else:
+            facets[name] = format_rows(list(query))
+    return facets
+
+
+async def acompute_facets(queryset, names):
+    facets = {}
+    for name, (query, format_rows) in build_facet_queries(queryset, names).items():
+        if name == 'price':
+            price_queryset, aggregates = query
+            facets[name] = format_rows(await price_queryset.aaggregate(**aggregates))
+        else:
+            facets[name] = format_rows([row async for row in query])
+    return facets
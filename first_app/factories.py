@@ -0,0 +1,153 @@
+"""
+Фабрики моделей для быстрой загрузки больших каталогов: сиды для бенчмарков (seeding.py)
+и данные для тестов.
+
+Фабрика строит несохранённые экземпляры (build, build_batch) с детерминированными по seed
+значениями, а create_batch() вставляет их через bulk_create порциями по batch_size: каждая порция -
+в своей транзакции, в памяти одновременно только она. bulk_create не отправляет сигналы,
+поэтому производные данные (счётчики жанров, кэши) фабрика обновляет сама в after_load(),
+а кэши сбрасываются после коммита - как и при обычной записи.
+"""
+import datetime
+import random
+
+from django.db import transaction
+from django.utils import timezone
+
+from first_app.cache import invalidate_all_books, invalidate_average_price, invalidate_counts
+from first_app.models.book import Book, Genre, Publisher
+
+
+class ModelFactory:
+    model = None
+    # Поле, по которому дочитываются id, если bulk_create их не вернул (MySQL)
+    lookup_field = None
+
+    def __init__(self, seed=42, rnd=None):
+        self.seed = seed
+        self.random = rnd or random.Random(seed)
+        self.sequence = 0
+
+    def attributes(self, n):
+        """Значения полей n-го объекта этой фабрики."""
+        return {}
+
+    def build(self, **overrides):
+        # Переопределённые значения всё равно вычисляются - последовательность случайных чисел не сдвигается
+        attributes = self.attributes(self.sequence)
+        self.sequence += 1
+        attributes.update(overrides)
+        return self.model(**attributes)
+
+    def build_batch(self, size, **overrides):
+        return [self.build(**overrides) for _ in range(size)]
+
+    def create_batch(self, size, batch_size=5000, **overrides):
+        """Создаёт size объектов порциями по batch_size. Возвращает список их id."""
+        ids = []
+        for start in range(0, size, batch_size):
+            batch = self.build_batch(min(batch_size, size - start), **overrides)
+            with transaction.atomic():
+                self.model._default_manager.bulk_create(batch)
+                self.fill_ids(batch)
+                self.after_create(batch)
+            ids.extend(obj.pk for obj in batch)
+        self.after_load(ids)
+        return ids
+
+    def fill_ids(self, batch):
+        if all(obj.pk is not None for obj in batch):
+            return
+        values = [getattr(obj, self.lookup_field) for obj in batch]
+        ids = dict(self.model._base_manager.filter(**{f'{self.lookup_field}__in': values})
+                   .values_list(self.lookup_field, 'pk'))
+        for obj in batch:
+            obj.pk = ids[getattr(obj, self.lookup_field)]
+
+    def after_create(self, batch):
+        """Дополнительные вставки для порции в той же транзакции, например связи many-to-many."""
+
+    def after_load(self, ids):
+        """Обновление производных данных после загрузки."""
+
+
+class PublisherFactory(ModelFactory):
+    model = Publisher
+    lookup_field = 'name'
+
+    def attributes(self, n):
+        return {'name': f'Publisher {self.seed}-{n}'}
+
+
+class GenreFactory(ModelFactory):
+    model = Genre
+    lookup_field = 'name'
+
+    def attributes(self, n):
+        return {'name': f'Genre {self.seed}-{n}'}
+
+    def after_load(self, ids):
+        transaction.on_commit(lambda: invalidate_counts(Genre))
+
+
+class BookFactory(ModelFactory):
+    """
+    Книги со случайными автором, издательством и жанрами из переданных id
+    (пустой список - без связи), датой публикации в [start_date, start_date + days).
+    """
+    model = Book
+    lookup_field = 'title'
+
+    def __init__(self, seed=42, rnd=None, author_ids=(), publisher_ids=(), genre_ids=(), genres_per_book=2,
+                 start_date=datetime.date(1950, 1, 1), days=365 * 70):
+        super().__init__(seed, rnd)
+        self.author_ids = list(author_ids)
+        self.publisher_ids = list(publisher_ids)
+        self.genre_ids = list(genre_ids)
+        self.genres_per_book = min(genres_per_book, len(self.genre_ids))
+        self.start_date = start_date
+        self.days = days
+
+    def attributes(self, n):
+        rnd = self.random
+        price = rnd.randint(5, 500)
+        attributes = {
+            'title': f'Book {self.seed}-{n}',
+            'author_id': rnd.choice(self.author_ids) if self.author_ids else None,
+            'published_date': self.start_date + datetime.timedelta(days=rnd.randrange(self.days)),
+            'page_count': rnd.randint(50, 1500),
+            'price': price,
+            'discounted_price': price - rnd.randint(0, price // 2) if rnd.random() < 0.3 else None,
+            'publisher_id': rnd.choice(self.publisher_ids) if self.publisher_ids else None,
+            'is_banned': rnd.random() < 0.01,
+            'is_deleted': rnd.random() < 0.02,
+        }
+        # Момент удаления - в течение последнего года, часть книг попадает под archive_deleted_books
+        attributes['deleted_at'] = (timezone.now() - datetime.timedelta(days=rnd.randrange(365))
+                                    if attributes['is_deleted'] else None)
+        return attributes
+
+    def build(self, **overrides):
+        book = super().build(**overrides)
+        # is_deleted задан в overrides: deleted_at ему соответствует
+        if 'deleted_at' not in overrides and book.is_deleted != (book.deleted_at is not None):
+            book.deleted_at = timezone.now() if book.is_deleted else None
+        return book
+
+    def after_create(self, batch):
+        if not self.genre_ids:
+            return
+        through = Book.genres.through
+        through.objects.bulk_create([
+            through(book_id=book.pk, genre_id=genre_id)
+            for book in batch
+            for genre_id in self.random.sample(self.genre_ids, self.genres_per_book)
+        ])
+
+    def after_load(self, ids):
+        if self.genre_ids:
+            Genre.objects.filter(pk__in=self.genre_ids).refresh_book_counts()
+        transaction.on_commit(invalidate_average_price)
+        transaction.on_commit(lambda: invalidate_counts(Book))
+        transaction.on_commit(lambda: invalidate_counts(Genre))
+        transaction.on_commit(invalidate_all_books)
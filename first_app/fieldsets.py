@@ -0,0 +1,103 @@
+"""
+Выборочные поля ответа: ?fields=title,author или ?exclude=updated_at,deleted_at (только для GET).
+
+Выбор сужает не только сериализатор, но и SQL: строковые сериализаторы (RowSerializer) читают
+в values_list только нужные столбцы, а для экземпляров модели restrict_queryset() добавляет
+.only() и подключает select_related/prefetch_related лишь для запрошенных связей.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+EXCLUDE_PARAM = 'exclude'
+READ_METHODS = ('GET', 'HEAD')
+
+
+def _split(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def parse_fieldset(query_params, available):
+    """
+    Имена выбранных полей в порядке available или None, если параметров нет.
+    fields и exclude вместе не принимаются, неизвестное имя - ошибка 400.
+    """
+    include, exclude = query_params.get(FIELDS_PARAM), query_params.get(EXCLUDE_PARAM)
+    if include is None and exclude is None:
+        return None
+    if include is not None and exclude is not None:
+        raise ValidationError({FIELDS_PARAM: [f'Use either {FIELDS_PARAM} or {EXCLUDE_PARAM}, not both.']})
+
+    param = FIELDS_PARAM if include is not None else EXCLUDE_PARAM
+    names = _split(include if include is not None else exclude)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise ValidationError({param: [f'Unknown fields: {", ".join(unknown)}. '
+                                       f'Available: {", ".join(available)}.']})
+    if include is not None:
+        return tuple(name for name in available if name in names)
+    return tuple(name for name in available if name not in names)
+
+
+def get_requested_fields(request, serializer_class, extra_fields=()):
+    """
+    Выбранные поля для serializer_class по параметрам запроса; None - все поля
+    (а также для запросов на запись: сериализатор там разбирает входные данные).
+    extra_fields - ключи, которые представление добавляет к ответу само.
+    """
+    if request.method not in READ_METHODS:
+        return None
+    available = [*serializer_class().fields, *extra_fields]
+    return parse_fieldset(request.query_params, available)
+
+
+def select_fields(data, fields):
+    """Выбранные поля из готового представления (например, из кэша); fields=None - все поля."""
+    if fields is None:
+        return data
+    return {name: data[name] for name in fields if name in data}
+
+
+class SparseFieldsMixin:
+    """Для ModelSerializer: оставляет только поля из context['fields'], если он задан."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        selected = self.context.get('fields')
+        if selected is not None:
+            for name in list(self.fields):
+                if name not in selected:
+                    self.fields.pop(name)
+
+
+def restrict_queryset(queryset, serializer, extra_columns=()):
+    """
+    .only() по столбцам полей сериализатора (и extra_columns), select_related и prefetch_related -
+    только для связей среди этих полей. Если поле не соответствует столбцу модели
+    (вычисляемое, вложенный source), выборка не сужается.
+    """
+    opts = queryset.model._meta
+    columns = {opts.pk.name, *extra_columns}
+    select_related, prefetch_related = [], []
+    for field in serializer.fields.values():
+        if isinstance(field, serializers.ManyRelatedField):
+            prefetch_related.append(field.source)
+            continue
+        if field.source == '*' or '.' in field.source:
+            return queryset
+        try:
+            opts.get_field(field.source)
+        except FieldDoesNotExist:
+            return queryset
+        columns.add(field.source)
+        if isinstance(field, serializers.SlugRelatedField):
+            select_related.append(field.source)
+            columns.add(f'{field.source}__{field.slug_field}')
+
+    queryset = queryset.select_related(None).prefetch_related(None)
+    if select_related:
+        queryset = queryset.select_related(*select_related)
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*prefetch_related)
+    return queryset.only(*columns)
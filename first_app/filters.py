@@ -0,0 +1,65 @@
+import re
+
+import django_filters
+from django.conf import settings
+from django.db.models import F
+from rest_framework.filters import SearchFilter
+from rest_framework.pagination import CursorPagination
+
+from first_app.models.book import Book
+from first_app.search import SearchRank, get_fulltext_backend
+
+
+class BookFilter(django_filters.FilterSet):
+    """?author= - по имени автора (JOIN с Author по индексу имени), ?publisher= - по id."""
+    author = django_filters.CharFilter(field_name='author__name')
+
+    class Meta:
+        model = Book
+        fields = ['author', 'publisher']
+
+
+class FullTextSearchFilter(SearchFilter):
+    """
+    SearchFilter, который использует полнотекстовый индекс (FTS5 в SQLite,
+    FULLTEXT в MySQL) по названию и имени автора (см. first_app/search.py).
+
+    Каждое слово запроса ищется как префикс, слова объединяются через AND -
+    как и в обычном SearchFilter. Если клиент не передал ?ordering=, результаты
+    сортируются по релевантности; исключение - курсорная пагинация (?pagination=cursor):
+    у неё своя сортировка по ключу страницы, и релевантность там не учитывается.
+    Если индекса нет или FULLTEXT_SEARCH выключен, работает обычный поиск через icontains по search_fields.
+    """
+    rank_annotation = 'search_rank'
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms or not settings.FULLTEXT_SEARCH:
+            return super().filter_queryset(request, queryset, view)
+
+        backend = get_fulltext_backend(queryset.db)
+        if backend == 'sqlite':
+            query = self.sqlite_query(terms)
+        elif backend == 'mysql':
+            query = self.mysql_query(terms)
+        else:
+            return super().filter_queryset(request, queryset, view)
+        if not query:
+            return queryset.none()
+
+        # Соединение с индексом по rowid: один MATCH на запрос
+        queryset = queryset.filter(search_index__document__match=query)
+        if not request.query_params.get('ordering') and not isinstance(getattr(view, 'paginator', None),
+                                                                        CursorPagination):
+            queryset = queryset.annotate(**{self.rank_annotation: SearchRank(F('search_index__document'), query)})
+            queryset = queryset.order_by(self.rank_annotation, 'pk')
+        return queryset
+
+    def sqlite_query(self, terms):
+        # Каждое слово в кавычках, чтобы пользовательский ввод не разбирался как синтаксис FTS5
+        return ' '.join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+    def mysql_query(self, terms):
+        # Операторы boolean mode из ввода убираем, каждое слово обязательно и ищется как префикс
+        words = [re.sub(r'[+\-<>()~*"@]', ' ', term).split() for term in terms]
+        return ' '.join(f'+{word}*' for group in words for word in group)
@@ -0,0 +1,193 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from rest_framework import serializers, status
+
+from first_app.cache import invalidate_all_books, invalidate_average_price, invalidate_counts
+from first_app.models.book import Author, Book, Publisher, Genre
+
+
+class BookIngestSerializer(serializers.ModelSerializer):
+    """
+    Проверка одного элемента пакета. Связи и уникальность здесь не проверяются -
+    это делается одним запросом на весь пакет в ingest_books().
+    """
+    publisher = serializers.IntegerField(required=False, allow_null=True)
+    # Имя автора; авторы находятся или создаются одним запросом на пакет
+    author = serializers.CharField(max_length=Author._meta.get_field('name').max_length)
+    genres = serializers.ListField(child=serializers.IntegerField(), required=False)
+
+    class Meta:
+        model = Book
+        fields = '__all__'
+        validators = []
+        # UniqueValidator для unique_title_registered тоже проверяется пакетно
+        extra_kwargs = {'title': {'validators': []}}
+
+
+def _chunks(values, size):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _error(index, errors):
+    return {'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': errors}
+
+
+def _taken_titles(titles, batch_size):
+    """Занятые пары (название, автор) и зарегистрированные названия среди titles."""
+    # unique_together и unique_title_registered действуют на все строки, включая мягко удалённые
+    taken_pairs = set()
+    registered_titles = set()
+    for chunk in _chunks(titles, batch_size):
+        for title, author, registered in (Book._base_manager.filter(title__in=chunk)
+                                          .values_list('title', 'author__name', 'registered')):
+            taken_pairs.add((title, author))
+            if registered:
+                registered_titles.add(title)
+    return taken_pairs, registered_titles
+
+
+def ingest_books(items):
+    """
+    Пакетное создание книг. Возвращает результаты по каждому элементу в порядке входного списка.
+
+    Вместо SELECT на каждый элемент (unique_together, publisher, genres) выполняется
+    по одному запросу на пакет, книги и связи с жанрами вставляются через bulk_create.
+    """
+    batch_size = settings.BOOKS_BULK_BATCH_SIZE
+    results = [None] * len(items)
+
+    candidates = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results[index] = _error(index, {'non_field_errors': ['Expected an object.']})
+            continue
+        data = dict(item)
+        # Как и при создании одной книги: автор по умолчанию
+        if not data.get('author'):
+            data['author'] = 'Unknown Author'
+        serializer = BookIngestSerializer(data=data)
+        if serializer.is_valid():
+            candidates.append((index, dict(serializer.validated_data)))
+        else:
+            results[index] = _error(index, serializer.errors)
+
+    publisher_ids = {data['publisher'] for _, data in candidates if data.get('publisher') is not None}
+    genre_ids = {genre_id for _, data in candidates for genre_id in data.get('genres', [])}
+    titles = {data['title'] for _, data in candidates}
+
+    known_publishers = set()
+    for chunk in _chunks(publisher_ids, batch_size):
+        known_publishers.update(Publisher.objects.filter(pk__in=chunk).values_list('pk', flat=True))
+    known_genres = set()
+    for chunk in _chunks(genre_ids, batch_size):
+        known_genres.update(Genre.objects.filter(pk__in=chunk).values_list('pk', flat=True))
+
+    taken_pairs, registered_titles = _taken_titles(titles, batch_size)
+
+    books = []
+    book_authors = []
+    book_genres = []
+    for index, data in candidates:
+        errors = {}
+        publisher_id = data.pop('publisher', None)
+        genres = data.pop('genres', [])
+        pair = (data['title'], data['author'])
+
+        if publisher_id is not None and publisher_id not in known_publishers:
+            errors['publisher'] = [f'Invalid pk "{publisher_id}" - object does not exist.']
+        missing_genres = [genre_id for genre_id in genres if genre_id not in known_genres]
+        if missing_genres:
+            errors['genres'] = [f'Invalid pk "{genre_id}" - object does not exist.' for genre_id in missing_genres]
+        if pair in taken_pairs:
+            errors['non_field_errors'] = ['The fields title, author must make a unique set.']
+        elif data.get('registered') and data['title'] in registered_titles:
+            errors['non_field_errors'] = ['Registered book with this title already exists.']
+
+        if errors:
+            results[index] = _error(index, errors)
+            continue
+
+        taken_pairs.add(pair)
+        if data.get('registered'):
+            registered_titles.add(data['title'])
+        author_name = data.pop('author')
+        books.append((index, Book(publisher_id=publisher_id, **data)))
+        book_authors.append(author_name)
+        book_genres.append(set(genres))
+
+    if books:
+        try:
+            with transaction.atomic():
+                _insert_books(books, book_authors, book_genres, batch_size)
+                _after_insert(book_genres)
+        except IntegrityError:
+            # Параллельный запрос успел занять (title, author) или зарегистрированное название
+            # после проверки выше: вставляем по одной книге, конфликтующие получают ошибку
+            with transaction.atomic():
+                inserted = []
+                for book_entry, author_name, genres in zip(books, book_authors, book_genres):
+                    index, book = book_entry
+                    book.pk = None
+                    try:
+                        with transaction.atomic():
+                            _insert_books([book_entry], [author_name], [genres], batch_size)
+                    except IntegrityError as exc:
+                        results[index] = _error(index, _conflict_errors(book, exc))
+                    else:
+                        inserted.append((book_entry, genres))
+                books = [book_entry for book_entry, _ in inserted]
+                book_genres = [genres for _, genres in inserted]
+                _after_insert(book_genres)
+
+        for index, book in books:
+            results[index] = {'index': index, 'status': status.HTTP_201_CREATED, 'id': book.pk}
+
+    return results
+
+
+def _insert_books(books, book_authors, book_genres, batch_size):
+    author_ids = Author.objects.ids_by_name(book_authors, batch_size)
+    for (_, book), author_name in zip(books, book_authors):
+        book.author_id = author_ids[author_name]
+    Book.objects.bulk_create([book for _, book in books], batch_size=batch_size)
+
+    # MySQL не возвращает id из bulk_create - дочитываем их по (title, author)
+    if any(book.pk is None for _, book in books):
+        ids = {}
+        for chunk in _chunks({book.title for _, book in books}, batch_size):
+            ids.update({(title, author_id): pk for pk, title, author_id in
+                        Book._base_manager.filter(title__in=chunk).values_list('pk', 'title', 'author_id')})
+        for _, book in books:
+            book.pk = ids[(book.title, book.author_id)]
+
+    through = Book.genres.through
+    through.objects.bulk_create(
+        [through(book_id=book.pk, genre_id=genre_id)
+         for (_, book), genres in zip(books, book_genres) for genre_id in genres],
+        batch_size=batch_size,
+    )
+
+
+def _after_insert(book_genres):
+    """book_genres - множества жанров вставленных книг."""
+    # bulk_create не отправляет post_save и m2m_changed, поэтому обновляем производные данные вручную
+    used_genres = set().union(*book_genres)
+    if used_genres:
+        Genre.objects.filter(pk__in=used_genres).refresh_book_counts()
+    if book_genres:
+        transaction.on_commit(invalidate_average_price)
+        transaction.on_commit(lambda: invalidate_counts(Book))
+        # Эти id могли быть закэшированы как отсутствующие (GET /books/<pk>/, /books/batch/)
+        transaction.on_commit(invalidate_all_books)
+
+
+def _conflict_errors(book, exc):
+    """Ошибка элемента, который не вставился из-за ограничения уникальности."""
+    taken = Book._base_manager.filter(title=book.title)
+    if taken.filter(author_id=book.author_id).exists():
+        return {'non_field_errors': ['The fields title, author must make a unique set.']}
+    if book.registered and taken.filter(registered=True).exists():
+        return {'non_field_errors': ['Registered book with this title already exists.']}
+    return {'non_field_errors': [str(exc)]}
@@ -0,0 +1,75 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connections, router, transaction
+from django.utils import timezone
+
+from first_app.models.book import Book, BookArchive, BookGenreArchive
+
+ARCHIVE_FIELDS = ['id', 'title', 'author_id', 'published_date', 'registered', 'managed', 'page_count', 'price',
+                  'discounted_price', 'publisher_id', 'is_banned', 'updated_at', 'deleted_at']
+
+
+class Command(BaseCommand):
+    help = ('Переносит давно удалённые книги и их связи с жанрами в архивные таблицы. '
+            'Работает небольшими пакетами, каждый в своей короткой транзакции.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=90)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--sleep', type=float, default=0.1, help='Пауза между пакетами, секунд.')
+        parser.add_argument('--limit', type=int, help='Максимум книг за запуск.')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(days=options['older_than_days'])
+        # Выборка идёт по частичному индексу deleted_at_idx
+        candidates = (Book._base_manager
+                      .filter(is_deleted=True, deleted_at__lt=cutoff)
+                      .order_by('deleted_at', 'id'))
+
+        if options['dry_run']:
+            self.stdout.write(f'{candidates.count()} books would be archived.')
+            return
+
+        archived = 0
+        limit = options['limit']
+        while limit is None or archived < limit:
+            size = options['batch_size'] if limit is None else min(options['batch_size'], limit - archived)
+            moved = self.archive_batch(candidates, size)
+            if not moved:
+                break
+            archived += moved
+            self.stdout.write(f'Archived {archived} books...')
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Archived {archived} books.'))
+
+    def archive_batch(self, candidates, size):
+        through = Book.genres.through
+        with transaction.atomic():
+            ids = list(candidates.select_for_update().values_list('pk', flat=True)[:size])
+            if not ids:
+                return 0
+
+            rows = Book._base_manager.filter(pk__in=ids).values(*ARCHIVE_FIELDS)
+            BookArchive.objects.bulk_create([BookArchive(**row) for row in rows])
+            links = through.objects.filter(book_id__in=ids).values_list('book_id', 'genre_id')
+            BookGenreArchive.objects.bulk_create(
+                [BookGenreArchive(book_id=book_id, genre_id=genre_id) for book_id, genre_id in links])
+
+            # У таблицы связей нет сигналов и зависимых моделей - delete() выполняется одним DELETE
+            through.objects.filter(book_id__in=ids).delete()
+            # Book.delete() мягкое, а QuerySet.delete() загрузил бы книги ради сигналов. Удалённые книги
+            # не входят в счётчики жанров и среднюю цену, поэтому сигналы не нужны: один DELETE по id пакета
+            self.delete_books(ids)
+        return len(ids)
+
+    def delete_books(self, ids):
+        connection = connections[router.db_for_write(Book)]
+        quote = connection.ops.quote_name
+        placeholders = ', '.join(['%s'] * len(ids))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {quote(Book._meta.db_table)} '
+                           f'WHERE {quote(Book._meta.pk.column)} IN ({placeholders})', ids)
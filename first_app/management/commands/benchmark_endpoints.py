@@ -0,0 +1,262 @@
+import json
+import platform
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from first_app.benchmarking import latency_summary
+from first_app.models.book import Book, Genre
+
+
+def fetch(client, url):
+    response = client.get(url)
+    if response.streaming:
+        # Потоковый ответ (выгрузка) читает строки из БД только при чтении тела
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+class InProcessFetcher:
+    """Запросы через django.test.Client - весь стек Django, но без сети."""
+
+    def __init__(self, host):
+        self.client = Client(HTTP_HOST=host)
+
+    def __call__(self, url):
+        return fetch(self.client, url).status_code
+
+    def close(self):
+        connections.close_all()
+
+
+class HttpFetcher:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def __call__(self, url):
+        try:
+            with urllib.request.urlopen(self.base_url + url, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as exc:
+            return exc.code
+
+    def close(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = ('Прогоняет все маршруты first_app/urls.py в процессе или через локальный сервер и выводит '
+            'пропускную способность, p50/p95/p99 и число SQL-запросов в JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', choices=['inprocess', 'server'], default='inprocess')
+        parser.add_argument('--base-url', help='Адрес уже запущенного сервера (режим server). '
+                                               'Если не задан, запускается runserver на --port.')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--requests', type=int, default=200, help='Запросов на каждый маршрут.')
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--only', help='Список маршрутов через запятую.')
+        parser.add_argument('--output', help='Файл для JSON-отчёта (по умолчанию stdout).')
+        parser.add_argument('--compare', help='JSON-отчёт предыдущего прогона для сравнения.')
+
+    def build_targets(self):
+        book = (Book.objects.filter(is_banned=False).order_by('pk')
+                .values('pk', 'title', 'author__name', 'publisher_id', 'published_date').first())
+        if book is None:
+            raise CommandError('No books in the database, run seed_catalog first.')
+        genre = Genre.objects.order_by('pk').values_list('pk', flat=True).first()
+        total = Book.objects.count()
+        date = book['published_date']
+        book_list = reverse('book-list-create')
+        batch_ids = ','.join(map(str, Book.objects.filter(is_banned=False).order_by('pk')
+                                 .values_list('pk', flat=True)[:settings.BOOKS_BATCH_MAX_IDS]))
+        # Выгрузка одного издательства: поток на тысячи строк, а не на весь каталог за каждый запрос
+        export_filter = f"?publisher={book['publisher_id']}" if book['publisher_id'] else ''
+        day = {'year': f'{date.year:04d}', 'month': f'{date.month:02d}', 'day': f'{date.day:02d}'}
+        month = {'year': f'{date.year:04d}', 'month': f'{date.month:02d}'}
+
+        targets = {
+            'book-list': book_list,
+            'book-list-deep-page': f'{book_list}?page_size=100&page={max(1, total // 100 // 2)}',
+            'book-list-cursor': f'{book_list}?pagination=cursor&page_size=100',
+            'book-list-search': f'{book_list}?search={book["title"].split()[0]}',
+            'book-list-author': f'{book_list}?author={urllib.request.quote(book["author__name"] or "")}',
+            'book-list-include-related': f'{book_list}?include_related=true&page_size=100',
+            'book-detail': reverse('book-detail-update-delete', kwargs={'pk': book['pk']}),
+            'book-batch': f"{reverse('book-batch')}?ids={batch_ids}",
+            'book-expensive': reverse('book-expensive'),
+            'book-export-ndjson': reverse('book-export', kwargs={'export_format': 'ndjson'}) + export_filter,
+            'book-export-csv': reverse('book-export', kwargs={'export_format': 'csv'}) + export_filter,
+            'books-by-date': reverse('books-by-date', kwargs=day),
+            'books-by-month': reverse('books-by-month', kwargs=month),
+            'books-calendar-month': f"{reverse('books-calendar')}?group=month",
+            'genre-list': reverse('genre-list'),
+            'genre-statistic': reverse('genre-statistic'),
+            # Те же чтения на async ORM (first_app/async_views.py)
+            'async-book-list': reverse('async-book-list'),
+            'async-book-list-search': f"{reverse('async-book-list')}?search={book['title'].split()[0]}",
+            'async-book-detail': reverse('async-book-detail', kwargs={'pk': book['pk']}),
+            'async-book-batch': f"{reverse('async-book-batch')}?ids={batch_ids}",
+            'async-book-expensive': reverse('async-book-expensive'),
+            'async-books-by-date': reverse('async-books-by-date', kwargs=day),
+            'async-books-by-month': reverse('async-books-by-month', kwargs=month),
+            'async-genre-list': reverse('async-genre-list'),
+            'async-genre-statistic': reverse('async-genre-statistic'),
+        }
+        if genre is not None:
+            targets['genre-detail'] = reverse('genre-detail', kwargs={'pk': genre})
+
+        if self.only:
+            targets = {name: url for name, url in targets.items() if name in self.only}
+        return targets
+
+    def count_queries(self, url):
+        client = Client(HTTP_HOST=self.host)
+        with CaptureQueriesContext(connection) as context:
+            fetch(client, url)
+        return len(context)
+
+    def run_target(self, fetcher_factory, url, requests, concurrency):
+        def worker(count):
+            fetcher = fetcher_factory()
+            latencies = []
+            errors = 0
+            try:
+                for _ in range(count):
+                    started = time.perf_counter()
+                    status = fetcher(url)
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    if status >= 400:
+                        errors += 1
+            finally:
+                fetcher.close()
+            return latencies, errors
+
+        shares = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+        started = time.perf_counter()
+        if concurrency == 1:
+            results = [worker(shares[0])]
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                results = list(executor.map(worker, shares))
+        elapsed = time.perf_counter() - started
+
+        latencies = [latency for result in results for latency in result[0]]
+        return {
+            'requests': len(latencies),
+            'errors': sum(result[1] for result in results),
+            'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+            'latency_ms': latency_summary(latencies),
+        }
+
+    def start_server(self, port):
+        process = subprocess.Popen(
+            [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}'],
+            cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        base_url = f'http://127.0.0.1:{port}'
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            try:
+                urllib.request.urlopen(base_url + reverse('genre-list'), timeout=1).read()
+                return process, base_url
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.2)
+        process.terminate()
+        raise CommandError('runserver did not start in 30 seconds.')
+
+    def handle(self, *args, **options):
+        self.only = set(options['only'].split(',')) if options['only'] else None
+        self.host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*', '')), 'localhost').lstrip('.')
+        targets = self.build_targets()
+
+        server = None
+        if options['mode'] == 'server':
+            base_url = options['base_url']
+            if not base_url:
+                server, base_url = self.start_server(options['port'])
+            fetcher_factory = lambda: HttpFetcher(base_url)  # noqa: E731
+        else:
+            fetcher_factory = lambda: InProcessFetcher(self.host)  # noqa: E731
+
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'mode': options['mode'],
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'books': Book.objects.count(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'git_commit': self.git_commit(),
+            },
+            'endpoints': {},
+        }
+        try:
+            for name, url in targets.items():
+                warmup = fetcher_factory()
+                for _ in range(options['warmup']):
+                    warmup(url)
+                warmup.close()
+
+                result = self.run_target(fetcher_factory, url, options['requests'], options['concurrency'])
+                # В режиме server запросы выполняются в другом процессе, посчитать их отсюда нельзя
+                queries = self.count_queries(url) if options['mode'] == 'inprocess' else None
+                report['endpoints'][name] = {'url': url, **result, 'queries': queries}
+                self.stderr.write(f"{name}: p50={result['latency_ms']['p50']} ms, "
+                                  f"{result['throughput_rps']} req/s, queries={queries}")
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            with open(options['compare']) as file:
+                self.write_comparison(json.load(file), report)
+
+    def git_commit(self):
+        try:
+            return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR,
+                                           stderr=subprocess.DEVNULL, text=True).strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
+
+    def write_comparison(self, previous, current):
+        # Сравнение пишется в stderr, чтобы stdout оставался чистым JSON
+        self.stderr.write(f"\n{'endpoint':<28}{'p50 ms':>22}{'p95 ms':>22}{'req/s':>22}{'queries':>12}")
+        for name, new in current['endpoints'].items():
+            old = previous.get('endpoints', {}).get(name)
+            if old is None:
+                self.stderr.write(f'{name:<28} (no previous data)')
+                continue
+            cells = []
+            for old_value, new_value in ((old['latency_ms']['p50'], new['latency_ms']['p50']),
+                                         (old['latency_ms']['p95'], new['latency_ms']['p95']),
+                                         (old['throughput_rps'], new['throughput_rps'])):
+                change = (new_value - old_value) / old_value * 100 if old_value else 0
+                cells.append(f'{old_value:.1f}->{new_value:.1f} ({change:+.0f}%)')
+            self.stderr.write(f"{name:<28}{cells[0]:>22}{cells[1]:>22}{cells[2]:>22}"
+                              f"{str(old['queries']) + '->' + str(new['queries']):>12}")
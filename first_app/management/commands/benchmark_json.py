@@ -0,0 +1,113 @@
+import io
+import json
+import platform
+import time
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from first_app.benchmarking import latency_summary
+from first_app.compression import brotli, compress
+from first_app.models.book import Book
+from first_app.parsers import FastJSONParser
+from first_app.renderers import FastJSONRenderer, orjson
+
+ENCODINGS = ['identity', 'gzip'] + (['br'] if brotli is not None else [])
+
+
+def timed(function, repeat):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latency_summary(latencies)
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает JSONRenderer/JSONParser DRF с FastJSONRenderer/FastJSONParser (orjson) и сжатие '
+            'gzip/brotli на странице /books/?page_size=100: отдельно рендер, разбор, сжатие и весь запрос. '
+            'Результат - JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=200, help='Повторов на каждый вариант.')
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--output', help='Файл для JSON-отчёта (по умолчанию stdout).')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            raise CommandError('orjson is not installed (pip install orjson), nothing to compare with.')
+        if not Book.objects.exists():
+            raise CommandError('No books in the database, run seed_catalog first.')
+        host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*', '')), 'localhost').lstrip('.')
+        url = f"{reverse('book-list-create')}?page_size={options['page_size']}"
+        repeat = options['requests']
+        client = Client(HTTP_HOST=host)
+
+        data = client.get(url).data
+        with override_settings(FAST_JSON=True):
+            body = FastJSONRenderer().render(data)
+            if body != JSONRenderer().render(data):
+                raise CommandError('FastJSONRenderer output differs from JSONRenderer.')
+
+            report = {
+                'meta': {
+                    'timestamp': timezone.now().isoformat(),
+                    'url': url,
+                    'requests': repeat,
+                    'body_bytes': len(body),
+                    'books': Book.objects.count(),
+                    'database': connection.vendor,
+                    'python': platform.python_version(),
+                    'django': django.get_version(),
+                    'orjson': orjson.__version__,
+                    'brotli': brotli is not None,
+                },
+                'render_ms': {
+                    'json': timed(lambda: JSONRenderer().render(data), repeat),
+                    'orjson': timed(lambda: FastJSONRenderer().render(data), repeat),
+                },
+                'parse_ms': {
+                    'json': timed(lambda: JSONParser().parse(io.BytesIO(body)), repeat),
+                    'orjson': timed(lambda: FastJSONParser().parse(io.BytesIO(body)), repeat),
+                },
+                'compression': {},
+                'request_ms': {},
+            }
+
+        for encoding in ENCODINGS[1:]:
+            report['compression'][encoding] = {
+                'bytes': len(compress(body, encoding)),
+                'ratio': round(len(body) / len(compress(body, encoding)), 2),
+                'ms': timed(lambda: compress(body, encoding), repeat),
+            }
+
+        # Весь стек Django: рендерер и кодировка ответа в каждой комбинации
+        for fast in (False, True):
+            renderer = 'orjson' if fast else 'json'
+            for encoding in ENCODINGS:
+                with override_settings(FAST_JSON=fast):
+                    request = lambda: client.get(url, HTTP_ACCEPT_ENCODING=encoding)  # noqa: E731
+                    for _ in range(options['warmup']):
+                        request()
+                    response = request()
+                    result = {'bytes': len(response.content), 'content_encoding': response.get('Content-Encoding'),
+                              **timed(request, repeat)}
+                report['request_ms'][f'{renderer}+{encoding}'] = result
+                self.stderr.write(f"{renderer}+{encoding}: p50={result['p50']} ms, {result['bytes']} bytes")
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from first_app.benchmarking import temporary_database
+from first_app.models.book import Book
+from first_app.seeding import seed_catalog
+from first_app.serializers import BookSerializer, BookRowSerializer
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает BookSerializer и BookRowSerializer на сгенерированных книгах. '
+            'Данные создаются во временной SQLite-базе, рабочая база не затрагивается.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--include-related', action='store_true')
+
+    def handle(self, *args, **options):
+        with temporary_database():
+            seed_catalog(options['books'], publishers=10, genres=10, genres_per_book=1)
+            self.run(options['repeat'], options['include_related'])
+
+    def measure(self, func, repeat):
+        best = None
+        result = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = JSONRenderer().render(func())
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, result
+
+    def run(self, repeat, include_related):
+        context = {'include_related': include_related}
+        queryset = Book.objects.select_related('publisher').prefetch_related('genres')
+
+        model_time, model_output = self.measure(
+            lambda: BookSerializer(queryset.all(), many=True, context=context).data, repeat)
+
+        row_serializer = BookRowSerializer(context=context)
+        row_time, row_output = self.measure(
+            lambda: row_serializer.to_representation_many(row_serializer.get_queryset(queryset.all())), repeat)
+
+        self.stdout.write(f'BookSerializer:    {model_time * 1000:.1f} ms')
+        self.stdout.write(f'BookRowSerializer: {row_time * 1000:.1f} ms')
+        self.stdout.write(f'Speedup:           {model_time / row_time:.1f}x')
+        if model_output == row_output:
+            self.stdout.write(self.style.SUCCESS('Output is byte-identical.'))
+        else:
+            self.stdout.write(self.style.ERROR('Output differs!'))
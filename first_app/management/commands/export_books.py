@@ -0,0 +1,36 @@
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from first_app.export import make_filter_request, stream_books
+from first_app.views import BookExportView
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка живых книг в NDJSON или CSV с фильтрами как у /books/.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['ndjson', 'csv'], default='ndjson')
+        parser.add_argument('--output', help='Файл для выгрузки (по умолчанию stdout).')
+        parser.add_argument('--chunk-size', type=int, default=settings.BOOKS_EXPORT_CHUNK_SIZE)
+        parser.add_argument('--author')
+        parser.add_argument('--publisher')
+        parser.add_argument('--search')
+        parser.add_argument('--ordering')
+
+    def handle(self, *args, **options):
+        view = BookExportView()
+        view.request = make_filter_request({
+            name: options[name] for name in ('author', 'publisher', 'search', 'ordering')
+        })
+        view.format_kwarg = None
+        queryset = view.filter_queryset(view.get_queryset())
+
+        output = open(options['output'], 'w', newline='', encoding='utf-8') if options['output'] else sys.stdout
+        try:
+            for chunk in stream_books(queryset, options['format'], options['chunk_size']):
+                output.write(chunk)
+        finally:
+            if output is not sys.stdout:
+                output.close()
@@ -0,0 +1,228 @@
+import asyncio
+import importlib.util
+import json
+import platform
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from urllib.parse import urlsplit
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from first_app.benchmarking import latency_summary
+from first_app.models.book import Book
+
+# Пары маршрутов: синхронный (WSGI) и его async-версия (ASGI)
+ROUTES = {
+    'book-list': ('book-list-create', 'async-book-list', {}),
+    'book-detail': ('book-detail-update-delete', 'async-book-detail', {'pk': None}),
+    'book-expensive': ('book-expensive', 'async-book-expensive', {}),
+    'genre-statistic': ('genre-statistic', 'async-genre-statistic', {}),
+}
+
+
+class HttpConnection:
+    """Минимальный HTTP/1.1-клиент на asyncio с keep-alive, чтобы не зависеть от aiohttp/httpx."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = self.writer = None
+
+    async def get(self, path):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        self.writer.write(f'GET {path} HTTP/1.1\r\nHost: {self.host}\r\nAccept: application/json\r\n\r\n'.encode())
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b'\r\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        if 'content-length' in headers:
+            await self.reader.readexactly(int(headers['content-length']))
+            if headers.get('connection', '').lower() == 'close':
+                await self.close()
+        else:
+            # Без Content-Length тело заканчивается закрытием соединения
+            await self.reader.read()
+            await self.close()
+        return status
+
+    async def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except ConnectionError:
+                pass
+        self.reader = self.writer = None
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест read-эндпоинтов: async-версии под uvicorn (ASGI) против синхронных '
+            'под gunicorn или runserver (WSGI) на нескольких уровнях конкурентности. Результат - JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--servers', default='asgi,wsgi', help='asgi, wsgi или оба через запятую.')
+        parser.add_argument('--asgi-url', help='Адрес уже запущенного uvicorn. Если не задан, он запускается на --asgi-port.')
+        parser.add_argument('--wsgi-url', help='Адрес уже запущенного WSGI-сервера. Если не задан, запускается '
+                                               'gunicorn (или runserver, если gunicorn не установлен) на --wsgi-port.')
+        parser.add_argument('--asgi-port', type=int, default=8766)
+        parser.add_argument('--wsgi-port', type=int, default=8767)
+        parser.add_argument('--workers', type=int, default=1, help='Процессов на сервер.')
+        parser.add_argument('--threads', type=int, default=8, help='Потоков на процесс gunicorn.')
+        parser.add_argument('--concurrency', default='1,10,50', help='Уровни конкурентности через запятую.')
+        parser.add_argument('--requests', type=int, default=500, help='Запросов на маршрут и уровень.')
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument('--only', help='Список маршрутов через запятую.')
+        parser.add_argument('--output', help='Файл для JSON-отчёта (по умолчанию stdout).')
+
+    def build_targets(self, only):
+        pk = (Book.objects.filter(is_banned=False).order_by('pk').values_list('pk', flat=True).first())
+        if pk is None:
+            raise CommandError('No books in the database, run seed_catalog first.')
+        targets = {}
+        for name, (sync_name, async_name, kwargs) in ROUTES.items():
+            if only and name not in only:
+                continue
+            kwargs = {key: pk for key in kwargs}
+            targets[name] = {'wsgi': reverse(sync_name, kwargs=kwargs), 'asgi': reverse(async_name, kwargs=kwargs)}
+        return targets
+
+    def server_command(self, kind, port, options):
+        bind = f'127.0.0.1:{port}'
+        if kind == 'asgi':
+            if importlib.util.find_spec('uvicorn') is None:
+                raise CommandError('uvicorn is not installed (pip install uvicorn) or pass --asgi-url.')
+            return [sys.executable, '-m', 'uvicorn', 'config.asgi:application', '--host', '127.0.0.1',
+                    '--port', str(port), '--workers', str(options['workers']), '--no-access-log',
+                    '--log-level', 'warning'], 'uvicorn'
+        if importlib.util.find_spec('gunicorn') is not None:
+            return [sys.executable, '-m', 'gunicorn', 'config.wsgi:application', '--bind', bind,
+                    '--workers', str(options['workers']), '--threads', str(options['threads']),
+                    '--log-level', 'warning'], 'gunicorn'
+        self.stderr.write('gunicorn is not installed, WSGI side falls back to runserver.')
+        return [sys.executable, 'manage.py', 'runserver', '--noreload', bind], 'runserver'
+
+    def start_server(self, kind, port, options):
+        command, name = self.server_command(kind, port, options)
+        process = subprocess.Popen(command, cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        base_url = f'http://127.0.0.1:{port}'
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f'{name} exited with code {process.returncode}.')
+            try:
+                urllib.request.urlopen(base_url + reverse('genre-statistic'), timeout=1).read()
+                return process, base_url, name
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.2)
+        process.terminate()
+        raise CommandError(f'{name} did not start in 30 seconds.')
+
+    async def run_level(self, base_url, path, requests, concurrency):
+        url = urlsplit(base_url)
+        remaining = requests
+        latencies = []
+        errors = shed = 0
+
+        async def worker():
+            nonlocal remaining, errors, shed
+            client = HttpConnection(url.hostname, url.port or 80)
+            try:
+                while remaining > 0:
+                    remaining -= 1
+                    started = time.perf_counter()
+                    try:
+                        status = await client.get(path)
+                    except (ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+                        await client.close()
+                        status = 599
+                    latencies.append((time.perf_counter() - started) * 1000)
+                    if status == 503:
+                        # Отказ admission control (first_app/admission.py), а не ошибка
+                        shed += 1
+                    elif status >= 400:
+                        errors += 1
+            finally:
+                await client.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        return {
+            'requests': len(latencies),
+            'errors': errors,
+            'shed': shed,
+            'throughput_rps': round(len(latencies) / elapsed, 2) if elapsed else None,
+            'latency_ms': latency_summary(latencies),
+        }
+
+    def handle(self, *args, **options):
+        servers = [kind.strip() for kind in options['servers'].split(',') if kind.strip()]
+        if not set(servers) <= {'asgi', 'wsgi'}:
+            raise CommandError('--servers accepts only asgi and wsgi.')
+        levels = [int(level) for level in options['concurrency'].split(',')]
+        only = set(options['only'].split(',')) if options['only'] else None
+        targets = self.build_targets(only)
+
+        report = {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'requests': options['requests'],
+                'concurrency': levels,
+                'workers': options['workers'],
+                'books': Book.objects.count(),
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'servers': {},
+            },
+            'results': {},
+        }
+        # Соединения этого процесса не должны держать блокировки SQLite во время теста
+        connection.close()
+
+        for kind in servers:
+            process = None
+            base_url = options[f'{kind}_url']
+            server_name = 'external'
+            if not base_url:
+                process, base_url, server_name = self.start_server(kind, options[f'{kind}_port'], options)
+            report['meta']['servers'][kind] = server_name
+            try:
+                results = report['results'][kind] = {}
+                for name, paths in targets.items():
+                    path = paths[kind]
+                    asyncio.run(self.run_level(base_url, path, options['warmup'], 1))
+                    results[name] = {'url': path, 'levels': {}}
+                    for level in levels:
+                        result = asyncio.run(self.run_level(base_url, path, options['requests'], level))
+                        results[name]['levels'][str(level)] = result
+                        self.stderr.write(f"{kind} {name} c={level}: p50={result['latency_ms']['p50']} ms, "
+                                          f"p99={result['latency_ms']['p99']} ms, {result['throughput_rps']} req/s, "
+                                          f"errors={result['errors']}")
+            finally:
+                if process is not None:
+                    process.terminate()
+                    process.wait()
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,80 @@
+import json
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+
+from first_app.profiling import get_dump_dir
+
+
+class Command(BaseCommand):
+    help = 'Выводит данные профилировщика SQL-запросов, собранные всеми процессами.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument('--json', action='store_true', help='Вывести сводку в JSON.')
+        parser.add_argument('--clear', action='store_true', help='Удалить собранные данные после вывода.')
+
+    def load_profiles(self):
+        profiles = []
+        for path in sorted(get_dump_dir().glob('query-profile-*.json')):
+            try:
+                profiles.extend(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def summarize(self, profiles, top):
+        views = defaultdict(lambda: {'requests': 0, 'queries': 0, 'query_time_ms': 0.0})
+        duplicates = defaultdict(lambda: {'requests': 0, 'max_count': 0, 'views': set()})
+        slow = []
+        for profile in profiles:
+            view = views[profile['view'] or profile['path']]
+            view['requests'] += 1
+            view['queries'] += profile['query_count']
+            view['query_time_ms'] += profile['query_time_ms']
+            for item in profile['duplicates']:
+                duplicate = duplicates[item['sql']]
+                duplicate['requests'] += 1
+                duplicate['max_count'] = max(duplicate['max_count'], item['count'])
+                duplicate['views'].add(profile['view'] or profile['path'])
+            slow.extend(dict(item, view=profile['view'], path=profile['path']) for item in profile['slow'])
+
+        return {
+            'requests': len(profiles),
+            'views': sorted(
+                ({'view': name, **stats,
+                  'avg_queries': round(stats['queries'] / stats['requests'], 2),
+                  'avg_query_time_ms': round(stats['query_time_ms'] / stats['requests'], 3)}
+                 for name, stats in views.items()),
+                key=lambda item: item['query_time_ms'], reverse=True,
+            )[:top],
+            'slow_queries': sorted(slow, key=lambda item: item['duration_ms'], reverse=True)[:top],
+            'duplicate_queries': sorted(
+                ({'sql': sql, 'requests': stats['requests'], 'max_count': stats['max_count'],
+                  'views': sorted(stats['views'])} for sql, stats in duplicates.items()),
+                key=lambda item: (item['requests'], item['max_count']), reverse=True,
+            )[:top],
+        }
+
+    def handle(self, *args, **options):
+        summary = self.summarize(self.load_profiles(), options['top'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(summary, indent=2))
+        else:
+            self.stdout.write(f"Profiled requests: {summary['requests']}")
+            self.stdout.write('\nViews by total query time:')
+            for item in summary['views']:
+                self.stdout.write(f"  {item['view']}: {item['requests']} requests, "
+                                  f"{item['avg_queries']} queries/request, {item['avg_query_time_ms']} ms/request")
+            self.stdout.write('\nSlowest queries:')
+            for item in summary['slow_queries']:
+                self.stdout.write(f"  {item['duration_ms']} ms [{item['view']}] {item['sql'][:200]}")
+            self.stdout.write('\nRepeated queries (possible N+1):')
+            for item in summary['duplicate_queries']:
+                self.stdout.write(f"  x{item['max_count']} in {item['requests']} requests "
+                                  f"{item['views']} {item['sql'][:200]}")
+
+        if options['clear']:
+            for path in get_dump_dir().glob('query-profile-*.json'):
+                path.unlink(missing_ok=True)
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from first_app.search import get_fulltext_backend, rebuild_fulltext_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает полнотекстовый индекс книг (таблицу book_fts) по данным Book и Author.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        backend = get_fulltext_backend(using)
+        if backend is None:
+            self.stdout.write(self.style.WARNING('Full-text index is not installed, nothing to rebuild.'))
+            return
+        rebuild_fulltext_index(connections[using])
+        self.stdout.write(self.style.SUCCESS(f'Full-text index rebuilt ({backend}).'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from first_app.models.book import Genre
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает Genre.book_count с нуля по живым книгам (не удалённым и не забаненным).'
+
+    def handle(self, *args, **options):
+        updated = Genre.objects.all().refresh_book_counts()
+        self.stdout.write(self.style.SUCCESS(f'Recounted book_count, {updated} genres changed.'))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from first_app.seeding import SCALES, seed_catalog
+
+
+class Command(BaseCommand):
+    help = 'Заполняет БД детерминированным каталогом книг для бенчмарков (bulk_create).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), help='Готовый размер: 10k, 100k или 1m книг.')
+        parser.add_argument('--books', type=int, help='Число книг (перекрывает --scale).')
+        parser.add_argument('--publishers', type=int, default=100)
+        parser.add_argument('--genres', type=int, default=30)
+        parser.add_argument('--authors', type=int, default=2000)
+        parser.add_argument('--genres-per-book', type=int, default=2)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        books = options['books'] or SCALES.get(options['scale'])
+        if not books:
+            raise CommandError('Pass --scale or --books.')
+
+        started = time.perf_counter()
+        created = seed_catalog(
+            books,
+            publishers=options['publishers'],
+            genres=options['genres'],
+            authors=options['authors'],
+            genres_per_book=options['genres_per_book'],
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+        )
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Created {created} books in {elapsed:.1f} s.'))
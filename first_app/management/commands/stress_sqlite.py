@@ -0,0 +1,143 @@
+import io
+import json
+import random
+import threading
+import time
+from contextlib import redirect_stdout
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, OperationalError
+from django.test import Client
+from django.urls import reverse
+
+from first_app.benchmarking import latency_summary, temporary_database
+from first_app.models.book import Book
+from first_app.seeding import seed_catalog
+
+
+class Command(BaseCommand):
+    help = ('Нагрузочный тест SQLite: читатели (GET /books/ и детальная страница) и писатели '
+            '(POST /books/, PATCH и DELETE детальной страницы) одновременно, на временной базе. '
+            'Сравнивает профиль по умолчанию и SQLITE_PROFILE=concurrent, результат - JSON.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default='default,concurrent')
+        parser.add_argument('--readers', type=int, default=16)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument('--duration', type=float, default=10, help='Секунд на профиль.')
+        parser.add_argument('--books', type=int, default=2000, help='Книг в начальном каталоге.')
+        parser.add_argument('--output', help='Файл для JSON-отчёта (по умолчанию stdout).')
+
+    def handle(self, *args, **options):
+        if not hasattr(settings, 'SQLITE_CONCURRENT_OPTIONS'):
+            raise CommandError('The stress test needs the SQLite configuration (MYSQL is set).')
+        self.host = next((host for host in settings.ALLOWED_HOSTS if host not in ('*', '')), 'localhost').lstrip('.')
+        report = {
+            'meta': {key: options[key] for key in ('readers', 'writers', 'duration', 'books')},
+            'profiles': {},
+        }
+        for profile in options['profiles'].split(','):
+            with temporary_database(*self.get_engine(profile)):
+                seed_catalog(options['books'])
+                book_ids = list(Book.objects.values_list('pk', flat=True))
+                connections.close_all()
+                # DELETE детальной страницы печатает в stdout, а stdout команды - это JSON-отчёт
+                with redirect_stdout(io.StringIO()):
+                    result = self.run_profile(book_ids, options)
+            report['profiles'][profile] = result
+            self.stderr.write(f"{profile}: {result['reads']['throughput_rps']} reads/s, "
+                              f"{result['writes']['throughput_rps']} writes/s, "
+                              f"locked={result['locked_errors']}, other errors={result['other_errors']}")
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output)
+        else:
+            self.stdout.write(output)
+
+    def get_engine(self, profile):
+        if profile == 'default':
+            return 'django.db.backends.sqlite3', {}
+        if profile == 'concurrent':
+            return settings.SQLITE_CONCURRENT_ENGINE, settings.SQLITE_CONCURRENT_OPTIONS
+        raise CommandError(f'Unknown profile {profile!r}, use default or concurrent.')
+
+    def run_profile(self, book_ids, options):
+        stop_at = time.monotonic() + options['duration']
+        stats = {'reads': [], 'writes': [], 'locked_errors': 0, 'other_errors': 0}
+        stats_lock = threading.Lock()
+        book_list = reverse('book-list-create')
+        pages = max(1, len(book_ids) // 5)
+
+        def timed(kind, request):
+            started = time.perf_counter()
+            try:
+                response = request()
+                error = response.status_code >= 500
+            except OperationalError as exc:
+                error = 'locked' if 'locked' in str(exc) else True
+            except Exception:
+                error = True
+            latency = (time.perf_counter() - started) * 1000
+            with stats_lock:
+                if error == 'locked':
+                    stats['locked_errors'] += 1
+                elif error:
+                    stats['other_errors'] += 1
+                else:
+                    stats[kind].append(latency)
+
+        def reader(seed):
+            rnd = random.Random(seed)
+            client = Client(HTTP_HOST=self.host)
+            try:
+                while time.monotonic() < stop_at:
+                    if rnd.random() < 0.5:
+                        timed('reads', lambda: client.get(f'{book_list}?page={rnd.randint(1, pages)}'))
+                    else:
+                        pk = rnd.choice(book_ids)
+                        timed('reads', lambda: client.get(reverse('book-detail-update-delete', kwargs={'pk': pk})))
+            finally:
+                connections.close_all()
+
+        def writer(seed):
+            rnd = random.Random(seed)
+            client = Client(HTTP_HOST=self.host)
+            number = 0
+            try:
+                while time.monotonic() < stop_at:
+                    number += 1
+                    action = rnd.random()
+                    if action < 0.5:
+                        payload = {'title': f'Stress {seed}-{number}', 'author': f'Author {rnd.randrange(100)}',
+                                   'published_date': '2020-01-01', 'price': rnd.randint(5, 500)}
+                        timed('writes', lambda: client.post(book_list, payload, content_type='application/json'))
+                    elif action < 0.9:
+                        url = reverse('book-detail-update-delete', kwargs={'pk': rnd.choice(book_ids)})
+                        timed('writes', lambda: client.patch(url, {'price': rnd.randint(5, 500)},
+                                                             content_type='application/json'))
+                    else:
+                        url = reverse('book-detail-update-delete', kwargs={'pk': rnd.choice(book_ids)})
+                        timed('writes', lambda: client.delete(url))
+            finally:
+                connections.close_all()
+
+        threads = ([threading.Thread(target=reader, args=(i,)) for i in range(options['readers'])]
+                   + [threading.Thread(target=writer, args=(1000 + i,)) for i in range(options['writers'])])
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        return {
+            'reads': {'requests': len(stats['reads']), 'throughput_rps': round(len(stats['reads']) / elapsed, 2),
+                      'latency_ms': latency_summary(stats['reads'])},
+            'writes': {'requests': len(stats['writes']), 'throughput_rps': round(len(stats['writes']) / elapsed, 2),
+                       'latency_ms': latency_summary(stats['writes'])},
+            'locked_errors': stats['locked_errors'],
+            'other_errors': stats['other_errors'],
+        }
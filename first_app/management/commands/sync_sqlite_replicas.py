@@ -0,0 +1,33 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from first_app.routers import get_replicas
+
+
+class Command(BaseCommand):
+    help = ('Копирует основную SQLite-базу в файлы реплик (SQLITE_REPLICA_PATHS) через backup API. '
+            'Заменяет репликацию при локальной проверке маршрутизации чтения.')
+
+    def handle(self, *args, **options):
+        primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+        # По vendor, а не по ENGINE: подходят и наследники SQLite-бэкенда (first_app.backends.sqlite3)
+        if connections[DEFAULT_DB_ALIAS].vendor != 'sqlite':
+            raise CommandError('The default database is not SQLite; replicas are managed by the database server.')
+        replicas = get_replicas()
+        if not replicas:
+            raise CommandError('No replicas configured, set SQLITE_REPLICA_PATHS.')
+
+        source = sqlite3.connect(primary['NAME'])
+        try:
+            for alias in replicas:
+                target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f"{alias}: {settings.DATABASES[alias]['NAME']}")
+        finally:
+            source.close()
@@ -1,6 +1,96 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 
 
-class SoftDeleteManager(models.Manager):
+class BookQuerySet(models.QuerySet):
+    """
+    Массовая смена состояния книг одним UPDATE. save() и сигналы по каждой книге не вызываются,
+    поэтому производные данные (Genre.book_count, кэши) обновляются здесь же.
+    Возвращают число изменённых книг.
+    """
+
+    def soft_delete(self):
+        now = timezone.now()
+        return self._change_state(self.filter(is_deleted=False), is_deleted=True, deleted_at=now, updated_at=now)
+
+    def restore(self):
+        return self._change_state(self.filter(is_deleted=True), is_deleted=False, deleted_at=None,
+                                  updated_at=timezone.now())
+
+    def set_banned(self, banned):
+        return self._change_state(self.exclude(is_banned=banned), is_banned=banned, updated_at=timezone.now())
+
+    def _change_state(self, queryset, **values):
+        from first_app.cache import invalidate_all_books, invalidate_average_price, invalidate_counts
+
+        genres = self.model._meta.get_field('genres')
+        with transaction.atomic(using=self.db):
+            genre_ids = list(genres.remote_field.through.objects
+                             .filter(book__in=queryset.values('pk'))
+                             .values_list('genre_id', flat=True)
+                             .distinct())
+            updated = queryset.update(**values)
+            if updated:
+                if genre_ids:
+                    genres.related_model.objects.filter(pk__in=genre_ids).refresh_book_counts()
+                transaction.on_commit(invalidate_average_price, using=self.db)
+                transaction.on_commit(lambda: invalidate_counts(self.model), using=self.db)
+                transaction.on_commit(invalidate_all_books, using=self.db)
+        return updated
+
+
+class SoftDeleteManager(models.Manager.from_queryset(BookQuerySet)):
     def get_queryset(self):
         return super().get_queryset().filter(is_deleted=False)
+
+
+class GenreQuerySet(models.QuerySet):
+    def refresh_book_counts(self):
+        """
+        Пересчитывает Genre.book_count одним UPDATE с подзапросом по таблице связей.
+        Учитываются только живые книги (не удалённые и не забаненные). Жанрам, у которых
+        счётчик изменился, сдвигается updated_at - от него зависят ETag и Last-Modified жанров.
+        Возвращает число изменённых жанров.
+        """
+        through = self.model.books.through
+        live_links = (through.objects
+                      .filter(genre_id=OuterRef('pk'), book__is_deleted=False, book__is_banned=False)
+                      .order_by()
+                      .values('genre_id')
+                      .annotate(count=Count('*'))
+                      .values('count'))
+        fresh_count = Coalesce(Subquery(live_links), 0)
+        return (self.alias(fresh_count=fresh_count)
+                .exclude(book_count=F('fresh_count'))
+                .update(book_count=fresh_count, updated_at=timezone.now()))
+
+
+class AuthorQuerySet(models.QuerySet):
+    """Поиск авторов по имени (Author.name уникально) с созданием недостающих."""
+
+    def get_by_name(self, name):
+        """Автор с этим именем; если такого нет, он создаётся (гонку с параллельным созданием решает get_or_create)."""
+        return self.get_or_create(name=name)[0]
+
+    def ids_by_name(self, names, batch_size=1000):
+        """
+        {имя: id} для набора имён: один SELECT на пакет имён, недостающие авторы
+        создаются через bulk_create. Имена, которые успел создать параллельный запрос,
+        пропускаются (ignore_conflicts), поэтому id созданных дочитываются по именам.
+        """
+        names = list(set(names))
+        ids = self._ids_by_name(names, batch_size)
+        missing = [name for name in names if name not in ids]
+        if missing:
+            self.bulk_create([self.model(name=name) for name in missing], batch_size=batch_size,
+                             ignore_conflicts=True)
+            ids.update(self._ids_by_name(missing, batch_size))
+        return ids
+
+    def _ids_by_name(self, names, batch_size):
+        ids = {}
+        for start in range(0, len(names), batch_size):
+            ids.update(self.filter(name__in=names[start:start + batch_size]).values_list('name', 'pk'))
+        return ids
@@ -0,0 +1,252 @@
+# Generated by Django 5.1.1 on 2026-10-18 00:31
+
+import django.contrib.auth.models
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+# Полнотекстовый индекс версии 2 - тот же SQL, что в 0018 (зафиксирован, не зависит от first_app/search.py)
+FTS_TABLE = 'book_fts'
+AUTHOR_NAME = 'SELECT name FROM first_app_author WHERE id = {}'
+
+SQLITE_INSTALL = [
+    # Своё содержимое вместо content='Book': имени автора в Book больше нет
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(title, author)',
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON "Book" BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, author)
+        VALUES (new.id, new.title, ({AUTHOR_NAME.format('new.author_id')}));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON "Book" BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, author_id ON "Book" BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE}(rowid, title, author)
+        VALUES (new.id, new.title, ({AUTHOR_NAME.format('new.author_id')}));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_author_au AFTER UPDATE OF name ON first_app_author BEGIN
+        UPDATE {FTS_TABLE} SET author = new.name
+        WHERE rowid IN (SELECT id FROM "Book" WHERE author_id = new.id);
+    END""",
+    f'DELETE FROM {FTS_TABLE}',
+    f"""INSERT INTO {FTS_TABLE} (rowid, title, author)
+        SELECT "Book".id, "Book".title, first_app_author.name FROM "Book"
+        LEFT JOIN first_app_author ON first_app_author.id = "Book".author_id""",
+]
+
+MYSQL_INSTALL = [
+    f"""CREATE TABLE IF NOT EXISTS {FTS_TABLE} (
+        book_id BIGINT NOT NULL PRIMARY KEY,
+        title VARCHAR(200) NOT NULL,
+        author VARCHAR(100) NULL,
+        FULLTEXT INDEX book_title_author_fulltext (title, author)
+    ) ENGINE=InnoDB""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON `Book` FOR EACH ROW
+        INSERT INTO {FTS_TABLE} (book_id, title, author)
+        VALUES (NEW.id, NEW.title, ({AUTHOR_NAME.format('NEW.author_id')}))""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON `Book` FOR EACH ROW
+        DELETE FROM {FTS_TABLE} WHERE book_id = OLD.id""",
+    # В MySQL нет UPDATE OF <столбцы>, поэтому проверяем изменения сами
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON `Book` FOR EACH ROW
+    BEGIN
+        IF NOT (NEW.title <=> OLD.title AND NEW.author_id <=> OLD.author_id) THEN
+            REPLACE INTO {FTS_TABLE} (book_id, title, author)
+            VALUES (NEW.id, NEW.title, ({AUTHOR_NAME.format('NEW.author_id')}));
+        END IF;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_author_au AFTER UPDATE ON first_app_author FOR EACH ROW
+    BEGIN
+        IF NOT (NEW.name <=> OLD.name) THEN
+            UPDATE {FTS_TABLE} JOIN `Book` ON `Book`.id = {FTS_TABLE}.book_id
+            SET {FTS_TABLE}.author = NEW.name
+            WHERE `Book`.author_id = NEW.id;
+        END IF;
+    END""",
+    f'DELETE FROM {FTS_TABLE}',
+    f"""INSERT INTO {FTS_TABLE} (book_id, title, author)
+        SELECT `Book`.id, `Book`.title, first_app_author.name FROM `Book`
+        LEFT JOIN first_app_author ON first_app_author.id = `Book`.author_id""",
+]
+
+UNINSTALL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_author_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def install_fulltext(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite' and sqlite_has_fts5(connection):
+        statements = SQLITE_INSTALL
+    elif connection.vendor == 'mysql':
+        statements = MYSQL_INSTALL
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def uninstall_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'mysql'):
+        for sql in UNINSTALL:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+    """
+    0001-0018 одной миграцией: сразу итоговая схема (включая полнотекстовый индекс версии 2)
+    без промежуточных переименований и переносов данных. Базы, где 0001-0018 уже применены,
+    считают её применённой; старые миграции остаются, пока не обновлены все такие базы.
+    """
+
+    replaces = [
+        ('first_app', '0001_initial'),
+        ('first_app', '0002_book_publisher'),
+        ('first_app', '0003_rename_register_date_publisher_established_date'),
+        ('first_app', '0004_rename_established_date_publisher_register_date'),
+        ('first_app', '0005_rename_register_date_publisher_established_date'),
+        ('first_app', '0006_genre_book_genre'),
+        ('first_app', '0007_book_is_banned'),
+        ('first_app', '0008_rename_genre_book_genres'),
+        ('first_app', '0009_book_is_deleted_alter_book_genres'),
+        ('first_app', '0010_book_pub_date_id_index'),
+        ('first_app', '0011_book_updated_at_genre_updated_at'),
+        ('first_app', '0012_genre_book_count'),
+        ('first_app', '0013_book_price_id_index'),
+        ('first_app', '0014_book_fulltext_index'),
+        ('first_app', '0015_book_live_indexes_and_archive'),
+        ('first_app', '0016_author_name_publisher_name_indexes'),
+        ('first_app', '0017_book_author_idx'),
+        ('first_app', '0018_book_author_fk'),
+    ]
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Author',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, max_length=100)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BookArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('author_id', models.BigIntegerField(null=True)),
+                ('published_date', models.DateField()),
+                ('registered', models.BooleanField(null=True)),
+                ('managed', models.BooleanField(null=True)),
+                ('page_count', models.IntegerField(null=True)),
+                ('price', models.IntegerField(null=True)),
+                ('discounted_price', models.IntegerField(null=True)),
+                ('publisher_id', models.BigIntegerField(null=True)),
+                ('is_banned', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField()),
+                ('deleted_at', models.DateTimeField(null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'BookArchive',
+            },
+        ),
+        migrations.CreateModel(
+            name='Genre',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+                ('book_count', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Publisher',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(db_index=True, max_length=75)),
+                ('established_date', models.DateField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CustomUser',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('is_superuser', models.BooleanField(default=False, help_text='Designates that this user has all permissions without explicitly assigning them.', verbose_name='superuser status')),
+                ('username', models.CharField(max_length=30, unique=True)),
+                ('email', models.EmailField(max_length=254, unique=True, verbose_name='email address')),
+                ('first_name', models.CharField(max_length=30, verbose_name='first name')),
+                ('last_name', models.CharField(max_length=30, verbose_name='last name')),
+                ('is_staff', models.BooleanField(default=False)),
+                ('is_active', models.BooleanField(default=True)),
+                ('date_joined', models.DateTimeField(default=django.utils.timezone.now)),
+                ('birth_date', models.DateField(blank=True, null=True)),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
+            ],
+            options={
+                'abstract': False,
+            },
+            managers=[
+                ('objects', django.contrib.auth.models.UserManager()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BookGenreArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('genre_id', models.BigIntegerField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='genre_links', to='first_app.bookarchive')),
+            ],
+            options={
+                'db_table': 'BookGenreArchive',
+            },
+        ),
+        migrations.CreateModel(
+            name='Book',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('published_date', models.DateField(verbose_name='publication_date')),
+                ('registered', models.BooleanField(null=True)),
+                ('managed', models.BooleanField(null=True)),
+                ('page_count', models.IntegerField(null=True)),
+                ('price', models.IntegerField(null=True)),
+                ('discounted_price', models.IntegerField(null=True)),
+                ('is_banned', models.BooleanField(default=False)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True)),
+                ('deleted_at', models.DateTimeField(blank=True, null=True)),
+                ('author', models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='books', to='first_app.author')),
+                ('genres', models.ManyToManyField(blank=True, related_name='books', to='first_app.genre')),
+                ('publisher', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='first_app.publisher')),
+            ],
+            options={
+                'verbose_name': 'fiction book',
+                'verbose_name_plural': 'fiction books',
+                'db_table': 'Book',
+                'ordering': ['published_date'],
+                'get_latest_by': 'published_date',
+                'indexes': [models.Index(fields=['title', 'author'], name='title_auth_index'), models.Index(fields=['published_date', 'id'], name='pub_date_id_index'), models.Index(fields=['price', 'id'], name='price_id_index'), models.Index(condition=models.Q(('is_deleted', False)), fields=['published_date', 'id'], name='live_pub_date_id_idx'), models.Index(condition=models.Q(('is_deleted', False)), fields=['author', 'published_date', 'id'], name='live_author_idx'), models.Index(condition=models.Q(('is_deleted', False)), fields=['publisher', 'published_date', 'id'], name='live_publisher_idx'), models.Index(condition=models.Q(('is_deleted', False)), fields=['title'], name='live_title_idx'), models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at', 'id'], name='deleted_at_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('registered', True)), fields=('title',), name='unique_title_registered')],
+                'unique_together': {('title', 'author')},
+            },
+        ),
+        migrations.RunPython(install_fulltext, uninstall_fulltext),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-17 23:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_app', '0009_book_is_deleted_alter_book_genres'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['published_date', 'id'], name='pub_date_id_index'),
+        ),
+    ]
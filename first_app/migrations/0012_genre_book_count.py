@@ -0,0 +1,33 @@
+# Generated by Django 5.1.1 on 2026-10-17 23:35
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_book_count(apps, schema_editor):
+    Genre = apps.get_model('first_app', 'Genre')
+    Book = apps.get_model('first_app', 'Book')
+    live_links = (Book.genres.through.objects
+                  .filter(genre_id=OuterRef('pk'), book__is_deleted=False, book__is_banned=False)
+                  .order_by()
+                  .values('genre_id')
+                  .annotate(count=Count('*'))
+                  .values('count'))
+    Genre.objects.update(book_count=Coalesce(Subquery(live_links), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_app', '0011_book_updated_at_genre_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='genre',
+            name='book_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_book_count, migrations.RunPython.noop),
+    ]
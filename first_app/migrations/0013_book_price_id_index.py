@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-17 23:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_app', '0012_genre_book_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['price', 'id'], name='price_id_index'),
+        ),
+    ]
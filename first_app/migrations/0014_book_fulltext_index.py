@@ -0,0 +1,71 @@
+# Generated by Django 5.1.1 on 2026-10-18 00:05
+
+from django.db import migrations
+
+# Версия 1: author - ещё текстовый столбец Book. SQL зафиксирован здесь, а не берётся из
+# first_app/search.py: историческая миграция не должна меняться вместе с кодом приложения.
+FTS_TABLE = 'book_fts'
+FULLTEXT_INDEX = 'book_title_author_fulltext'
+
+SQLITE_INSTALL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}
+        USING fts5(title, author, content='Book', content_rowid='id')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON "Book" BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON "Book" BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, author ON "Book" BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+        INSERT INTO {FTS_TABLE}(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def mysql_book_has_fulltext(connection):
+    with connection.cursor() as cursor:
+        return FULLTEXT_INDEX in connection.introspection.get_constraints(cursor, 'Book')
+
+
+def install(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite' and sqlite_has_fts5(connection):
+        for sql in SQLITE_INSTALL:
+            schema_editor.execute(sql)
+    elif connection.vendor == 'mysql' and not mysql_book_has_fulltext(connection):
+        schema_editor.execute(f'CREATE FULLTEXT INDEX {FULLTEXT_INDEX} ON `Book` (title, author)')
+
+
+def uninstall(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        for sql in SQLITE_UNINSTALL:
+            schema_editor.execute(sql)
+    elif connection.vendor == 'mysql' and mysql_book_has_fulltext(connection):
+        schema_editor.execute(f'DROP INDEX {FULLTEXT_INDEX} ON `Book`')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_app', '0013_book_price_id_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
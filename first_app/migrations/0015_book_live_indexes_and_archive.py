@@ -0,0 +1,84 @@
+# Generated by Django 5.1.1 on 2026-10-17 23:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_deleted_at(apps, schema_editor):
+    # Для уже удалённых книг точное время удаления неизвестно, ближайшее - последнее изменение
+    Book = apps.get_model('first_app', 'Book')
+    Book._base_manager.filter(is_deleted=True, deleted_at__isnull=True).update(deleted_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_app', '0014_book_fulltext_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('title', models.CharField(max_length=200)),
+                ('author', models.CharField(max_length=40, null=True)),
+                ('published_date', models.DateField()),
+                ('registered', models.BooleanField(null=True)),
+                ('managed', models.BooleanField(null=True)),
+                ('page_count', models.IntegerField(null=True)),
+                ('price', models.IntegerField(null=True)),
+                ('discounted_price', models.IntegerField(null=True)),
+                ('publisher_id', models.BigIntegerField(null=True)),
+                ('is_banned', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField()),
+                ('deleted_at', models.DateTimeField(null=True)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'BookArchive',
+            },
+        ),
+        migrations.CreateModel(
+            name='BookGenreArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('genre_id', models.BigIntegerField()),
+            ],
+            options={
+                'db_table': 'BookGenreArchive',
+            },
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_deleted_at, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['published_date', 'id'], name='live_pub_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['author', 'published_date', 'id'], name='live_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['publisher', 'published_date', 'id'], name='live_publisher_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['title'], name='live_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['deleted_at', 'id'], name='deleted_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='bookgenrearchive',
+            name='book',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='genre_links', to='first_app.bookarchive'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-18 00:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_app', '0016_author_name_publisher_name_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['author'], name='author_idx'),
+        ),
+    ]
@@ -0,0 +1,264 @@
+# Generated by Django 5.1.1 on 2026-10-18 00:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Q, Subquery
+from django.db.models.functions import Left
+
+BATCH_SIZE = 2000
+
+
+def _id_batches(model):
+    # Пакеты по диапазонам id: каждый UPDATE затрагивает не больше BATCH_SIZE строк
+    last_id = model._base_manager.aggregate(last=Max('pk'))['last'] or 0
+    for start in range(0, last_id + 1, BATCH_SIZE):
+        yield model._base_manager.filter(pk__gte=start, pk__lt=start + BATCH_SIZE)
+
+
+def backfill_authors(apps, schema_editor):
+    Author = apps.get_model('first_app', 'Author')
+    Book = apps.get_model('first_app', 'Book')
+    BookArchive = apps.get_model('first_app', 'BookArchive')
+
+    # По одному автору на имя; уже существующие записи Author используются повторно
+    names = set(Book._base_manager.filter(author__isnull=False).values_list('author', flat=True).distinct())
+    names.update(BookArchive.objects.filter(author__isnull=False).values_list('author', flat=True).distinct())
+    names.difference_update(Author.objects.values_list('name', flat=True))
+    names = sorted(names)
+    for start in range(0, len(names), BATCH_SIZE):
+        Author.objects.bulk_create([Author(name=name) for name in names[start:start + BATCH_SIZE]])
+
+    # При дублях имён в Author берётся запись с наименьшим id
+    author_id = Subquery(Author.objects.filter(name=OuterRef('author')).order_by('pk').values('pk')[:1])
+    for batch in _id_batches(Book):
+        batch.filter(author__isnull=False).update(author_ref=author_id)
+    for batch in _id_batches(BookArchive):
+        batch.filter(author__isnull=False).update(author_id=author_id)
+
+
+def restore_author_names(apps, schema_editor):
+    Author = apps.get_model('first_app', 'Author')
+    Book = apps.get_model('first_app', 'Book')
+    BookArchive = apps.get_model('first_app', 'BookArchive')
+
+    # В старом столбце помещалось 40 символов
+    for batch in _id_batches(Book):
+        name = Subquery(Author.objects.filter(pk=OuterRef('author_ref')).values('name')[:1])
+        batch.filter(author_ref__isnull=False).update(author=Left(name, 40))
+    for batch in _id_batches(BookArchive):
+        name = Subquery(Author.objects.filter(pk=OuterRef('author_id')).values('name')[:1])
+        batch.filter(author_id__isnull=False).update(author=Left(name, 40))
+
+
+# Полнотекстовый индекс версии 2. SQL зафиксирован здесь, а не берётся из first_app/search.py:
+# историческая миграция не должна меняться вместе с кодом приложения
+FTS_TABLE = 'book_fts'
+AUTHOR_NAME = 'SELECT name FROM first_app_author WHERE id = {}'
+
+SQLITE_INSTALL = [
+    # Своё содержимое вместо content='Book': имени автора в Book больше нет
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(title, author)',
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON "Book" BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, author)
+        VALUES (new.id, new.title, ({AUTHOR_NAME.format('new.author_id')}));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON "Book" BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, author_id ON "Book" BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE}(rowid, title, author)
+        VALUES (new.id, new.title, ({AUTHOR_NAME.format('new.author_id')}));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_author_au AFTER UPDATE OF name ON first_app_author BEGIN
+        UPDATE {FTS_TABLE} SET author = new.name
+        WHERE rowid IN (SELECT id FROM "Book" WHERE author_id = new.id);
+    END""",
+    f'DELETE FROM {FTS_TABLE}',
+    f"""INSERT INTO {FTS_TABLE} (rowid, title, author)
+        SELECT "Book".id, "Book".title, first_app_author.name FROM "Book"
+        LEFT JOIN first_app_author ON first_app_author.id = "Book".author_id""",
+]
+
+MYSQL_INSTALL = [
+    f"""CREATE TABLE IF NOT EXISTS {FTS_TABLE} (
+        book_id BIGINT NOT NULL PRIMARY KEY,
+        title VARCHAR(200) NOT NULL,
+        author VARCHAR(100) NULL,
+        FULLTEXT INDEX book_title_author_fulltext (title, author)
+    ) ENGINE=InnoDB""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON `Book` FOR EACH ROW
+        INSERT INTO {FTS_TABLE} (book_id, title, author)
+        VALUES (NEW.id, NEW.title, ({AUTHOR_NAME.format('NEW.author_id')}))""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON `Book` FOR EACH ROW
+        DELETE FROM {FTS_TABLE} WHERE book_id = OLD.id""",
+    # В MySQL нет UPDATE OF <столбцы>, поэтому проверяем изменения сами
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON `Book` FOR EACH ROW
+    BEGIN
+        IF NOT (NEW.title <=> OLD.title AND NEW.author_id <=> OLD.author_id) THEN
+            REPLACE INTO {FTS_TABLE} (book_id, title, author)
+            VALUES (NEW.id, NEW.title, ({AUTHOR_NAME.format('NEW.author_id')}));
+        END IF;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_author_au AFTER UPDATE ON first_app_author FOR EACH ROW
+    BEGIN
+        IF NOT (NEW.name <=> OLD.name) THEN
+            UPDATE {FTS_TABLE} JOIN `Book` ON `Book`.id = {FTS_TABLE}.book_id
+            SET {FTS_TABLE}.author = NEW.name
+            WHERE `Book`.author_id = NEW.id;
+        END IF;
+    END""",
+    f'DELETE FROM {FTS_TABLE}',
+    f"""INSERT INTO {FTS_TABLE} (book_id, title, author)
+        SELECT `Book`.id, `Book`.title, first_app_author.name FROM `Book`
+        LEFT JOIN first_app_author ON first_app_author.id = `Book`.author_id""",
+]
+
+UNINSTALL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_author_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+
+def sqlite_has_fts5(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def install_fulltext(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite' and sqlite_has_fts5(connection):
+        statements = SQLITE_INSTALL
+    elif connection.vendor == 'mysql':
+        statements = MYSQL_INSTALL
+    else:
+        return
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def uninstall_fulltext(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'mysql'):
+        for sql in UNINSTALL:
+            schema_editor.execute(sql)
+
+
+# Версия 1 (как в 0014) нужна, чтобы откатить миграцию
+LEGACY_FULLTEXT_INDEX = 'book_title_author_fulltext'
+
+LEGACY_SQLITE_INSTALL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE}
+        USING fts5(title, author, content='Book', content_rowid='id')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON "Book" BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON "Book" BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, author ON "Book" BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, author) VALUES ('delete', old.id, old.title, old.author);
+        INSERT INTO {FTS_TABLE}(rowid, title, author) VALUES (new.id, new.title, new.author);
+    END""",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+
+def mysql_book_has_fulltext(connection):
+    with connection.cursor() as cursor:
+        return LEGACY_FULLTEXT_INDEX in connection.introspection.get_constraints(cursor, 'Book')
+
+
+def uninstall_legacy_fulltext(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        for sql in UNINSTALL:
+            schema_editor.execute(sql)
+    elif connection.vendor == 'mysql' and mysql_book_has_fulltext(connection):
+        schema_editor.execute(f'DROP INDEX {LEGACY_FULLTEXT_INDEX} ON `Book`')
+
+
+def install_legacy_fulltext(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite' and sqlite_has_fts5(connection):
+        for sql in LEGACY_SQLITE_INSTALL:
+            schema_editor.execute(sql)
+    elif connection.vendor == 'mysql' and not mysql_book_has_fulltext(connection):
+        schema_editor.execute(f'CREATE FULLTEXT INDEX {LEGACY_FULLTEXT_INDEX} ON `Book` (title, author)')
+
+
+class Migration(migrations.Migration):
+    """
+    Book.author: текстовое имя -> внешний ключ на Author.
+
+    Сначала добавляется столбец author_ref и заполняется пакетами (авторы создаются
+    по одному на имя), затем старый столбец удаляется, а author_ref переименовывается
+    в author. Уникальность и индексы по автору пересоздаются уже по author_id.
+    Полнотекстовый индекс переходит на версию 2 (имя автора берётся из Author).
+    """
+
+    dependencies = [
+        ('first_app', '0017_book_author_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(uninstall_legacy_fulltext, install_legacy_fulltext),
+        migrations.AlterUniqueTogether(
+            name='book',
+            unique_together=set(),
+        ),
+        migrations.RemoveIndex(
+            model_name='book',
+            name='title_auth_index',
+        ),
+        migrations.RemoveIndex(
+            model_name='book',
+            name='author_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='book',
+            name='live_author_idx',
+        ),
+        migrations.AddField(
+            model_name='book',
+            name='author_ref',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='books',
+                                    to='first_app.author'),
+        ),
+        migrations.AddField(
+            model_name='bookarchive',
+            name='author_id',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.RunPython(backfill_authors, restore_author_names),
+        migrations.RemoveField(
+            model_name='book',
+            name='author',
+        ),
+        migrations.RemoveField(
+            model_name='bookarchive',
+            name='author',
+        ),
+        migrations.RenameField(
+            model_name='book',
+            old_name='author_ref',
+            new_name='author',
+        ),
+        migrations.AlterUniqueTogether(
+            name='book',
+            unique_together={('title', 'author')},
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['title', 'author'], name='title_auth_index'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(condition=Q(('is_deleted', False)), fields=['author', 'published_date', 'id'],
+                               name='live_author_idx'),
+        ),
+        migrations.RunPython(install_fulltext, uninstall_fulltext),
+    ]
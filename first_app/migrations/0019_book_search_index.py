@@ -0,0 +1,85 @@
+# Generated by Django 5.1.1 on 2026-10-18 00:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# MySQL: ключ book_fts переименовывается в rowid, как в FTS5, чтобы у модели BookSearchIndex
+# был один столбец на обеих СУБД. Триггеры ссылаются на столбец по имени и пересоздаются.
+FTS_TABLE = 'book_fts'
+AUTHOR_NAME = 'SELECT name FROM first_app_author WHERE id = {}'
+
+MYSQL_DROP_TRIGGERS = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_author_au',
+]
+
+
+def mysql_triggers(key):
+    return [
+        f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON `Book` FOR EACH ROW
+            INSERT INTO {FTS_TABLE} ({key}, title, author)
+            VALUES (NEW.id, NEW.title, ({AUTHOR_NAME.format('NEW.author_id')}))""",
+        f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON `Book` FOR EACH ROW
+            DELETE FROM {FTS_TABLE} WHERE {key} = OLD.id""",
+        f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON `Book` FOR EACH ROW
+        BEGIN
+            IF NOT (NEW.title <=> OLD.title AND NEW.author_id <=> OLD.author_id) THEN
+                REPLACE INTO {FTS_TABLE} ({key}, title, author)
+                VALUES (NEW.id, NEW.title, ({AUTHOR_NAME.format('NEW.author_id')}));
+            END IF;
+        END""",
+        f"""CREATE TRIGGER {FTS_TABLE}_author_au AFTER UPDATE ON first_app_author FOR EACH ROW
+        BEGIN
+            IF NOT (NEW.name <=> OLD.name) THEN
+                UPDATE {FTS_TABLE} JOIN `Book` ON `Book`.id = {FTS_TABLE}.{key}
+                SET {FTS_TABLE}.author = NEW.name
+                WHERE `Book`.author_id = NEW.id;
+            END IF;
+        END""",
+    ]
+
+
+def rename_key(schema_editor, old, new):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for sql in MYSQL_DROP_TRIGGERS:
+        schema_editor.execute(sql)
+    schema_editor.execute(f'ALTER TABLE {FTS_TABLE} RENAME COLUMN {old} TO {new}')
+    for sql in mysql_triggers(new):
+        schema_editor.execute(sql)
+
+
+def forwards(apps, schema_editor):
+    rename_key(schema_editor, 'book_id', 'rowid')
+
+
+def backwards(apps, schema_editor):
+    rename_key(schema_editor, 'rowid', 'book_id')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_app', '0001_squashed_0018_book_author_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookSearchIndex',
+            fields=[
+                ('book', models.OneToOneField(db_column='rowid', db_constraint=False,
+                                              on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True,
+                                              related_name='search_index', serialize=False, to='first_app.book')),
+                ('title', models.CharField(max_length=200)),
+                ('author', models.CharField(max_length=100, null=True)),
+                ('document', models.TextField(db_column='book_fts')),
+            ],
+            options={
+                'db_table': 'book_fts',
+                'managed': False,
+            },
+        ),
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 5.1.1 on 2026-10-18 00:53
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+FTS_TABLE = 'book_fts'
+AUTHOR_NAME = 'SELECT name FROM first_app_author WHERE id = {}'
+
+# SQLite пересоздаёт таблицу автора при AlterField и не даёт переименовать новую таблицу,
+# пока на неё ссылаются триггеры полнотекстового индекса. Поэтому триггеры на время
+# изменения удаляются и создаются заново; SQL - как в 0018. Данные индекса не меняются.
+SQLITE_DROP_TRIGGERS = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_author_au',
+]
+
+SQLITE_CREATE_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON "Book" BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, author)
+        VALUES (new.id, new.title, ({AUTHOR_NAME.format('new.author_id')}));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, author_id ON "Book" BEGIN
+        DELETE FROM {FTS_TABLE} WHERE rowid = old.id;
+        INSERT INTO {FTS_TABLE}(rowid, title, author)
+        VALUES (new.id, new.title, ({AUTHOR_NAME.format('new.author_id')}));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_author_au AFTER UPDATE OF name ON first_app_author BEGIN
+        UPDATE {FTS_TABLE} SET author = new.name
+        WHERE rowid IN (SELECT id FROM "Book" WHERE author_id = new.id);
+    END""",
+]
+
+
+def merge_duplicate_authors(apps, schema_editor):
+    """Книги и архив переводятся на автора с наименьшим id, дубли удаляются."""
+    Author = apps.get_model('first_app', 'Author')
+    Book = apps.get_model('first_app', 'Book')
+    BookArchive = apps.get_model('first_app', 'BookArchive')
+
+    duplicates = (Author.objects.values('name').annotate(count=Count('pk'), keep=Min('pk'))
+                  .filter(count__gt=1).values_list('name', 'keep'))
+    for name, keep in duplicates:
+        others = list(Author.objects.filter(name=name).exclude(pk=keep).values_list('pk', flat=True))
+        Book._base_manager.filter(author_id__in=others).update(author_id=keep)
+        BookArchive.objects.filter(author_id__in=others).update(author_id=keep)
+        Author.objects.filter(pk__in=others).delete()
+
+
+def _execute_on_sqlite_fts(schema_editor, statements):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite' and FTS_TABLE in connection.introspection.table_names():
+        for sql in statements:
+            schema_editor.execute(sql)
+
+
+def drop_fulltext_triggers(apps, schema_editor):
+    _execute_on_sqlite_fts(schema_editor, SQLITE_DROP_TRIGGERS)
+
+
+def create_fulltext_triggers(apps, schema_editor):
+    _execute_on_sqlite_fts(schema_editor, SQLITE_CREATE_TRIGGERS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_app', '0019_book_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_authors, migrations.RunPython.noop),
+        migrations.RunPython(drop_fulltext_triggers, create_fulltext_triggers),
+        migrations.AlterField(
+            model_name='author',
+            name='name',
+            field=models.CharField(max_length=100, unique=True),
+        ),
+        migrations.RunPython(create_fulltext_triggers, drop_fulltext_triggers),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.1.1 on 2026-10-18 01:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('first_app', '0020_author_name_unique'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='book',
+            name='pub_date_id_index',
+        ),
+        migrations.RemoveIndex(
+            model_name='book',
+            name='live_pub_date_id_idx',
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['published_date', 'id', 'is_deleted'], name='pub_date_id_index'),
+        ),
+    ]
@@ -7,7 +7,8 @@ from django.contrib.auth.base_user import AbstractBaseUser
 from django.contrib.auth.models import PermissionsMixin, UserManager
 from django.utils.translation import gettext_lazy as _
 
-from first_app.managers import SoftDeleteManager
+from first_app.managers import AuthorQuerySet, BookQuerySet, SoftDeleteManager, GenreQuerySet
+from first_app.search import FullTextMatch
 
 
 class CustomUser(AbstractBaseUser, PermissionsMixin):
@@ -41,17 +42,27 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
 
 class Genre(models.Model):
     name = models.CharField(max_length=30)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    book_count = models.PositiveIntegerField(default=0)  # Число живых книг, поддерживается сигналами
+
+    objects = GenreQuerySet.as_manager()
 
     def __str__(self):
         return self.name
 
 
 class Author(models.Model):
-    name = models.CharField(max_length=100)
+    # Уникально: параллельные записи с новым именем не создают двух авторов (миграция 0020)
+    name = models.CharField(max_length=100, unique=True)
+
+    objects = AuthorQuerySet.as_manager()
+
+    def __str__(self):
+        return self.name
 
 
 class Publisher(models.Model):
-    name = models.CharField(max_length=75)
+    name = models.CharField(max_length=75, db_index=True)
     established_date = models.DateField(auto_now_add=True)
 
     def __str__(self):
@@ -60,7 +71,9 @@ class Publisher(models.Model):
 
 class Book(models.Model):
     title = models.CharField(max_length=200)
-    author = models.CharField(max_length=40, null=True)
+    # Раньше имя автора хранилось в самой книге; API по-прежнему принимает и отдаёт имя.
+    # Индекс по author_id создаёт сам ForeignKey (он заменил отдельный author_idx)
+    author = models.ForeignKey(Author, null=True, on_delete=models.PROTECT, related_name='books')
     published_date = models.DateField(verbose_name='publication_date')
     registered = models.BooleanField(null=True)
     managed = models.BooleanField(null=True)
@@ -71,11 +84,26 @@ class Book(models.Model):
     genres = models.ManyToManyField(Genre, blank=True, related_name='books')
     is_banned = models.BooleanField(default=False)
     is_deleted = models.BooleanField(default=False)  # Поле для мягкого удаления
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # Версия для ETag / Last-Modified
+    deleted_at = models.DateTimeField(null=True, blank=True)  # Момент мягкого удаления, нужен для архивации
 
     objects = SoftDeleteManager()
+    all_objects = BookQuerySet.as_manager()  # Включая удалённые: админка, массовое восстановление
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Запоминаем состояние при загрузке, чтобы при сохранении понять, изменилась ли "живость" книги
+        instance._loaded_live = instance.is_live if {'is_deleted', 'is_banned'} <= set(field_names) else None
+        return instance
+
+    @property
+    def is_live(self):
+        return not self.is_deleted and not self.is_banned
 
     def delete(self, *args, **kwargs):
         self.is_deleted = True
+        self.deleted_at = timezone.now()
         self.save()
 
     def __str__(self):
@@ -86,10 +114,80 @@ class Book(models.Model):
         ordering = ['published_date']
         get_latest_by = 'published_date'
         unique_together = ('title', 'author')
-        indexes = [models.Index(fields=('title', 'author'), name='title_auth_index')]
+        indexes = [models.Index(fields=('title', 'author'), name='title_auth_index'),
+                   # is_deleted в конце: условие NOT is_deleted из SoftDeleteManager проверяется по индексу,
+                   # без чтения строк, поэтому отдельный частичный индекс по тем же колонкам не нужен
+                   models.Index(fields=('published_date', 'id', 'is_deleted'), name='pub_date_id_index'),
+                   models.Index(fields=('price', 'id'), name='price_id_index'),
+                   # Частичные индексы по неудалённым книгам: условие NOT is_deleted есть в каждом запросе
+                   # через SoftDeleteManager. В MySQL частичных индексов нет: Django отбрасывает условие
+                   # и создаёт там обычные индексы по тем же колонкам.
+                   models.Index(fields=('author', 'published_date', 'id'), condition=Q(is_deleted=False),
+                                name='live_author_idx'),
+                   models.Index(fields=('publisher', 'published_date', 'id'), condition=Q(is_deleted=False),
+                                name='live_publisher_idx'),
+                   models.Index(fields=('title',), condition=Q(is_deleted=False), name='live_title_idx'),
+                   # Для архивации: только удалённые книги, по времени удаления
+                   models.Index(fields=('deleted_at', 'id'), condition=Q(is_deleted=True),
+                                name='deleted_at_idx'),
+                   ]
 
         constraints = [UniqueConstraint(fields=['title'], condition=Q(registered=True), name='unique_title_registered'
                                         )
                        ]
         verbose_name = 'fiction book'  # Человекочитаемое имя модели
         verbose_name_plural = 'fiction books'  # Человекочитаемое множественное число имени модели
+
+
+
+class BookSearchIndex(models.Model):
+    """
+    Строка полнотекстового индекса book_fts (first_app/search.py). Таблицей управляют миграции
+    и триггеры, модель нужна только для соединения в поиске:
+    Book.objects.filter(search_index__document__match=...).
+    """
+    # rowid - ключ строки FTS5 в SQLite; в MySQL столбец называется так же (миграция 0019)
+    book = models.OneToOneField(Book, primary_key=True, db_column='rowid', db_constraint=False,
+                                on_delete=models.DO_NOTHING, related_name='search_index')
+    title = models.CharField(max_length=200)
+    author = models.CharField(max_length=100, null=True)
+    # В SQLite - скрытый столбец FTS5 с именем таблицы; в MySQL FullTextMatch его не использует
+    document = models.TextField(db_column='book_fts')
+
+    class Meta:
+        managed = False
+        db_table = 'book_fts'
+
+
+BookSearchIndex._meta.get_field('document').register_lookup(FullTextMatch)
+
+class BookArchive(models.Model):
+    """
+    Архив давно удалённых книг (см. команду archive_deleted_books).
+    id сохраняется прежним, связи хранятся как числа, чтобы архив не мешал удалять издательства и жанры.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    title = models.CharField(max_length=200)
+    author_id = models.BigIntegerField(null=True)
+    published_date = models.DateField()
+    registered = models.BooleanField(null=True)
+    managed = models.BooleanField(null=True)
+    page_count = models.IntegerField(null=True)
+    price = models.IntegerField(null=True)
+    discounted_price = models.IntegerField(null=True)
+    publisher_id = models.BigIntegerField(null=True)
+    is_banned = models.BooleanField(default=False)
+    updated_at = models.DateTimeField()
+    deleted_at = models.DateTimeField(null=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'BookArchive'
+
+
+class BookGenreArchive(models.Model):
+    book = models.ForeignKey(BookArchive, on_delete=models.CASCADE, related_name='genre_links')
+    genre_id = models.BigIntegerField()
+
+    class Meta:
+        db_table = 'BookGenreArchive'
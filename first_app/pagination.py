@@ -1,6 +1,377 @@
-from rest_framework.pagination import CursorPagination
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.paginator import EmptyPage, InvalidPage, Page, Paginator
+from django.db import connections
+from django.db.models import F, Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import CursorPagination, Cursor, PageNumberPagination, _reverse_ordering
+from rest_framework.response import Response
+
+from .cache import aget_cached_count, get_cached_count
 
 
 class MyCursorPagination(CursorPagination):
     page_size = 3
     ordering = 'published_date'
+
+
+def estimate_count(queryset):
+    """
+    Оценка числа строк: на MySQL - по плану запроса (EXPLAIN rows * filtered), на остальных
+    базах - COUNT(*), ограниченный PAGINATION_COUNT_ESTIMATE_LIMIT строками.
+    """
+    if connections[queryset.db].vendor != 'mysql':
+        return queryset.order_by()[:settings.PAGINATION_COUNT_ESTIMATE_LIMIT].count()
+    sql, params = queryset.order_by().values_list('pk').query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(f'EXPLAIN {sql}', params)
+        columns = [column[0] for column in cursor.description]
+        row = cursor.fetchone()
+    plan = dict(zip(columns, row))
+    return int((plan.get('rows') or 0) * (plan.get('filtered') or 100) / 100)
+
+
+async def aestimate_count(queryset):
+    if connections[queryset.db].vendor != 'mysql':
+        return await queryset.order_by()[:settings.PAGINATION_COUNT_ESTIMATE_LIMIT].acount()
+    return await sync_to_async(estimate_count)(queryset)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Django Paginator с оценкой вместо COUNT(*) (см. estimate_count) - для change list в админке.
+    Оценка бывает меньше настоящего числа (на SQLite она не больше PAGINATION_COUNT_ESTIMATE_LIMIT),
+    поэтому для страницы за её пределами число строк считается точно.
+    """
+    estimated = False
+
+    @cached_property
+    def count(self):
+        if isinstance(self.object_list, QuerySet):
+            self.estimated = True
+            return estimate_count(self.object_list)
+        return super().count
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if not self.estimated:
+                raise
+        self.estimated = False
+        self.__dict__.pop('num_pages', None)
+        self.__dict__['count'] = self.object_list.count()
+        return super().validate_number(number)
+
+
+class UncountedPage:
+    """Страница без COUNT(*): наличие следующей страницы определяется по лишней строке."""
+
+    def __init__(self, object_list, number, has_next):
+        self.object_list = object_list
+        self.number = number
+        self._has_next = has_next
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self.number > 1
+
+    def next_page_number(self):
+        return self.number + 1
+
+    def previous_page_number(self):
+        return self.number - 1
+
+
+class CachedCountPagination(PageNumberPagination):
+    """
+    PageNumberPagination с выбором способа подсчёта в параметре ?count=:
+
+    - exact - COUNT(*) на каждый запрос, как в PageNumberPagination;
+    - cached - COUNT(*) из кэша по набору фильтров, сбрасывается при записи (first_app/cache.py);
+    - estimated - оценка (см. estimate_count) с флагом count_is_estimate;
+    - none - без count, только ссылки next/previous.
+
+    По умолчанию используется PAGINATION_COUNT_MODE. Есть apaginate_queryset() для async ORM.
+    """
+    count_query_param = 'count'
+    count_modes = ('exact', 'cached', 'estimated', 'none')
+
+    def get_count_mode(self, request):
+        mode = request.query_params.get(self.count_query_param) or settings.PAGINATION_COUNT_MODE
+        if mode not in self.count_modes:
+            raise ValidationError({self.count_query_param: [f'Must be one of: {", ".join(self.count_modes)}.']})
+        return mode
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.prepare(request)
+        if not page_size:
+            return None
+        queryset = self.pin_database(queryset)
+        if self.count_mode in ('estimated', 'none'):
+            if self.count_mode == 'estimated':
+                self.estimated_count = estimate_count(queryset)
+            number = self.get_uncounted_page_number(request)
+            bottom = (number - 1) * page_size
+            return self.finish_uncounted(list(queryset[bottom:bottom + page_size + 1]), number, page_size)
+
+        count = get_cached_count(queryset) if self.count_mode == 'cached' else queryset.count()
+        paginator, number, bottom, top = self.get_counted_bounds(request, queryset, page_size, count)
+        return self.finish_counted(list(queryset[bottom:top]), number, paginator)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        page_size = self.prepare(request)
+        if not page_size:
+            return None
+        queryset = self.pin_database(queryset)
+        if self.count_mode in ('estimated', 'none'):
+            if self.count_mode == 'estimated':
+                self.estimated_count = await aestimate_count(queryset)
+            number = self.get_uncounted_page_number(request)
+            bottom = (number - 1) * page_size
+            rows = [row async for row in queryset[bottom:bottom + page_size + 1]]
+            return self.finish_uncounted(rows, number, page_size)
+
+        count = await aget_cached_count(queryset) if self.count_mode == 'cached' else await queryset.acount()
+        paginator, number, bottom, top = self.get_counted_bounds(request, queryset, page_size, count)
+        return self.finish_counted([row async for row in queryset[bottom:top]], number, paginator)
+
+    def pin_database(self, queryset):
+        # Роутер выбирает реплику заново для каждого запроса к БД: счётчик и страница
+        # должны читаться из одной базы, иначе число строк не совпадёт со страницами
+        return queryset.using(queryset.db)
+
+    def prepare(self, request):
+        self.request = request
+        self.count_mode = self.get_count_mode(request)
+        return self.get_page_size(request)
+
+    def get_counted_bounds(self, request, queryset, page_size, count):
+        paginator = self.django_paginator_class(queryset, page_size)
+        # count - cached_property, поэтому дальнейшие обращения к нему не пойдут в БД
+        paginator.count = count
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        bottom = (number - 1) * page_size
+        return paginator, number, bottom, min(bottom + page_size, count)
+
+    def finish_counted(self, rows, number, paginator):
+        self.page = Page(rows, number, paginator)
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return list(self.page)
+
+    def get_offset(self, request):
+        """OFFSET запрошенной страницы без обращения к БД; 'last' считается самой глубокой."""
+        page_number = request.query_params.get(self.page_query_param) or 1
+        if page_number in self.last_page_strings:
+            return float('inf')
+        try:
+            return max(int(page_number) - 1, 0) * (self.get_page_size(request) or 0)
+        except ValueError:
+            return 0
+
+    def get_uncounted_page_number(self, request):
+        page_number = request.query_params.get(self.page_query_param) or 1
+        try:
+            number = int(page_number)
+            if number < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message='Invalid page.'))
+        return number
+
+    def finish_uncounted(self, rows, number, page_size):
+        if not rows and number > 1:
+            raise NotFound(self.invalid_page_message.format(page_number=number, message='That page contains no results'))
+        self.page = UncountedPage(rows[:page_size], number, len(rows) > page_size)
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        if self.count_mode in ('exact', 'cached'):
+            return super().get_paginated_response(data)
+        payload = {}
+        if self.count_mode == 'estimated':
+            payload['count'] = self.estimated_count
+            payload['count_is_estimate'] = True
+        payload.update(next=self.get_next_link(), previous=self.get_previous_link(), results=data)
+        return Response(payload)
+
+
+class BookKeysetPagination(CursorPagination):
+    """
+    Keyset-пагинация по полному кортежу сортировки.
+
+    В отличие от CursorPagination, курсор хранит значения всех полей сортировки
+    (по умолчанию published_date и id), поэтому следующая страница выбирается
+    условием (published_date, id) > (d, id) по индексу pub_date_id_index,
+    без OFFSET и без COUNT(*).
+    """
+    page_size = 5
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('published_date', 'id')
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        # id в конце делает сортировку уникальной, иначе ключ страницы неоднозначен
+        if not any(field.lstrip('-') in ('id', 'pk') for field in ordering):
+            ordering += ('-id' if ordering[-1].startswith('-') else 'id',)
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.prepare_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.finish_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.prepare_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.finish_page([row async for row in queryset])
+
+    def prepare_queryset(self, queryset, request, view=None):
+        """Сортирует и фильтрует выборку по курсору; возвращает срез на страницу плюс одну запись."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+
+        self.reverse = self.cursor is not None and self.cursor.reverse
+        self.position = self.cursor.position if self.cursor is not None else None
+        ordering = _reverse_ordering(self.ordering) if self.reverse else self.ordering
+
+        queryset = queryset.order_by(*self._get_order_by(queryset.model, ordering))
+        if self.position is not None:
+            queryset = queryset.filter(self._get_keyset_filter(queryset.model, ordering, self.position))
+
+        # Берём на одну запись больше, чтобы понять, есть ли следующая страница
+        return queryset[:self.page_size + 1]
+
+    def finish_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.page:
+            position = self._get_position_from_instance(self.page[-1], self.ordering)
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.page:
+            position = self._get_position_from_instance(self.page[0], self.ordering)
+        else:
+            position = self.cursor.position
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def _get_position_from_instance(self, instance, ordering):
+        values = []
+        for field in ordering:
+            name = field.lstrip('-')
+            if isinstance(instance, dict):
+                value = instance[name]
+            else:
+                value = getattr(instance, name)
+            values.append(None if value is None else str(value))
+        return json.dumps(values)
+
+    def _get_field(self, model, name):
+        return model._meta.pk if name == 'pk' else model._meta.get_field(name)
+
+    def _get_order_by(self, model, ordering):
+        # NULL считается наименьшим значением при любом направлении сортировки,
+        # чтобы условие курсора совпадало с порядком строк в выдаче
+        order_by = []
+        for field in ordering:
+            name = field.lstrip('-')
+            if not self._get_field(model, name).null:
+                order_by.append(field)
+            elif field.startswith('-'):
+                order_by.append(F(name).desc(nulls_last=True))
+            else:
+                order_by.append(F(name).asc(nulls_first=True))
+        return order_by
+
+    def _decode_position(self, model, ordering, position):
+        try:
+            raw_values = json.loads(position)
+            if not isinstance(raw_values, list) or len(raw_values) != len(ordering):
+                raise ValueError
+            return [
+                None if value is None else self._get_field(model, field.lstrip('-')).to_python(value)
+                for field, value in zip(ordering, raw_values)
+            ]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def _get_keyset_filter(self, model, ordering, position):
+        """
+        Строит условие "строка идёт после позиции" для составного ключа:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        values = self._decode_position(model, ordering, position)
+        condition = Q(pk__in=[])
+        equal_prefix = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            if field.startswith('-'):
+                if value is None:
+                    after = Q(pk__in=[])
+                else:
+                    after = Q(**{f'{name}__lt': value})
+                    if self._get_field(model, name).null:
+                        after |= Q(**{f'{name}__isnull': True})
+            else:
+                if value is None:
+                    after = Q(**{f'{name}__isnull': False})
+                else:
+                    after = Q(**{f'{name}__gt': value})
+            condition |= equal_prefix & after
+            if value is None:
+                equal_prefix &= Q(**{f'{name}__isnull': True})
+            else:
+                equal_prefix &= Q(**{name: value})
+        return condition
+
+
+class ExpensiveBooksPagination(BookKeysetPagination):
+    # Диапазон price > avg читается по индексу price_id_index
+    ordering = ('price', 'id')
@@ -0,0 +1,55 @@
+import json
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+from .renderers import fast_json_enabled, orjson
+
+
+def loads(data):
+    """json.loads через orjson, если он включён (FAST_JSON); data - bytes или str."""
+    if fast_json_enabled():
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser на orjson (см. FastJSONRenderer); без orjson или с FAST_JSON=False - обычный JSONParser."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if not fast_json_enabled():
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            data = stream.read() if stream is not None else b''
+            # orjson читает только UTF-8
+            if encoding.lower().replace('-', '') != 'utf8':
+                data = data.decode(encoding)
+            return orjson.loads(data)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class NDJSONParser(BaseParser):
+    """
+    Разбирает тело в формате NDJSON (один JSON-объект на строку) в список.
+    """
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        items = []
+        if stream is None:
+            return items
+        for number, line in enumerate(stream, start=1):
+            line = line.decode(encoding).strip()
+            if not line:
+                continue
+            try:
+                items.append(loads(line))
+            except ValueError as exc:
+                raise ParseError(f'NDJSON parse error on line {number} - {exc}')
+        return items
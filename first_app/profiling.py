@@ -0,0 +1,212 @@
+"""
+Выборочное профилирование SQL-запросов.
+
+QueryProfilerMiddleware для части запросов (QUERY_PROFILER['SAMPLE_RATE'])
+замеряет каждый SQL-запрос через connection.execute_wrapper, помечает
+медленные и повторяющиеся (N+1) запросы и пишет итог по HTTP-запросу в лог
+'first_app.query_profiler'. Лог уходит через QueueHandler в очередь, а
+QueueListener в фоновом потоке складывает записи в кольцевой буфер в памяти
+и периодически сбрасывает его в файл - поэтому на пути запроса нет дискового I/O.
+Данные всех процессов выводит команда query_profile.
+
+Модуль импортируется из LOGGING, поэтому здесь нельзя импортировать модели.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import time
+from collections import Counter, deque
+from contextlib import ExitStack
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('first_app.query_profiler')
+
+QUERY_QUEUE = queue.SimpleQueue()
+
+_listener = None
+
+
+def get_config():
+    return settings.QUERY_PROFILER
+
+
+def get_dump_dir():
+    return Path(get_config()['DUMP_DIR'])
+
+
+class ProfilerQueueHandler(QueueHandler):
+    """QueueHandler, который по умолчанию пишет в общую очередь профилировщика."""
+
+    def __init__(self, queue=QUERY_QUEUE):
+        super().__init__(queue)
+
+
+class RingBufferHandler(logging.Handler):
+    """
+    Хранит последние BUFFER_SIZE профилей в памяти и не чаще раза в
+    FLUSH_INTERVAL секунд сбрасывает их в DUMP_DIR/query-profile-<pid>.json.
+    Работает в потоке QueueListener, а не в потоке запроса.
+    """
+
+    def __init__(self, capacity, dump_dir, flush_interval):
+        super().__init__()
+        self.buffer = deque(maxlen=capacity)
+        self.dump_dir = Path(dump_dir)
+        self.flush_interval = flush_interval
+        self.last_flush = 0.0
+
+    def emit(self, record):
+        profile = getattr(record, 'profile', None)
+        if profile is None:
+            return
+        self.buffer.append(profile)
+        if time.monotonic() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.buffer:
+            return
+        try:
+            self.dump_dir.mkdir(parents=True, exist_ok=True)
+            path = self.dump_dir / f'query-profile-{os.getpid()}.json'
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(list(self.buffer)))
+            os.replace(tmp_path, path)
+        except OSError:
+            self.handleError(None)
+
+
+def start_listener():
+    """Запускает фоновый поток QueueListener (вызывается из FirstAppConfig.ready)."""
+    global _listener
+    if _listener is not None:
+        return
+    config = get_config()
+    handler = RingBufferHandler(config['BUFFER_SIZE'], config['DUMP_DIR'], config['FLUSH_INTERVAL'])
+    _listener = QueueListener(QUERY_QUEUE, handler)
+    _listener.start()
+    atexit.register(stop_listener)
+
+
+def stop_listener():
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.flush()
+    _listener = None
+
+
+class QueryRecorder:
+    """execute_wrapper, который запоминает текст и длительность каждого запроса."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((sql, (time.perf_counter() - started) * 1000))
+
+
+def build_profile(request, response, queries, config):
+    match = getattr(request, 'resolver_match', None)
+    view = (match.view_name or match._func_path) if match else None
+
+    # Один и тот же параметризованный SQL несколько раз за запрос - признак N+1
+    counts = Counter(sql for sql, _ in queries)
+    duplicates = [
+        {'sql': sql, 'count': count}
+        for sql, count in counts.most_common()
+        if count >= config['DUPLICATE_THRESHOLD']
+    ]
+    slow = [
+        {'sql': sql, 'duration_ms': round(duration, 3)}
+        for sql, duration in queries
+        if duration >= config['SLOW_QUERY_MS']
+    ]
+    return {
+        'timestamp': time.time(),
+        'method': request.method,
+        'path': request.path,
+        'view': view,
+        'status': response.status_code,
+        'query_count': len(queries),
+        'query_time_ms': round(sum(duration for _, duration in queries), 3),
+        'queries': [{'sql': sql, 'duration_ms': round(duration, 3)} for sql, duration in queries],
+        'slow': slow,
+        'duplicates': duplicates,
+    }
+
+
+class QueryProfilerMiddleware:
+    """
+    Без QUERY_PROFILER['ENABLED'] в цепочку не встаёт. Под ASGI работает без перехода в поток:
+    обёртки ставятся на соединения в потоке, где async ORM выполняет запросы (sync_to_async
+    с thread_sensitive=True). Запросы из sync_to_async(thread_sensitive=False) не замеряются.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not get_config()['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        config = get_config()
+        if not is_sampled(config):
+            return self.get_response(request)
+
+        recorder = QueryRecorder()
+        with record_queries(recorder):
+            response = self.get_response(request)
+        log_profile(request, response, recorder, config)
+        return response
+
+    async def __acall__(self, request):
+        config = get_config()
+        if not is_sampled(config):
+            return await self.get_response(request)
+
+        recorder = QueryRecorder()
+        stack = await sync_to_async(record_queries)(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        log_profile(request, response, recorder, config)
+        return response
+
+
+def is_sampled(config):
+    return config['ENABLED'] and random.random() < config['SAMPLE_RATE']
+
+
+def record_queries(recorder):
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(recorder))
+    return stack
+
+
+def log_profile(request, response, recorder, config):
+    logger.info('%s %s: %d queries', request.method, request.path, len(recorder.queries),
+                extra={'profile': build_profile(request, response, recorder.queries, config)})
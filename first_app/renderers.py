@@ -0,0 +1,41 @@
+from django.conf import settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson не обязателен, без него работает стандартный json
+    orjson = None
+
+
+def fast_json_enabled():
+    return orjson is not None and settings.FAST_JSON
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson (FAST_JSON=True и установлен orjson), иначе - обычный JSONRenderer.
+
+    Результат тот же, что у JSONRenderer с настройками DRF по умолчанию (компактный вывод,
+    UNICODE_JSON): даты, Decimal, ленивые строки и прочие типы, которые orjson не знает или
+    записывает иначе, передаются в encoder DRF. Отступ (Accept: application/json; indent=4)
+    и то, что orjson не умеет (например, целые длиннее 64 бит), рендерятся через json.
+    """
+    # Даты - через encoder DRF (формат с 'Z' для UTC, как в JSONRenderer); ключи-числа - строками, как в json
+    options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if (not fast_json_enabled() or not self.compact or self.ensure_ascii
+                or self.get_indent(accepted_media_type, renderer_context)):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=JSONEncoder().default, option=self.options)
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как и JSONRenderer: U+2028 и U+2029 экранируются для совместимости с JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,92 @@
+"""
+Маршрутизация чтения на реплики.
+
+Безопасные запросы (GET/HEAD/OPTIONS) читают модели first_app с реплик, всё остальное -
+с основной базы. Клиент, который только что писал, получает cookie и ещё
+REPLICA_STICKY_SECONDS секунд читает с основной базы, чтобы видеть свои изменения
+несмотря на отставание репликации.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_COOKIE = 'db_primary_until'
+
+# Разрешено ли текущему запросу читать с реплики; вне запросов (команды, shell) - нет
+replica_reads = ContextVar('replica_reads', default=False)
+
+
+def get_replicas():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica')]
+
+
+class ReplicaRouter:
+    # Остальные приложения (сессии, auth, admin) всегда работают с основной базой
+    replica_apps = {'first_app'}
+
+    def db_for_read(self, model, **hints):
+        if not replica_reads.get() or model._meta.app_label not in self.replica_apps:
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Связанные объекты читаются из той же базы, что и исходный
+            return instance._state.db
+        replicas = get_replicas()
+        return random.choice(replicas) if replicas else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная база
+        return True
+
+
+class ReplicaRoutingMiddleware:
+    # Как MiddlewareMixin: в async-цепочке (ASGI) работает без перехода в поток
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = replica_reads.set(self.allows_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        # ContextVar копируется в sync_to_async, поэтому синхронные view за ASGI тоже видят флаг
+        token = replica_reads.set(self.allows_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            replica_reads.reset(token)
+        return self.process_response(request, response)
+
+    def allows_replica(self, request):
+        return request.method in SAFE_METHODS and not self.is_sticky(request)
+
+    def process_response(self, request, response):
+        if request.method not in SAFE_METHODS and settings.REPLICA_STICKY_SECONDS:
+            response.set_cookie(STICKY_COOKIE, str(int(time.time()) + settings.REPLICA_STICKY_SECONDS),
+                                max_age=settings.REPLICA_STICKY_SECONDS, httponly=True, samesite='Lax')
+        return response
+
+    def is_sticky(self, request):
+        try:
+            return int(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
@@ -0,0 +1,108 @@
+"""
+Полнотекстовый индекс по названию книги и имени автора.
+
+Схема версии 2 (миграция 0018, Book.author - внешний ключ на Author): отдельная таблица
+book_fts с копией названия и имени автора, которую поддерживают триггеры на Book
+(вставка, изменение title/author_id, удаление) и на Author (переименование).
+SQLite: виртуальная таблица FTS5. MySQL: InnoDB-таблица с индексом FULLTEXT (title, author).
+Версия 1 (миграция 0014) индексировала текстовый столбец Book.author.
+
+SQL таблицы и триггеров зафиксирован в самих миграциях (0014, 0018 и сжатая 0001_squashed_0018),
+здесь - только то, что нужно приложению во время работы. Запросы соединяются с индексом через
+неуправляемую модель BookSearchIndex: Django сам подставляет псевдонимы таблиц, поэтому поиск
+работает и внутри подзапросов (например, в фасетах).
+
+Внимание: SQLite-схема Django пересоздаёт таблицу при части ALTER-операций
+(например, AddField/AlterField), и триггеры при этом теряются. Миграции,
+изменяющие таблицу Book, должны снова создавать триггеры (SQL - из последней такой миграции).
+"""
+from django.db import connections
+from django.db.models import FloatField, Func, Lookup
+
+FTS_TABLE = 'book_fts'
+
+_backends = {}
+
+
+def _fulltext_columns(compiler, connection, alias):
+    qn = connection.ops.quote_name
+    table = compiler.quote_name_unless_alias(alias)
+    return f'{table}.{qn("title")}, {table}.{qn("author")}'
+
+
+class FullTextMatch(Lookup):
+    """
+    BookSearchIndex.document__match: запрос в синтаксисе FTS5 (SQLite)
+    или boolean mode (MySQL) по названию и имени автора.
+    """
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        raise NotImplementedError(f'Full-text search is not supported on {connection.vendor}.')
+
+    def as_sqlite(self, compiler, connection):
+        # Слева от MATCH - скрытый столбец с именем таблицы, то есть вся строка индекса
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
+
+    def as_mysql(self, compiler, connection):
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        columns = _fulltext_columns(compiler, connection, self.lhs.alias)
+        return f'MATCH ({columns}) AGAINST ({rhs} IN BOOLEAN MODE)', rhs_params
+
+
+class SearchRank(Func):
+    """
+    Релевантность строки индекса для того же запроса, что в FullTextMatch; чем меньше, тем релевантнее.
+    Выражение - F('search_index__document') в выборке, уже отфильтрованной по search_index__document__match.
+    """
+    output_field = FloatField()
+
+    def __init__(self, document, query):
+        super().__init__(document)
+        self.query = query
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise NotImplementedError(f'Full-text search is not supported on {connection.vendor}.')
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        # rank в FTS5 - это bm25
+        alias = compiler.quote_name_unless_alias(self.source_expressions[0].alias)
+        return f'{alias}.rank', []
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        # Чем больше MATCH, тем релевантнее; знак меняем, чтобы сортировать по возрастанию, как в SQLite
+        columns = _fulltext_columns(compiler, connection, self.source_expressions[0].alias)
+        return f'-MATCH ({columns}) AGAINST (%s IN BOOLEAN MODE)', [self.query]
+
+
+def rebuild_fulltext_index(connection):
+    """Заново заполняет индекс из Book и Author."""
+    if FTS_TABLE not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        book, author = connection.ops.quote_name('Book'), connection.ops.quote_name('first_app_author')
+        cursor.execute(f'DELETE FROM {FTS_TABLE}')
+        cursor.execute(f'INSERT INTO {FTS_TABLE} (rowid, title, author) '
+                       f'SELECT {book}.id, {book}.title, {author}.name FROM {book} '
+                       f'LEFT JOIN {author} ON {author}.id = {book}.author_id')
+
+
+def get_fulltext_backend(using='default'):
+    """
+    Возвращает 'sqlite', 'mysql' или None, если полнотекстовый индекс не установлен.
+    Результат проверки кэшируется на время жизни процесса.
+    """
+    if using not in _backends:
+        connection = connections[using]
+        backend = None
+        if connection.vendor in ('sqlite', 'mysql') and FTS_TABLE in connection.introspection.table_names():
+            backend = connection.vendor
+        _backends[using] = backend
+    return _backends[using]
+
+
+def reset_fulltext_backend(**kwargs):
+    """После migrate индекс мог появиться или исчезнуть (обработчик post_migrate)."""
+    _backends.clear()
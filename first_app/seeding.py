@@ -0,0 +1,38 @@
+import datetime
+import random
+
+from django.db import transaction
+
+from first_app.factories import BookFactory, GenreFactory, PublisherFactory
+from first_app.models.book import Author
+
+SCALES = {
+    '10k': 10_000,
+    '100k': 100_000,
+    '1m': 1_000_000,
+}
+
+
+def seed_catalog(books, publishers=100, genres=30, authors=2000, genres_per_book=2, seed=42, batch_size=5000,
+                 start_date=datetime.date(1950, 1, 1), days=365 * 70):
+    """
+    Генерирует детерминированный (по seed) каталог: издательства, жанры, авторов, книги и связи книга-жанр.
+    Авторы 'Author N' общие для всех seed и создаются только при отсутствии.
+    Всё вставляется через bulk_create порциями по batch_size (first_app/factories.py). Возвращает число созданных книг.
+    """
+    with transaction.atomic():
+        publisher_ids = PublisherFactory(seed).create_batch(publishers, batch_size)
+        genre_ids = GenreFactory(seed).create_batch(genres, batch_size)
+        author_ids = Author.objects.ids_by_name([f'Author {i}' for i in range(authors)], batch_size)
+
+    factory = BookFactory(
+        seed,
+        rnd=random.Random(seed),
+        author_ids=[author_ids[f'Author {i}'] for i in range(authors)],
+        publisher_ids=publisher_ids,
+        genre_ids=genre_ids,
+        genres_per_book=genres_per_book,
+        start_date=start_date,
+        days=days,
+    )
+    return len(factory.create_batch(books, batch_size))
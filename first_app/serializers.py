@@ -1,38 +1,91 @@
 from datetime import timezone
 
+from django.db import transaction
 from rest_framework import serializers
-from .models import Book, Publisher
+from .fieldsets import READ_METHODS, SparseFieldsMixin
+from .models import Author, Book, Publisher
 from .models.book import Genre
 
+# Поля ответа перечислены явно: новый столбец модели не попадает в API сам собой.
+# Порядок - как до перевода author на ForeignKey: связи в конце
+BOOK_FIELDS = ['id', 'title', 'author', 'published_date', 'registered', 'managed', 'page_count', 'price',
+               'discounted_price', 'is_banned', 'is_deleted', 'updated_at', 'deleted_at', 'publisher', 'genres']
 
-class GenreSerializer(serializers.ModelSerializer):
+
+class GenreSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Genre
-        fields = '__all__'
+        fields = ['id', 'name', 'updated_at', 'book_count']
 
 
 class PublisherSerializer(serializers.ModelSerializer):
     class Meta:
         model = Publisher
-        fields = '__all__'
+        fields = ['id', 'name', 'established_date']
+
+
+class AuthorNameField(serializers.SlugRelatedField):
+    """
+    Автор книги по имени - как в те времена, когда имя хранилось в самой книге.
+    На входе принимается любое имя, но при проверке ничего не создаётся: неизвестный автор -
+    несохранённый Author, его создаёт AuthorByNameMixin при сохранении книги.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('slug_field', 'name')
+        if not kwargs.get('read_only'):
+            kwargs.setdefault('queryset', Author.objects.all())
+        super().__init__(**kwargs)
+        self.name_field = serializers.CharField(max_length=Author._meta.get_field('name').max_length)
 
+    def to_internal_value(self, data):
+        name = self.name_field.run_validation(data)
+        # Для несохранённого автора UniqueTogetherValidator (title, author) ничего не найдёт - и правильно
+        return self.get_queryset().filter(name=name).first() or Author(name=name)
+
+
+class AuthorByNameMixin:
+    """
+    Для ModelSerializer с AuthorNameField: новый автор создаётся (или находится, если его уже создал
+    параллельный запрос) в той же транзакции, что и книга. Отклонённый запрос авторов не оставляет.
+    """
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            return super().create(self.resolve_author(validated_data))
 
-class BookDetailSerializer(serializers.ModelSerializer):
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            return super().update(instance, self.resolve_author(validated_data))
+
+    def resolve_author(self, validated_data):
+        author = validated_data.get('author')
+        if author is not None and author.pk is None:
+            validated_data['author'] = Author.objects.get_by_name(author.name)
+        return validated_data
+
+
+class BookDetailSerializer(AuthorByNameMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    author = AuthorNameField(allow_null=True, required=False)
     # publisher = PublisherSerializer()  # Вложенный сериализатор
     # publisher = serializers.StringRelatedField()
 
     class Meta:
         model = Book
-        fields = '__all__'
+        fields = BOOK_FIELDS
+
 
+class BookListSerializer(AuthorByNameMixin, serializers.ModelSerializer):
+    author = AuthorNameField(allow_null=True, required=False)
 
-class BookListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Book
         fields = ['title', 'author']
 
 
-class AllBooksSerializer(serializers.ModelSerializer):
+class AllBooksSerializer(AuthorByNameMixin, serializers.ModelSerializer):
+    author = AuthorNameField(allow_null=True, required=False)
+
     class Meta:
         model = Book
         fields = ['title', 'author', 'published_date']
@@ -40,10 +93,19 @@ class AllBooksSerializer(serializers.ModelSerializer):
         # exclude = ['publisher']
 
 
-class BookSerializer(serializers.ModelSerializer):
+class BookSerializer(AuthorByNameMixin, SparseFieldsMixin, serializers.ModelSerializer):
+    author = AuthorNameField(allow_null=True, required=False)
+
     class Meta:
         model = Book
-        fields = '__all__'
+        fields = BOOK_FIELDS
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # При чтении без include_related жанры всё равно убираются из ответа - не читаем их вовсе
+        request = self.context.get('request')
+        if request is not None and request.method in READ_METHODS and not self.context.get('include_related'):
+            self.fields.pop('genres', None)
 
     def to_representation(self, instance):
         # Использование параметра include_related из контекста
@@ -55,7 +117,110 @@ class BookSerializer(serializers.ModelSerializer):
         return representation
 
 
-class BookCreateSerializer(serializers.ModelSerializer):
+class RowSerializer:
+    """
+    Быстрый read-only путь для списков.
+
+    Работает со строками values_list(named=True) вместо экземпляров модели и
+    выдаёт тот же результат, что serializer_class (те же ключи в том же порядке).
+    """
+    serializer_class = None
+    # Значения этих полей из БД уже имеют нужный тип, to_representation их не меняет
+    identity_fields = (serializers.IntegerField, serializers.CharField, serializers.BooleanField,
+                       serializers.PrimaryKeyRelatedField)
+
+    def __init__(self, context=None, key_columns=('id',)):
+        self.context = context or {}
+        self.columns = []
+        self.plan = []
+        for name, field in self.serializer_class(context=self.context).fields.items():
+            if isinstance(field, serializers.ManyRelatedField):
+                if self.include_many_related(name):
+                    self.plan.append((name, None, None))
+                continue
+            column = field.source
+            converter = None if type(field) in self.identity_fields else field.to_representation
+            if isinstance(field, serializers.SlugRelatedField):
+                # Значение связанного объекта (например, имя автора) читается тем же запросом через JOIN
+                column, converter = f'{field.source}__{field.slug_field}', None
+            self.plan.append((name, len(self.columns), converter))
+            self.columns.append(column)
+        # Читаются, даже если их нет среди выбранных полей (?fields=): id нужен для связей,
+        # столбцы сортировки - для курсора keyset-пагинации
+        self.columns.extend(column for column in key_columns if column not in self.columns)
+
+    def include_many_related(self, name):
+        return False
+
+    def get_queryset(self, queryset):
+        return queryset.prefetch_related(None).values_list(*self.columns, named=True)
+
+    def get_related(self, rows):
+        return {}
+
+    async def aget_related(self, rows):
+        return {}
+
+    def represent(self, rows, related):
+        data = []
+        for row in rows:
+            item = {}
+            for name, index, converter in self.plan:
+                if index is None:
+                    item[name] = related.get(row.id, [])
+                    continue
+                value = row[index]
+                item[name] = value if value is None or converter is None else converter(value)
+            data.append(item)
+        return data
+
+    def to_representation_many(self, rows):
+        rows = list(rows)
+        return self.represent(rows, self.get_related(rows))
+
+    async def ato_representation_many(self, rows):
+        rows = [row async for row in rows] if hasattr(rows, '__aiter__') else list(rows)
+        return self.represent(rows, await self.aget_related(rows))
+
+
+class BookRowSerializer(RowSerializer):
+    """
+    RowSerializer для BookSerializer. Названия жанров при include_related
+    подтягиваются одним запросом на страницу, иначе ключ genres убирается.
+    """
+    serializer_class = BookSerializer
+
+    def include_many_related(self, name):
+        return self.context.get('include_related', False)
+
+    def get_genre_names_queryset(self, rows):
+        return (Book.genres.through.objects.filter(book_id__in=[row.id for row in rows])
+                .order_by('id')
+                .values_list('book_id', 'genre__name'))
+
+    def group_genre_names(self, pairs):
+        genre_names = {}
+        for book_id, name in pairs:
+            genre_names.setdefault(book_id, []).append(name)
+        return genre_names
+
+    def get_related(self, rows):
+        if not self.include_many_related('genres'):
+            return {}
+        return self.group_genre_names(self.get_genre_names_queryset(rows))
+
+    async def aget_related(self, rows):
+        if not self.include_many_related('genres'):
+            return {}
+        return self.group_genre_names([pair async for pair in self.get_genre_names_queryset(rows)])
+
+
+class GenreRowSerializer(RowSerializer):
+    serializer_class = GenreSerializer
+
+
+class BookCreateSerializer(AuthorByNameMixin, serializers.ModelSerializer):
+    author = AuthorNameField(allow_null=True, required=False)
     publisher_name = serializers.CharField(required=False)
 
     class Meta:
@@ -65,7 +230,9 @@ class BookCreateSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         publisher_name = validated_data.pop('publisher_name')
         established_date = timezone.now()
-        publisher, created = Publisher.objects.get_or_create(name=publisher_name, established_date=established_date)
-        book = Book.objects.create(publisher=publisher, **validated_data)
+        with transaction.atomic():
+            publisher, created = Publisher.objects.get_or_create(name=publisher_name,
+                                                                 established_date=established_date)
+            book = Book.objects.create(publisher=publisher, **self.resolve_author(validated_data))
         return book
 
@@ -0,0 +1,106 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_migrate, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from first_app.cache import (invalidate_all_books, invalidate_average_price, invalidate_book, invalidate_books,
+                             invalidate_counts)
+from first_app.models.book import Author, Book, Genre
+from first_app.search import reset_fulltext_backend
+
+
+@receiver(m2m_changed, sender=Book.genres.through)
+def touch_books_on_genres_change(sender, instance, action, reverse, pk_set, **kwargs):
+    # Изменение связей книга-жанр не вызывает Book.save(), поэтому версию книг обновляем вручную
+    if action == 'pre_clear' and reverse:
+        instance._cleared_book_ids = list(Book._base_manager.filter(genres=instance).values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        book_ids = [instance.pk]
+    elif action == 'post_clear':
+        book_ids = getattr(instance, '_cleared_book_ids', [])
+    else:
+        book_ids = pk_set or []
+
+    if book_ids:
+        Book._base_manager.filter(pk__in=book_ids).update(updated_at=timezone.now())
+        transaction.on_commit(lambda: invalidate_books(book_ids), using=kwargs['using'])
+
+
+@receiver(post_save, sender=Author)
+def touch_books_on_author_change(sender, instance, created, **kwargs):
+    # Книги отдают имя автора, поэтому переименование меняет их представление (ETag, Last-Modified)
+    if not created:
+        Book._base_manager.filter(author=instance).update(updated_at=timezone.now())
+        transaction.on_commit(invalidate_all_books, using=kwargs['using'])
+
+
+@receiver(m2m_changed, sender=Book.genres.through)
+def refresh_genre_counts_on_genres_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and not reverse:
+        instance._cleared_genre_ids = list(instance.genres.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if reverse:
+        genre_ids = [instance.pk]
+    elif action == 'post_clear':
+        genre_ids = getattr(instance, '_cleared_genre_ids', [])
+    else:
+        genre_ids = pk_set or []
+
+    if genre_ids:
+        Genre.objects.filter(pk__in=genre_ids).refresh_book_counts()
+
+
+@receiver(post_save, sender=Book)
+def refresh_genre_counts_on_book_save(sender, instance, created, **kwargs):
+    # Новая книга ещё не связана с жанрами, а без смены is_deleted/is_banned счётчики не меняются
+    if created or getattr(instance, '_loaded_live', None) == instance.is_live:
+        return
+    instance._loaded_live = instance.is_live
+    Genre.objects.filter(books__pk=instance.pk).refresh_book_counts()
+
+
+@receiver(pre_delete, sender=Book)
+def remember_genres_on_book_delete(sender, instance, **kwargs):
+    # Физическое удаление (через QuerySet.delete) каскадно удаляет связи без m2m_changed
+    instance._deleted_genre_ids = list(instance.genres.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Book)
+def refresh_genre_counts_on_book_delete(sender, instance, **kwargs):
+    genre_ids = getattr(instance, '_deleted_genre_ids', [])
+    if genre_ids:
+        Genre.objects.filter(pk__in=genre_ids).refresh_book_counts()
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_cached_book(sender, instance, using, **kwargs):
+    # Сохранение, мягкое удаление (Book.delete) и бан идут через save(). Версия меняется после коммита:
+    # иначе параллельный GET успел бы закэшировать под новой версией ещё не изменённую книгу
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate_book(pk), using=using)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+def invalidate_average_price_on_book_change(sender, using, **kwargs):
+    # Как и для книг - после коммита, чтобы чтение внутри транзакции не закэшировало старое значение
+    transaction.on_commit(invalidate_average_price, using=using)
+
+
+@receiver(post_save, sender=Book)
+@receiver(post_delete, sender=Book)
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def invalidate_counts_on_change(sender, using, **kwargs):
+    transaction.on_commit(lambda: invalidate_counts(sender), using=using)
+
+
+post_migrate.connect(reset_fulltext_backend, dispatch_uid='reset_fulltext_backend')
@@ -0,0 +1,104 @@
+"""
+Тестовая база из снимка: схема строится миграциями один раз, дальше копируется из файла.
+
+SnapshotTestRunner (TEST_RUNNER) после обычного создания тестовой SQLite-базы (migrate)
+сохраняет её копию в TEST_DB_SNAPSHOT_DIR, а при следующих запусках восстанавливает тестовую
+базу из копии через sqlite3 backup вместо прогона миграций. Имя снимка - хэш файлов миграций,
+INSTALLED_APPS и версии Django: новая или изменённая миграция даёт новый снимок, старые снимки
+той же базы удаляются. Миграции не импортируют код приложения (SQL полнотекстового индекса
+зафиксирован в них самих), поэтому хэша их файлов достаточно.
+
+Для MySQL снимков нет - схему между запусками там сохраняет `manage.py test --keepdb`.
+"""
+import hashlib
+import os
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connections
+from django.db.migrations.loader import MigrationLoader
+from django.test.runner import DiscoverRunner
+
+
+def schema_fingerprint():
+    """Хэш всего, от чего зависит схема после migrate."""
+    digest = hashlib.sha256(f'{django.get_version()}:{settings.INSTALLED_APPS!r}'.encode())
+    loader = MigrationLoader(None, ignore_no_migrations=True)
+    for key, migration in sorted(loader.disk_migrations.items()):
+        digest.update(repr(key).encode())
+        digest.update(Path(sys.modules[type(migration).__module__].__file__).read_bytes())
+    return digest.hexdigest()[:16]
+
+
+class SnapshotCreationMixin:
+    """Подмешивается к DatabaseCreation SQLite-бэкенда (см. SnapshotTestRunner)."""
+
+    def snapshot_path(self):
+        return Path(settings.TEST_DB_SNAPSHOT_DIR) / f'{self.connection.alias}-{schema_fingerprint()}.sqlite3'
+
+    def create_test_db(self, verbosity=1, autoclobber=False, serialize=True, keepdb=False):
+        # --keepdb и так не пересоздаёт схему, без миграций (MIGRATE=False) снимок не нужен
+        if keepdb or self.connection.settings_dict['TEST']['MIGRATE'] is False:
+            return super().create_test_db(verbosity, autoclobber, serialize, keepdb)
+        snapshot = self.snapshot_path()
+        if snapshot.exists():
+            return self.restore_test_db(snapshot, verbosity, autoclobber, serialize)
+        test_database_name = super().create_test_db(verbosity, autoclobber, serialize, keepdb)
+        self.save_snapshot(snapshot)
+        return test_database_name
+
+    def restore_test_db(self, snapshot, verbosity, autoclobber, serialize):
+        """То же, что BaseDatabaseCreation.create_test_db(), но вместо migrate - копия снимка."""
+        test_database_name = self._get_test_db_name()
+        if verbosity >= 1:
+            self.log('Restoring test database for alias %s from %s...' % (
+                self._get_database_display_str(verbosity, test_database_name), snapshot.name))
+        self._create_test_db(verbosity, autoclobber, keepdb=False)
+
+        self.connection.close()
+        settings.DATABASES[self.connection.alias]['NAME'] = test_database_name
+        self.connection.settings_dict['NAME'] = test_database_name
+        self.connection.ensure_connection()
+        source = sqlite3.connect(snapshot)
+        try:
+            source.backup(self.connection.connection)
+        finally:
+            source.close()
+
+        if serialize:
+            self.connection._test_serialized_contents = self.serialize_db_to_string()
+        call_command('createcachetable', database=self.connection.alias)
+        return test_database_name
+
+    def save_snapshot(self, snapshot):
+        snapshot.parent.mkdir(parents=True, exist_ok=True)
+        # Через временный файл: параллельный запуск не увидит недописанный снимок
+        fd, temporary = tempfile.mkstemp(dir=snapshot.parent, suffix='.tmp')
+        os.close(fd)
+        target = sqlite3.connect(temporary)
+        try:
+            self.connection.connection.backup(target)
+        finally:
+            target.close()
+        os.replace(temporary, snapshot)
+        for old in snapshot.parent.glob(f'{self.connection.alias}-*.sqlite3'):
+            if old != snapshot:
+                old.unlink(missing_ok=True)
+
+
+class SnapshotTestRunner(DiscoverRunner):
+    """DiscoverRunner, который создаёт тестовые SQLite-базы из снимков (TEST_DB_SNAPSHOT=True)."""
+
+    def setup_databases(self, **kwargs):
+        if settings.TEST_DB_SNAPSHOT:
+            for connection in connections.all():
+                if connection.vendor == 'sqlite':
+                    creation_class = type(connection.creation)
+                    connection.creation = type(f'Snapshot{creation_class.__name__}',
+                                               (SnapshotCreationMixin, creation_class), {})(connection)
+        return super().setup_databases(**kwargs)
@@ -1,3 +1,1063 @@
-from django.test import TestCase
+import datetime
+import gzip
+import io
+import json
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.paginator import EmptyPage
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connection, connections, transaction
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APITestCase
+
+from first_app import admission, profiling
+from first_app.backends.sqlite3.base import DatabaseWrapper, WriterLock
+from first_app.cache import AVERAGE_PRICE_GENERATION_KEY, _count_key, get_average_price
+from first_app.facets import FACETS
+from first_app.factories import BookFactory, GenreFactory, PublisherFactory
+from first_app.fieldsets import parse_fieldset, select_fields
+from first_app.management.commands import archive_deleted_books
+from first_app.models.book import Author, Book, BookArchive, BookGenreArchive, Genre
+from first_app.pagination import EstimatedCountPaginator
+from first_app.routers import STICKY_COOKIE, ReplicaRouter, ReplicaRoutingMiddleware, replica_reads
+from first_app.views import BookExportView, BookListCreateView, get_date_range
+
+
+class CatalogTestCase(APITestCase):
+    """Общий locmem-кэш переживает тест, поэтому каждый тест начинает с пустого."""
+
+    def setUp(self):
+        cache.clear()
+
+
+class SearchFacetTests(CatalogTestCase):
+    """?search= вместе с фасетами: выборка поиска вложена в подзапросы фасетов."""
+
+    @classmethod
+    def setUpTestData(cls):
+        publisher_ids = PublisherFactory().create_batch(2)
+        genre_ids = GenreFactory().create_batch(3)
+        cls.author = Author.objects.create(name='Searchy Writer')
+        other = Author.objects.create(name='Other Writer')
+        BookFactory(1, author_ids=[cls.author.pk], publisher_ids=publisher_ids, genre_ids=genre_ids,
+                    genres_per_book=1).create_batch(4)
+        BookFactory(2, author_ids=[other.pk], publisher_ids=publisher_ids, genre_ids=genre_ids).create_batch(3)
+        cls.found = Book.objects.filter(author=cls.author).count()
+
+    def assert_facets(self, url):
+        for name in FACETS:
+            with self.subTest(url=url, facet=name):
+                response = self.client.get(url, {'search': 'searchy', 'facets': name})
+                self.assertEqual(response.status_code, 200, response.content)
+                self.assertEqual(response.json()['count'], self.found)
+                counts = [row['count'] for row in response.json()['facets'][name]]
+                self.assertEqual(sum(counts), self.found)
+
+    def test_search_with_every_facet(self):
+        self.assert_facets('/books/')
+
+    def test_async_search_with_every_facet(self):
+        self.assert_facets('/async/books/')
+
+    def test_search_with_all_facets(self):
+        response = self.client.get('/books/', {'search': 'searchy', 'facets': 'true'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['facets']), set(FACETS))
+        self.assertEqual(response.data['facets']['author'], [{'id': self.author.pk, 'name': 'Searchy Writer',
+                                                              'count': self.found}])
+
+
+class AuthorByNameTests(CatalogTestCase):
+    """Автор по имени создаётся только вместе с книгой, отклонённая запись авторов не оставляет."""
+
+    def test_rejected_write_does_not_create_author(self):
+        response = self.client.post('/books/', {'title': 'Typo', 'author': 'Nobody Typo Zzz',
+                                                'published_date': 'not a date', 'price': 'free'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Author.objects.filter(name='Nobody Typo Zzz').exists())
+
+    def test_create_and_update_resolve_author(self):
+        existing = Author.objects.create(name='Known Writer')
+        response = self.client.post('/books/', {'title': 'First', 'author': 'Known Writer',
+                                                'published_date': '2001-02-03', 'price': '10.00'}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        book = Book.objects.get(pk=response.data['id'])
+        self.assertEqual(book.author, existing)
+
+        response = self.client.patch(f'/books/{book.pk}/', {'author': 'New Writer'}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        book.refresh_from_db()
+        self.assertEqual(book.author.name, 'New Writer')
+        self.assertEqual(Author.objects.filter(name='New Writer').count(), 1)
+
+    def test_unique_title_author_still_validated(self):
+        Book.objects.create(title='Twice', author=Author.objects.create(name='Same'), published_date='2000-01-01')
+        response = self.client.post('/books/', {'title': 'Twice', 'author': 'Same',
+                                                'published_date': '2000-01-01'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('non_field_errors', response.data)
+
+    def test_ids_by_name_reuses_existing_authors(self):
+        existing = Author.objects.create(name='Batch Writer')
+        ids = Author.objects.ids_by_name(['Batch Writer', 'Fresh Writer', 'Fresh Writer'])
+        self.assertEqual(ids['Batch Writer'], existing.pk)
+        self.assertEqual(Author.objects.filter(name='Fresh Writer').get().pk, ids['Fresh Writer'])
+
+
+class GenreConditionalGetTests(CatalogTestCase):
+    """ETag жанров меняется вместе с book_count, а не только при правке самого жанра."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.genre = Genre.objects.get(pk=GenreFactory().create_batch(1)[0])
+        cls.book = Book.objects.get(pk=BookFactory().create_batch(1, is_deleted=False, is_banned=False)[0])
+
+    def assert_stale_after_count_change(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        self.book.genres.add(self.genre)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        return response
+
+    def test_genre_detail(self):
+        response = self.assert_stale_after_count_change(f'/genres/{self.genre.pk}/')
+        self.assertEqual(response.data['book_count'], 1)
+
+    def test_genre_list(self):
+        response = self.assert_stale_after_count_change('/genres/')
+        self.assertEqual(response.data['results'][0]['book_count'], 1)
+
+    def test_unchanged_count_keeps_etag(self):
+        url = f'/genres/{self.genre.pk}/'
+        etag = self.client.get(url)['ETag']
+        Genre.objects.all().refresh_book_counts()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+class AsyncConditionalGetTests(CatalogTestCase):
+    """Async-списки отдают те же ETag и 304, что и синхронные."""
+
+    @classmethod
+    def setUpTestData(cls):
+        GenreFactory().create_batch(2)
+        BookFactory().create_batch(3)
+
+    def test_async_lists_answer_not_modified(self):
+        for url in ('/async/books/', '/async/genres/', '/async/genres/statistic/'):
+            with self.subTest(url=url):
+                first = self.client.get(url)
+                self.assertEqual(first.status_code, 200)
+                self.assertIn('ETag', first)
+                self.assertIn('Last-Modified', first)
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+    def test_async_etag_changes_after_write(self):
+        etag = self.client.get('/async/books/')['ETag']
+        book = Book.objects.first()
+        book.price = 7
+        with self.captureOnCommitCallbacks(execute=True):
+            book.save()
+        response = self.client.get('/async/books/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class BookCollectionVersionTests(CatalogTestCase):
+    """ETag списка книг берётся из версии в кэше, которую меняют инвалидации после коммита."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book = Book.objects.get(pk=BookFactory().create_batch(1, is_deleted=False, is_banned=False)[0])
+
+    def test_not_modified_without_queries(self):
+        for url in ('/books/', '/async/books/'):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with self.assertNumQueries(0):
+                    self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_committed_writes_change_etag(self):
+        writes = [
+            lambda: Book.objects.filter(pk=self.book.pk).soft_delete(),
+            lambda: Book.all_objects.filter(pk=self.book.pk).restore(),
+            lambda: Genre.objects.create(name='Fresh genre'),
+            lambda: Author.objects.create(name='Writer').save(),
+        ]
+        for write in writes:
+            etag = self.client.get('/books/')['ETag']
+            with self.captureOnCommitCallbacks(execute=True):
+                write()
+            self.assertEqual(self.client.get("/books/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_statistic_follows_genres(self):
+        genre = Genre.objects.create(name='Counted')
+        for url in ('/genres/statistic/', '/async/genres/statistic/'):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                self.book.genres.add(genre)
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+                self.book.genres.remove(genre)
+
+
+class CompressionTests(CatalogTestCase):
+    """Сжатие обычных и потоковых ответов, в том числе через async-цепочку middleware."""
+
+    @classmethod
+    def setUpTestData(cls):
+        BookFactory().create_batch(40)
+
+    def test_streaming_export_is_gzipped(self):
+        plain = b''.join(self.client.get('/books/export.ndjson').streaming_content)
+        response = self.client.get('/books/export.ndjson', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+    def test_async_stack_compresses(self):
+        async def fetch():
+            client = AsyncClient()
+            return (await client.get('/async/books/', {'page_size': 40}),
+                    await client.get('/async/books/', {'page_size': 40}, ACCEPT_ENCODING='gzip'))
+
+        plain, compressed = async_to_sync(fetch)()
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertTrue(compressed['ETag'].startswith('W/'))
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+
+
+class CacheInvalidationTests(CatalogTestCase):
+    """Поколения средней цены и счётчиков меняются только после коммита записи."""
+
+    @classmethod
+    def setUpTestData(cls):
+        BookFactory().create_batch(5, is_deleted=False, is_banned=False)
+
+    def test_average_price_invalidated_on_commit(self):
+        before = get_average_price()
+        generation = cache.get(AVERAGE_PRICE_GENERATION_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            book = Book.objects.first()
+            book.price = 100000
+            book.save()
+            # Параллельное чтение до коммита положило бы старое значение под новое поколение
+            self.assertEqual(cache.get(AVERAGE_PRICE_GENERATION_KEY), generation)
+        self.assertNotEqual(cache.get(AVERAGE_PRICE_GENERATION_KEY), generation)
+        self.assertGreater(get_average_price(), before)
+
+    def test_counts_invalidated_on_commit(self):
+        self.assertEqual(self.client.get('/books/', {'count': 'cached'}).json()['count'], 5)
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(title='Counted', published_date='2000-01-01')
+            self.assertEqual(self.client.get('/books/', {'count': 'cached'}).json()['count'], 5)
+        self.assertEqual(self.client.get('/books/', {'count': 'cached'}).json()['count'], 6)
+
+    def test_evicted_generation_does_not_revive_old_entries(self):
+        get_average_price()
+        generation = cache.get(AVERAGE_PRICE_GENERATION_KEY)
+        cache.delete(AVERAGE_PRICE_GENERATION_KEY)
+        get_average_price()
+        self.assertNotEqual(cache.get(AVERAGE_PRICE_GENERATION_KEY), generation)
+
+
+class IngestTests(CatalogTestCase):
+    """Пакетное создание книг через POST /books/ со списком."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.genre = Genre.objects.get(pk=GenreFactory().create_batch(1)[0])
+        cls.existing = Book.objects.create(title='Taken', author=Author.objects.create(name='Holder'),
+                                           published_date='2000-01-01')
+
+    def post_batch(self, items):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/books/', items, format='json')
+
+    def test_partial_batch_reports_each_item(self):
+        response = self.post_batch([
+            {'title': 'Fresh', 'author': 'Holder', 'published_date': '2001-01-01', 'genres': [self.genre.pk]},
+            {'title': 'Taken', 'author': 'Holder', 'published_date': '2001-01-01'},
+            {'title': 'Fresh', 'author': 'Holder', 'published_date': '2001-01-01'},
+            {'title': 'Bad genre', 'author': 'Holder', 'published_date': '2001-01-01', 'genres': [10 ** 9]},
+        ])
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([result['status'] for result in response.data['results']], [201, 400, 400, 400])
+        created = Book.objects.get(pk=response.data['results'][0]['id'])
+        self.assertEqual(list(created.genres.all()), [self.genre])
+        self.genre.refresh_from_db()
+        self.assertEqual(self.genre.book_count, 1)
+
+    def test_conflict_after_check_falls_back_to_per_item(self):
+        # Строка, занятая параллельным запросом после пакетной проверки: проверка её не видит
+        with mock.patch('first_app.ingest._taken_titles', return_value=(set(), set())):
+            response = self.post_batch([
+                {'title': 'Raced one', 'author': 'Racer', 'published_date': '2001-01-01', 'genres': [self.genre.pk]},
+                {'title': 'Taken', 'author': 'Holder', 'published_date': '2001-01-01'},
+                {'title': 'Raced two', 'author': 'Racer', 'published_date': '2001-01-01'},
+            ])
+        self.assertEqual(response.status_code, 207, response.data)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], [201, 400, 201])
+        self.assertEqual(results[1]['errors'],
+                         {'non_field_errors': ['The fields title, author must make a unique set.']})
+        self.assertEqual(Book.objects.filter(author__name='Racer').count(), 2)
+        self.assertEqual(Book.objects.filter(title='Taken').count(), 1)
+        self.genre.refresh_from_db()
+        self.assertEqual(self.genre.book_count, 1)
+
+
+class ExportTests(CatalogTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        BookFactory().create_batch(3, is_deleted=False, is_banned=False)
+
+    def test_export_fields_match_book_serializer(self):
+        rows = b''.join(self.client.get('/books/export.ndjson').streaming_content).decode().splitlines()
+        self.assertEqual(len(rows), 3)
+        listed = self.client.get('/books/', {'page_size': 1}).json()['results'][0]
+        self.assertEqual(list(json.loads(rows[0])), list(listed))
+
+
+class ArchiveDeletedBooksTests(CatalogTestCase):
+    def test_archives_old_deleted_books_with_genre_links(self):
+        genre = Genre.objects.get(pk=GenreFactory().create_batch(1)[0])
+        ids = BookFactory(genre_ids=[genre.pk], genres_per_book=1).create_batch(6, is_deleted=False, is_banned=False)
+        Book.objects.filter(pk__in=ids[:4]).soft_delete()
+        Book._base_manager.filter(pk__in=ids[:3]).update(deleted_at=timezone.now() - datetime.timedelta(days=100))
+
+        # Ни одной книги не загружается целиком: по одному запросу на чтение, вставку и удаление (+ savepoint)
+        with self.assertNumQueries(9):
+            moved = archive_deleted_books.Command().archive_batch(
+                Book._base_manager.filter(is_deleted=True, deleted_at__lt=timezone.now() - datetime.timedelta(days=90)),
+                10)
+        self.assertEqual(moved, 3)
+        self.assertEqual(set(BookArchive.objects.values_list('pk', flat=True)), set(ids[:3]))
+        self.assertEqual(BookGenreArchive.objects.count(), 3)
+        self.assertEqual(set(Book._base_manager.values_list('pk', flat=True)), set(ids[3:]))
+        self.assertFalse(Book.genres.through.objects.filter(book_id__in=ids[:3]).exists())
+
+
+class PayloadFieldsTests(CatalogTestCase):
+    """Состав и порядок полей ответа не зависят от новых столбцов моделей."""
+
+    BOOK_KEYS = ['id', 'title', 'author', 'published_date', 'registered', 'managed', 'page_count', 'price',
+                 'discounted_price', 'is_banned', 'is_deleted', 'updated_at', 'deleted_at', 'publisher']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book_id = BookFactory().create_batch(1, is_deleted=False, is_banned=False)[0]
+        cls.genre_id = GenreFactory().create_batch(1)[0]
+
+    def test_book_payloads(self):
+        for url in ('/books/', '/async/books/'):
+            with self.subTest(url=url):
+                self.assertEqual(list(self.client.get(url).json()['results'][0]), self.BOOK_KEYS)
+        for url in (f'/books/{self.book_id}/', f'/async/books/{self.book_id}/'):
+            with self.subTest(url=url):
+                self.assertEqual(list(self.client.get(url).json()), self.BOOK_KEYS + ['is_discounted'])
+        response = self.client.get('/books/', {'include_related': 'true'})
+        self.assertEqual(list(response.json()['results'][0]), self.BOOK_KEYS + ['genres'])
+
+    def test_genre_payloads(self):
+        for url in ('/genres/', '/async/genres/'):
+            with self.subTest(url=url):
+                self.assertEqual(list(self.client.get(url).json()['results'][0]),
+                                 ['id', 'name', 'updated_at', 'book_count'])
+
+
+class BookCacheTests(CatalogTestCase):
+    """Кэш представлений книг (GET /books/<pk>/, /books/batch/) и его сброс после записи."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ids = BookFactory().create_batch(3, is_deleted=False, is_banned=False)
+
+    def setUp(self):
+        super().setUp()
+        self.url = f'/books/{self.ids[0]}/'
+
+    def write(self, method, url, data=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(url, data, format='json')
+
+    def test_cache_hit_needs_no_queries(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.status_code, 200)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second.json(), first.json())
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+    def test_update_invalidates_entry_and_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.write('patch', self.url, {'price': 4321}).status_code, 200)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['price'], 4321)
+        async_response = self.client.get(f'/async{self.url}')
+        self.assertEqual(async_response.json()['price'], 4321)
+
+    def test_soft_delete_and_bulk_ban_hide_cached_books(self):
+        for pk in self.ids:
+            self.assertEqual(self.client.get(f'/books/{pk}/').status_code, 200)
+        self.assertEqual(self.write('delete', self.url).status_code, 204)
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.filter(pk=self.ids[1]).set_banned(True)
+        self.assertEqual(self.client.get(f'/books/{self.ids[1]}/').status_code, 404)
+        self.assertEqual(self.client.get(f'/books/{self.ids[2]}/').status_code, 200)
+
+    def test_batch_reports_missing_and_sees_new_books(self):
+        missing = max(self.ids) + 1
+        response = self.client.get('/books/batch/', {'ids': f'{self.ids[1]},{missing},{self.ids[1]}'})
+        self.assertEqual([book['id'] for book in response.json()['results']], [self.ids[1]])
+        self.assertEqual(response.json()['missing'], [missing])
+
+        # Отсутствующий id закэширован как отсутствующий; создание книги с ним сбрасывает запись
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(pk=missing, title='Late', published_date='2000-01-01')
+        response = self.client.get('/async/books/batch/', {'ids': str(missing)})
+        self.assertEqual(response.json()['missing'], [])
+
+
+class KeysetPaginationTests(CatalogTestCase):
+    """?pagination=cursor: курсор хранит (published_date, id), страницы не сдвигаются при записи."""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Много книг с одной датой - порядок внутри даты задаёт только id
+        BookFactory(days=3).create_batch(9, is_deleted=False, is_banned=False)
+        cls.expected = list(Book.objects.order_by('published_date', 'id').values_list('pk', flat=True))
+
+    def walk(self, url, params, link='next'):
+        ids, response = [], self.client.get(url, params)
+        while True:
+            ids.extend(book['id'] for book in response.json()['results'])
+            if not response.json()[link]:
+                return ids, response
+            response = self.client.get(response.json()[link])
+
+    def test_forward_and_backward(self):
+        for url in ('/books/', '/async/books/'):
+            with self.subTest(url=url):
+                ids, last = self.walk(url, {'pagination': 'cursor', 'page_size': 2})
+                self.assertEqual(ids, self.expected)
+
+                pages, response = [], last
+                while response.json()['previous']:
+                    response = self.client.get(response.json()['previous'])
+                    pages.insert(0, [book['id'] for book in response.json()['results']])
+                self.assertEqual(sum(pages, []), self.expected[:len(sum(pages, []))])
+                self.assertEqual(len(sum(pages, [])) + len(last.json()['results']), len(self.expected))
+
+    def test_descending_ordering_adds_id_tiebreaker(self):
+        ids, _ = self.walk('/books/', {'pagination': 'cursor', 'page_size': 4, 'ordering': '-published_date'})
+        self.assertEqual(ids, list(Book.objects.order_by('-published_date', '-id').values_list('pk', flat=True)))
+
+    def test_deleting_seen_rows_does_not_skip_next_page(self):
+        first = self.client.get('/books/', {'pagination': 'cursor', 'page_size': 3}).json()
+        Book.objects.filter(pk__in=[book['id'] for book in first['results']]).soft_delete()
+        second = self.client.get(first['next']).json()
+        self.assertEqual([book['id'] for book in second['results']], self.expected[3:6])
+
+
+class GenreBookCountTests(CatalogTestCase):
+    """Genre.book_count - число живых книг жанра - поддерживается при любых изменениях книг и связей."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.genre = Genre.objects.get(pk=GenreFactory().create_batch(1)[0])
+
+    def assert_count(self, expected):
+        self.genre.refresh_from_db()
+        self.assertEqual(self.genre.book_count, expected)
+
+    def test_links_and_book_state(self):
+        books = [Book.objects.get(pk=pk) for pk in BookFactory().create_batch(3, is_deleted=False, is_banned=False)]
+        for book in books:
+            book.genres.add(self.genre)
+        self.assert_count(3)
+
+        books[0].genres.remove(self.genre)
+        self.assert_count(2)
+        self.genre.books.clear()
+        self.assert_count(0)
+        self.genre.books.add(*books)
+        self.assert_count(3)
+
+        books[1].delete()  # мягкое удаление
+        self.assert_count(2)
+        books[2].is_banned = True
+        books[2].save()
+        self.assert_count(1)
+        Book.all_objects.filter(pk=books[1].pk).restore()
+        self.assert_count(2)
+        Book.all_objects.filter(pk=books[0].pk).delete()  # физическое удаление
+        self.assert_count(1)
+
+    def test_recount_command(self):
+        BookFactory(genre_ids=[self.genre.pk], genres_per_book=1).create_batch(4, is_deleted=False, is_banned=False)
+        Genre.objects.filter(pk=self.genre.pk).update(book_count=0)
+        call_command('recount_genre_books', stdout=io.StringIO())
+        self.assert_count(4)
+
+
+class ReplicaRoutingTests(CatalogTestCase):
+    """Безопасные запросы читают с реплики, писавший клиент - с основной базы (cookie)."""
+
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch('first_app.routers.get_replicas', return_value=['replica_1'])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.factory = RequestFactory()
+        self.router = ReplicaRouter()
+
+    def routed(self, request):
+        """База чтения Book внутри middleware и ответ."""
+        seen = {}
+
+        def view(request):
+            seen['alias'] = self.router.db_for_read(Book)
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen['alias'], response
+
+    def test_safe_reads_go_to_replica(self):
+        self.assertEqual(self.routed(self.factory.get('/books/'))[0], 'replica_1')
+        # Вне запроса (команды, shell) и для чужих приложений - основная база
+        self.assertEqual(self.router.db_for_read(Book), DEFAULT_DB_ALIAS)
+        token = replica_reads.set(True)
+        try:
+            self.assertEqual(self.router.db_for_read(ContentType), DEFAULT_DB_ALIAS)
+        finally:
+            replica_reads.reset(token)
+        self.assertEqual(self.router.db_for_write(Book), DEFAULT_DB_ALIAS)
+
+    def test_writer_sticks_to_primary(self):
+        alias, response = self.routed(self.factory.post('/books/'))
+        self.assertEqual(alias, DEFAULT_DB_ALIAS)
+        cookie = response.cookies[STICKY_COOKIE]
+        self.assertEqual(int(cookie['max-age']), settings.REPLICA_STICKY_SECONDS)
+
+        request = self.factory.get('/books/')
+        request.COOKIES[STICKY_COOKIE] = cookie.value
+        self.assertEqual(self.routed(request)[0], DEFAULT_DB_ALIAS)
+        request.COOKIES[STICKY_COOKIE] = 'garbage'
+        self.assertEqual(self.routed(request)[0], 'replica_1')
+
+    def test_export_reads_replica_after_response(self):
+        with mock.patch('first_app.views.stream_books', return_value=iter(())) as stream_books:
+            request = self.factory.get('/books/export.ndjson')
+            ReplicaRoutingMiddleware(lambda request: BookExportView.as_view()(request, export_format='ndjson'))(request)
+        # Генератор выгрузки читает строки после выхода из middleware - база должна быть уже выбрана
+        self.assertEqual(stream_books.call_args.args[0].db, 'replica_1')
+
+    def test_async_chain(self):
+        seen = {}
+
+        async def view(request):
+            seen['alias'] = self.router.db_for_read(Book)
+            return HttpResponse()
+
+        middleware = ReplicaRoutingMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        async_to_sync(middleware)(self.factory.get('/books/'))
+        self.assertEqual(seen['alias'], 'replica_1')
+        response = async_to_sync(middleware)(self.factory.post('/books/'))
+        self.assertEqual(seen['alias'], DEFAULT_DB_ALIAS)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+
+
+class CountModeTests(CatalogTestCase):
+    """?count=exact|cached|estimated|none в постраничной выдаче книг."""
+
+    @classmethod
+    def setUpTestData(cls):
+        BookFactory().create_batch(7, is_deleted=False, is_banned=False)
+
+    def count_queries(self, params, url='/books/'):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        # Считаются только COUNT выборки, без прочих агрегатов
+        return response.json(), sum('AS "__count"' in query['sql'] for query in queries.captured_queries)
+
+    def test_exact_counts_every_time(self):
+        for _ in range(2):
+            data, counts = self.count_queries({'count': 'exact'})
+            self.assertEqual((data['count'], counts), (7, 1))
+
+    def test_cached_counts_once_until_write(self):
+        self.assertEqual(self.count_queries({'count': 'cached'})[0]['count'], 7)
+        self.assertEqual(self.count_queries({'count': 'cached'}), (mock.ANY, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            Book.objects.create(title='One more', published_date='2000-01-01')
+        self.assertEqual(self.count_queries({'count': 'cached'})[0]['count'], 8)
+        # Async-представление читает те же ключи кэша
+        self.assertEqual(self.count_queries({'count': 'cached'}, '/async/books/')[0]['count'], 8)
+
+    def test_cached_count_is_per_filter_and_database(self):
+        self.assertEqual(self.count_queries({'count': 'cached', 'author': 'Nobody'})[0]['count'], 0)
+        key = _count_key(Book.objects.using(DEFAULT_DB_ALIAS), 'generation')
+        self.assertIn(f':{DEFAULT_DB_ALIAS}:', key)
+        self.assertNotEqual(key, _count_key(Book.objects.using('replica_1'), 'generation'))
+
+    @override_settings(PAGINATION_COUNT_ESTIMATE_LIMIT=5)
+    def test_estimated_is_capped_and_flagged(self):
+        for url in ('/books/', '/async/books/'):
+            with self.subTest(url=url):
+                data = self.count_queries({'count': 'estimated'}, url)[0]
+                self.assertEqual((data['count'], data['count_is_estimate']), (5, True))
+
+    def test_none_has_links_only(self):
+        data = self.count_queries({'count': 'none', 'page': 2, 'page_size': 2})[0]
+        self.assertNotIn('count', data)
+        self.assertIsNotNone(data['next'])
+        self.assertIsNotNone(data['previous'])
+        self.assertEqual(self.client.get('/books/', {'count': 'none', 'page': 99}).status_code, 404)
+
+    def test_unknown_mode_is_rejected(self):
+        for url in ('/books/', '/async/books/'):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'count': 'maybe'})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('count', response.json())
+
+
+class DateRangeTests(CatalogTestCase):
+    """Выборки по году, месяцу и дню полуинтервалом [start, end) и календарь."""
+
+    @classmethod
+    def setUpTestData(cls):
+        for title, published in [('Leap', '2024-02-29'), ('March', '2024-03-01'), ('Eve', '2024-12-31'),
+                                 ('New year', '2025-01-01'), ('Also new year', '2025-01-01')]:
+            Book.objects.create(title=title, published_date=published)
+
+    def titles(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()['date'], sorted(book['title'] for book in response.json()['books'])
+
+    def test_get_date_range(self):
+        cases = [
+            (('2024',), (datetime.date(2024, 1, 1), datetime.date(2025, 1, 1))),
+            (('2024', '02'), (datetime.date(2024, 2, 1), datetime.date(2024, 3, 1))),
+            (('2024', '12'), (datetime.date(2024, 12, 1), datetime.date(2025, 1, 1))),
+            (('2024', '02', '29'), (datetime.date(2024, 2, 29), datetime.date(2024, 3, 1))),
+            (('2024', '12', '31'), (datetime.date(2024, 12, 31), datetime.date(2025, 1, 1))),
+        ]
+        for args, expected in cases:
+            with self.subTest(args=args):
+                self.assertEqual(get_date_range(*args), expected)
+
+    def test_boundaries(self):
+        self.assertEqual(self.titles('/books/year/2024/'), ('2024', ['Eve', 'Leap', 'March']))
+        self.assertEqual(self.titles('/books/2024/02/'), ('2024-02', ['Leap']))
+        self.assertEqual(self.titles('/books/2024/12/'), ('2024-12', ['Eve']))
+        self.assertEqual(self.titles('/books/2024/02/29/'), ('2024-02-29', ['Leap']))
+        self.assertEqual(self.titles('/books/2024/12/31/'), ('2024-12-31', ['Eve']))
+
+    def test_invalid_date_is_not_found(self):
+        for url in ('/books/2023/02/29/', '/books/2024/13/', '/books/2024/04/31/', '/books/year/0000/',
+                    '/async/books/2023/02/29/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_async_matches_sync(self):
+        for url in ('/books/year/2024/', '/books/2024/12/', '/books/2025/01/01/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get('/async' + url).json(), self.client.get(url).json())
+
+    def test_calendar(self):
+        response = self.client.get('/books/calendar/', {'group': 'month', 'start': '2024-03-01', 'end': '2025-02-01'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            'group': 'month',
+            'start': '2024-03-01',
+            'end': '2025-02-01',
+            'periods': [
+                {'period': '2024-03-01', 'count': 1},
+                {'period': '2024-12-01', 'count': 1},
+                {'period': '2025-01-01', 'count': 2},
+            ],
+        })
+        periods = self.client.get('/books/calendar/', {'group': 'year'}).json()['periods']
+        self.assertEqual(periods, [{'period': '2024-01-01', 'count': 3}, {'period': '2025-01-01', 'count': 2}])
+        days = self.client.get('/books/calendar/', {'end': '2024-03-01'}).json()
+        self.assertEqual((days['group'], days['periods']), ('day', [{'period': '2024-02-29', 'count': 1}]))
+
+    def test_calendar_rejects_bad_params(self):
+        for params in ({'group': 'week'}, {'start': '2024-02-30'}, {'end': 'tomorrow'}):
+            with self.subTest(params=params):
+                self.assertEqual(self.client.get('/books/calendar/', params).status_code, 400)
+
+
+class SparseFieldsTests(CatalogTestCase):
+    """?fields= и ?exclude=: состав ответа и столбцы в SELECT."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.book_id = BookFactory().create_batch(1, is_deleted=False, is_banned=False)[0]
+
+    def test_parse_fieldset(self):
+        available = ['id', 'title', 'price']
+        self.assertIsNone(parse_fieldset({}, available))
+        # Порядок - как в available, а не как в параметре
+        self.assertEqual(parse_fieldset({'fields': 'price, id'}, available), ('id', 'price'))
+        self.assertEqual(parse_fieldset({'exclude': 'title'}, available), ('id', 'price'))
+        for params in ({'fields': 'title,isbn'}, {'exclude': 'isbn'}, {'fields': 'id', 'exclude': 'price'}):
+            with self.subTest(params=params), self.assertRaises(ValidationError):
+                parse_fieldset(params, available)
+
+    def test_select_fields(self):
+        data = {'id': 1, 'title': 'Title', 'price': 5}
+        self.assertIs(select_fields(data, None), data)
+        self.assertEqual(select_fields(data, ('id', 'genres', 'price')), {'id': 1, 'price': 5})
+
+    def test_returned_keys(self):
+        cases = [
+            ('/books/', {'fields': 'title,id'}, ['id', 'title']),
+            ('/books/', {'exclude': 'updated_at,deleted_at,publisher'}, PayloadFieldsTests.BOOK_KEYS[:-3]),
+            (f'/books/{self.book_id}/', {'fields': 'is_discounted,price'}, ['price', 'is_discounted']),
+            ('/books/batch/', {'ids': str(self.book_id), 'fields': 'title'}, ['title']),
+        ]
+        for url, params, keys in cases:
+            for prefix in ('', '/async'):
+                with self.subTest(url=prefix + url, params=params):
+                    data = self.client.get(prefix + url, params).json()
+                    row = data['results'][0] if 'results' in data else data
+                    self.assertEqual(list(row), keys)
+
+    def test_bad_params_are_rejected(self):
+        for params in ({'fields': 'title,isbn'}, {'fields': 'title', 'exclude': 'price'}):
+            for url in ('/books/', f'/books/{self.book_id}/', '/async/books/', f'/async/books/{self.book_id}/'):
+                with self.subTest(url=url, params=params):
+                    response = self.client.get(url, params)
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn('fields', response.json())
+
+    def selected_columns(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url, params).status_code, 200)
+        return [query['sql'].split(' FROM ')[0] for query in queries.captured_queries
+                if 'FROM "Book"' in query['sql'] and '__count' not in query['sql']]
+
+    def test_list_reads_requested_columns(self):
+        [select] = self.selected_columns('/books/', {'fields': 'title'})
+        self.assertIn('"Book"."title"', select)
+        self.assertNotIn('"Book"."price"', select)
+        self.assertNotIn('"Book"."page_count"', select)
+
+    @override_settings(BOOK_CACHE=False)
+    def test_detail_only_pushdown(self):
+        # Первый SELECT - версия для ETag (book_version), второй - сама книга
+        select = self.selected_columns(f'/books/{self.book_id}/', {'fields': 'title'})[-1]
+        self.assertIn('"Book"."title"', select)
+        self.assertNotIn('"Book"."price"', select)
+        # is_discounted считается по обеим ценам
+        select = self.selected_columns(f'/books/{self.book_id}/', {'fields': 'is_discounted'})[-1]
+        self.assertIn('"Book"."price"', select)
+        self.assertIn('"Book"."discounted_price"', select)
+        self.assertNotIn('"Book"."title"', select)
+
+
+ADMISSION_TEST_CONFIG = {
+    'ENABLED': True,
+    'QUEUE_TIMEOUT': 0.01,
+    'RETRY_AFTER': 3,
+    'DEEP_PAGE_OFFSET': 5000,
+    'POOLS': {pool: {'CONCURRENCY': 1, 'QUEUE': 0}
+              for pool in ('ExpensiveBooksView', 'GenreViewSet', 'BookListCreateView')},
+}
+
+
+@override_settings(ADMISSION_CONTROL=ADMISSION_TEST_CONFIG)
+class AdmissionControlTests(CatalogTestCase):
+    """Пулы admission control: 503 с Retry-After при переполнении, место освобождается всегда."""
+
+    @classmethod
+    def setUpTestData(cls):
+        BookFactory().create_batch(3, is_deleted=False, is_banned=False)
+
+    def setUp(self):
+        super().setUp()
+        admission._limiters.clear()
+
+    def saturate(self, pool):
+        limiter = admission.get_limiter(pool)
+        self.assertTrue(limiter.acquire())
+        self.addCleanup(limiter.release)
+        return limiter
+
+    def test_saturated_pool_is_overloaded(self):
+        self.saturate('BookListCreateView')
+        for url in ('/books/', '/async/books/'):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'search': 'book'})
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response['Retry-After'], '3')
+                self.assertTrue(response.json()['detail'].startswith('Server is busy'))
+                # Дешёвые запросы в пул не входят
+                self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(admission.admission_stats()['BookListCreateView']['shed'], 2)
+
+    def test_pools_are_separate(self):
+        self.saturate('BookListCreateView')
+        for url in ('/books/expensive/', '/genres/statistic/', '/async/books/expensive/', '/async/genres/statistic/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 200)
+        self.saturate('GenreViewSet')
+        self.assertEqual(self.client.get('/genres/statistic/').status_code, 503)
+        self.assertEqual(self.client.get('/async/genres/statistic/').status_code, 503)
+        self.assertEqual(self.client.get('/books/expensive/').status_code, 200)
+
+    def test_slot_released_when_view_raises(self):
+        self.client.raise_request_exception = False
+        with mock.patch.object(BookListCreateView, 'filter_queryset', side_effect=RuntimeError):
+            for url in ('/books/', '/async/books/'):
+                with self.subTest(url=url):
+                    self.assertEqual(self.client.get(url, {'search': 'book'}).status_code, 500)
+                    self.assertEqual(admission.get_limiter('BookListCreateView').active, 0)
+        self.assertEqual(self.client.get('/books/', {'search': 'book'}).status_code, 200)
+
+    def test_queued_request_gets_released_slot(self):
+        limiter = self.saturate('ExpensiveBooksView')
+        limiter.queue_size = 1
+        limiter.timeout = 5
+        waiter = threading.Thread(target=lambda: self.assertTrue(limiter.acquire()))
+        waiter.start()
+        while not limiter.stats()['queue_depth']:
+            time.sleep(0.001)
+        limiter.release()
+        waiter.join()
+        self.assertEqual((limiter.active, limiter.stats()['queued']), (1, 1))
+
+
+class QueryProfilerTests(CatalogTestCase):
+    """Выборочный профиль SQL-запросов: отбор, пометки N+1 и медленных запросов, команда query_profile."""
+
+    @classmethod
+    def setUpTestData(cls):
+        GenreFactory().create_batch(2)
+
+    def profiler_settings(self, **options):
+        dump_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dump_dir)
+        config = {**settings.QUERY_PROFILER, 'ENABLED': True, 'SAMPLE_RATE': 1.0, 'FLUSH_INTERVAL': 0,
+                  'DUMP_DIR': dump_dir, **options}
+        return override_settings(QUERY_PROFILER=config)
+
+    def test_sampling_rate(self):
+        config = {'ENABLED': True, 'SAMPLE_RATE': 0.25}
+        with mock.patch('first_app.profiling.random.random', side_effect=[0.2, 0.3]):
+            self.assertEqual([profiling.is_sampled(config), profiling.is_sampled(config)], [True, False])
+        self.assertFalse(profiling.is_sampled({'ENABLED': True, 'SAMPLE_RATE': 0.0}))
+        self.assertFalse(profiling.is_sampled({'ENABLED': False, 'SAMPLE_RATE': 1.0}))
+
+        with self.profiler_settings(SAMPLE_RATE=0.0), self.assertNoLogs('first_app.query_profiler'):
+            self.client.get('/genres/')
+
+    def test_duplicate_and_slow_flags(self):
+        config = {'SLOW_QUERY_MS': 100, 'DUPLICATE_THRESHOLD': 3}
+        queries = [('SELECT slow', 150.0), *[('SELECT one', 1.0)] * 3, *[('SELECT twice', 1.0)] * 2]
+        profile = profiling.build_profile(RequestFactory().get('/books/'), HttpResponse(), queries, config)
+        self.assertEqual(profile['query_count'], 6)
+        self.assertEqual(profile['query_time_ms'], 155.0)
+        self.assertEqual(profile['slow'], [{'sql': 'SELECT slow', 'duration_ms': 150.0}])
+        self.assertEqual(profile['duplicates'], [{'sql': 'SELECT one', 'count': 3}])
+
+    def test_profiles_every_query_of_request(self):
+        async def fetch():
+            return await AsyncClient().get('/async/genres/')
+
+        for url, get in (('/genres/', self.client.get), ('/async/genres/', lambda url: async_to_sync(fetch)())):
+            with self.subTest(url=url), self.profiler_settings():
+                with CaptureQueriesContext(connection) as queries, \
+                        self.assertLogs('first_app.query_profiler') as logs:
+                    self.assertEqual(get(url).status_code, 200)
+                [record] = logs.records
+                self.assertEqual((record.profile['path'], record.profile['status']), (url, 200))
+                self.assertEqual([query['sql'] for query in record.profile['queries']],
+                                 [query['sql'] for query in queries.captured_queries])
+
+    def test_command_output(self):
+        with self.profiler_settings(SLOW_QUERY_MS=0, DUPLICATE_THRESHOLD=1):
+            profiling.start_listener()
+            try:
+                self.assertEqual(self.client.get('/genres/').status_code, 200)
+            finally:
+                profiling.stop_listener()
+
+            out = io.StringIO()
+            call_command('query_profile', '--json', stdout=out)
+            summary = json.loads(out.getvalue())
+            self.assertEqual(summary['requests'], 1)
+            [view] = summary['views']
+            self.assertEqual((view['view'], view['requests']), ('genre-list', 1))
+            self.assertEqual(len(summary['slow_queries']), view['queries'])
+            self.assertTrue(all(item['views'] == ['genre-list'] for item in summary['duplicate_queries']))
+
+            out = io.StringIO()
+            call_command('query_profile', '--clear', stdout=out)
+            self.assertIn('Profiled requests: 1', out.getvalue())
+            self.assertIn(f"genre-list: 1 requests, {view['avg_queries']} queries/request", out.getvalue())
+            self.assertEqual(list(profiling.get_dump_dir().iterdir()), [])
+
+
+class SQLiteWriterLockTests(CatalogTestCase):
+    """Блокировка писателя в first_app.backends.sqlite3: кто её берёт и когда она освобождается."""
+
+    alias = 'writer_lock_test'
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = f'{directory}/db.sqlite3'
+        self.db = DatabaseWrapper({**connection.settings_dict, 'ENGINE': 'first_app.backends.sqlite3',
+                                   'NAME': self.path, 'OPTIONS': {'timeout': 0.05}}, alias=self.alias)
+        connections[self.alias] = self.db
+        self.addCleanup(connections.__delitem__, self.alias)
+        self.addCleanup(self.db.close)
+        self.db.cursor().execute('CREATE TABLE item (name TEXT)')
+        self.lock = self.db.writer_lock
+        self.acquire = mock.patch.object(self.lock, 'acquire', wraps=self.lock.acquire).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def assert_released(self):
+        self.assertFalse(self.db.writer_lock_held)
+        self.assertFalse(self.lock.thread_lock.locked())
+
+    def test_autocommit_write_takes_lock(self):
+        self.db.cursor().execute("INSERT INTO item VALUES ('one')")
+        self.db.cursor().execute('SELECT * FROM item')
+        self.assertEqual(self.acquire.call_count, 1)
+        self.assert_released()
+
+    def test_released_on_commit(self):
+        with transaction.atomic(using=self.alias):
+            self.assertTrue(self.lock.thread_lock.locked())
+            # Запись внутри транзакции блокировку повторно не берёт
+            self.db.cursor().execute("INSERT INTO item VALUES ('one')")
+            self.db.cursor().execute("INSERT INTO item VALUES ('two')")
+        self.assertEqual(self.acquire.call_count, 1)
+        self.assert_released()
+
+    def test_released_on_rollback(self):
+        with self.assertRaises(ZeroDivisionError), transaction.atomic(using=self.alias):
+            self.db.cursor().execute("INSERT INTO item VALUES ('one')")
+            1 / 0
+        self.assert_released()
+        self.assertEqual(self.db.cursor().execute('SELECT COUNT(*) FROM item').fetchone(), (0,))
+
+    def test_released_on_close(self):
+        self.db.acquire_writer_lock()
+        self.db.close()
+        self.assert_released()
+
+    def test_released_when_begin_fails(self):
+        with mock.patch('django.db.backends.sqlite3.base.DatabaseWrapper._start_transaction_under_autocommit',
+                        side_effect=OperationalError('disk I/O error')):
+            with self.assertRaises(OperationalError), transaction.atomic(using=self.alias):
+                pass
+        self.assert_released()
+
+    def test_timeout_raises(self):
+        self.db.acquire_writer_lock()
+        self.addCleanup(self.db.release_writer_lock)
+        # Та же блокировка ждёт threading.Lock (он не реентерабельный), другая на том же файле - flock
+        for lock in (self.lock, WriterLock(self.path)):
+            with self.subTest(lock=lock), self.assertRaisesMessage(OperationalError, 'writer queue timeout'):
+                lock.acquire(0.05)
+
+
+class AsyncFilterTests(CatalogTestCase):
+    """Фильтры async-списка, которые ходят в БД, выполняются в общем потоке ORM, а не в отдельных потоках."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.publisher_id = PublisherFactory().create_batch(1)[0]
+        BookFactory(publisher_ids=[cls.publisher_id]).create_batch(3, is_deleted=False, is_banned=False)
+
+    def test_sync_filters_use_request_connection(self):
+        async def fetch():
+            return await AsyncClient().get('/async/books/', {'publisher': self.publisher_id, 'ordering': '-price'})
+
+        with CaptureQueriesContext(connection) as queries:
+            response = async_to_sync(fetch)()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 3)
+        # Проверка publisher в ModelChoiceFilter - на том же соединении, что и остальные запросы:
+        # соединение отдельного потока пула не закрылось бы по request_finished
+        self.assertTrue(any(query['sql'].startswith('SELECT "first_app_publisher"."id"')
+                            for query in queries.captured_queries), queries.captured_queries)
+
+
+class EstimatedCountPaginatorTests(CatalogTestCase):
+    """Paginator админки: страницы за оценкой числа книг остаются доступными."""
+
+    @classmethod
+    def setUpTestData(cls):
+        BookFactory().create_batch(7, is_deleted=False, is_banned=False)
+
+    @override_settings(PAGINATION_COUNT_ESTIMATE_LIMIT=3)
+    def test_page_beyond_estimate_counts_exactly(self):
+        paginator = EstimatedCountPaginator(Book.objects.order_by('id'), 2)
+        self.assertEqual((paginator.count, paginator.num_pages), (3, 2))
+        # Точный COUNT и сама страница
+        with self.assertNumQueries(2):
+            books = list(paginator.page(4))
+        self.assertEqual((paginator.count, paginator.num_pages), (7, 4))
+        self.assertEqual([book.pk for book in books], list(Book.objects.order_by('id').values_list('pk', flat=True))[6:])
+        with self.assertRaises(EmptyPage):
+            paginator.page(5)
+
+    def test_exact_count_not_needed_within_estimate(self):
+        paginator = EstimatedCountPaginator(Book.objects.order_by('id'), 2)
+        # Оценка и сама страница
+        with self.assertNumQueries(2):
+            self.assertEqual(len(paginator.page(4)), 1)
+        self.assertTrue(paginator.estimated)
+
+
+class FactoryTests(CatalogTestCase):
+    """Фабрики: согласованные поля удаления и сброс кэшей после коммита загрузки."""
+
+    def test_deleted_books_have_deleted_at(self):
+        books = BookFactory(seed=7).build_batch(500)
+        self.assertTrue(any(book.is_deleted for book in books))
+        self.assertTrue(all(book.is_deleted == (book.deleted_at is not None) for book in books))
+        self.assertIsNotNone(BookFactory().build(is_deleted=True).deleted_at)
+        self.assertTrue(all(book.deleted_at is None for book in BookFactory(seed=7).build_batch(500, is_deleted=False)))
+
+    def test_caches_invalidated_on_commit(self):
+        Book.objects.create(title='Existing', published_date='2000-01-01', price=10)
+        self.assertEqual(get_average_price(), 10)
+        with self.captureOnCommitCallbacks() as callbacks:
+            BookFactory().create_batch(1, price=30, is_deleted=False, is_banned=False)
+            self.assertEqual(get_average_price(), 10)
+        self.assertEqual(len(callbacks), 4)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(get_average_price(), 20)
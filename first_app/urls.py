@@ -1,22 +1,45 @@
 from django.urls import path, include, re_path
 from rest_framework import routers
 from .views import *
+from . import async_views
 
 router = routers.DefaultRouter()
 router.register(r'genres', GenreViewSet)
 # router.register(r'genres', GenreReadOnlyViewSet)
 # router.register(r'genres', GenreListDetailUpdateViewSet)
 
+# Те же read-эндпоинты на async ORM; имеет смысл запускать под ASGI (uvicorn config.asgi:application)
+async_urlpatterns = [
+    path('books/', async_views.book_list_view, name='async-book-list'),
+    path('books/<int:pk>/', async_views.book_detail_view, name='async-book-detail'),
+    path('books/batch/', async_views.book_batch_view, name='async-book-batch'),
+    path('books/expensive/', async_views.expensive_books_view, name='async-book-expensive'),
+    re_path(r'^books/year/(?P<year>\d{4})/$', async_views.books_by_date_view, name='async-books-by-year'),
+    re_path(r'^books/(?P<year>\d{4})/(?P<month>\d{2})/$', async_views.books_by_date_view, name='async-books-by-month'),
+    re_path(r'^books/(?P<year>\d{4})/(?P<month>\d{2})/(?P<day>\d{2})/$', async_views.books_by_date_view,
+            name='async-books-by-date'),
+    path('genres/', async_views.genre_list_view, name='async-genre-list'),
+    path('genres/statistic/', async_views.genre_statistic_view, name='async-genre-statistic'),
+]
+
 urlpatterns = [
+    path('async/', include(async_urlpatterns)),
     # path('genres/', GenreListCreateView.as_view(), name='genres'),
     # path('genres/<str:genre_name>/', GenreDetailUpdateDeleteView.as_view(), name='genres-detail'),
     path('books/', BookListCreateView.as_view(), name='book-list-create'),
     path('books/<int:pk>/', BookDetailUpdateDeleteView.as_view(), name='book-detail-update-delete'),
+    path('books/batch/', BookBatchView.as_view(), name='book-batch'),
     path('books/expensive/', ExpensiveBooksView.as_view(), name='book-expensive'),
+    re_path(r'^books/export\.(?P<export_format>ndjson|csv)$', BookExportView.as_view(), name='book-export'),
     # path('books/', book_list_create, name='book-list-create'),  # Для получения всех книг и создания новой книги
     # path('books/<int:pk>/', book_detail_update_delete, name='book-detail-update-delete'),  # Для операций с одной книгой
     # path('books/', BookListView.as_view(), name='book-list-create'),
     # path('books/<int:pk>/', BookDetailUpdateDeleteView.as_view(), name='book-detail-update-delete'),
+    # /books/YYYY/ занят детальным маршрутом books/<int:pk>/, поэтому год - под отдельным префиксом
+    re_path(r'^books/year/(?P<year>\d{4})/$', books_by_date_view, name='books-by-year'),
+    re_path(r'^books/(?P<year>\d{4})/(?P<month>\d{2})/$', books_by_date_view, name='books-by-month'),
     re_path(r'^books/(?P<year>\d{4})/(?P<month>\d{2})/(?P<day>\d{2})/$', books_by_date_view, name='books-by-date'),
+    path('books/calendar/', books_calendar_view, name='books-calendar'),
+    path('admission/', admission_stats_view, name='admission-stats'),
     path('', include(router.urls)),
 ]
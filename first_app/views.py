@@ -1,17 +1,89 @@
-from django.db.models import Avg, Count
+import datetime
+import os
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count, F
+from django.db.models.functions import TruncMonth, TruncYear
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
 from django_filters.rest_framework import DjangoFilterBackend
-from rest_framework.filters import OrderingFilter, SearchFilter
+from rest_framework.filters import OrderingFilter
 from rest_framework.decorators import api_view, action
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import GenericAPIView, ListCreateAPIView, RetrieveUpdateDestroyAPIView, ListAPIView
 from rest_framework.pagination import PageNumberPagination, LimitOffsetPagination, CursorPagination
-
+from rest_framework.settings import api_settings
+
+from .admission import AdmissionControlMixin, admission_stats
+from .cache import get_average_price, get_cached_book, get_cached_books
+from .conditional import (conditional_get, book_collection_version, book_version, genre_collection_version,
+                          genre_version)
+from .export import CONTENT_TYPES, stream_books
+from .facets import compute_facets, parse_facets
+from .fieldsets import READ_METHODS, get_requested_fields, restrict_queryset, select_fields
+from .filters import BookFilter, FullTextSearchFilter
+from .ingest import ingest_books
+from .pagination import BookKeysetPagination, CachedCountPagination, ExpensiveBooksPagination
+from .parsers import NDJSONParser
 from .serializers import BookListSerializer, BookDetailSerializer, BookCreateSerializer, GenreSerializer
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, generics, viewsets, mixins
 from .models.book import *
-from .serializers import BookSerializer
+from .serializers import BookSerializer, BookRowSerializer
+
+
+class SparseFieldsetMixin:
+    """
+    ?fields= / ?exclude= для GET (см. first_app/fieldsets.py): выбранные поля передаются
+    сериализатору в context['fields']. extra_fields - ключи, которые представление добавляет к ответу само.
+    """
+    extra_fields = ()
+
+    def get_requested_fields(self):
+        if not hasattr(self, '_requested_fields'):
+            self._requested_fields = get_requested_fields(self.request, self.get_serializer_class(),
+                                                          self.extra_fields)
+        return self._requested_fields
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        fields = self.get_requested_fields()
+        if fields is not None:
+            context['fields'] = fields
+        return context
+
+
+class BookRowListMixin:
+    """
+    list() через BookRowSerializer: фильтры и пагинация работают как обычно,
+    но страница читается как values_list-строки без создания экземпляров Book.
+    """
+
+    def get_row_serializer(self):
+        key_columns = ['id']
+        if isinstance(self.paginator, BookKeysetPagination):
+            # Курсор строится по столбцам сортировки, даже если клиент не запросил их в ?fields=
+            key_columns += [field.lstrip('-') for field in self.paginator.ordering]
+            ordering_fields = getattr(self, 'ordering_fields', None) or ()
+            if not isinstance(ordering_fields, str):
+                key_columns += ordering_fields
+        return BookRowSerializer(context=self.get_serializer_context(), key_columns=key_columns)
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_row_serializer()
+        filtered = self.filter_queryset(self.get_queryset())
+        queryset = serializer.get_queryset(filtered)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            response = self.get_paginated_response(serializer.to_representation_many(page))
+            self.extend_page_data(response.data, filtered)
+            return response
+        return Response(serializer.to_representation_many(queryset))
+
+    def extend_page_data(self, data, queryset):
+        """Точка расширения: дополнительные ключи в ответе страницы по отфильтрованной выборке."""
 
 
 class GenreListDetailUpdateViewSet(viewsets.GenericViewSet, mixins.ListModelMixin,
@@ -25,20 +97,41 @@ class GenreReadOnlyViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = GenreSerializer
 
 
-class GenreViewSet(viewsets.ModelViewSet):
+class GenreViewSet(AdmissionControlMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Genre.objects.all()
     serializer_class = GenreSerializer
 
+    def get_admission_pool(self, request):
+        # Ограничивается только статистика по всем жанрам
+        return super().get_admission_pool(request) if self.action == 'statistic' else None
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            # Из БД читаются только столбцы выбранных полей
+            queryset = restrict_queryset(queryset, self.get_serializer())
+        return queryset
+
+    @conditional_get(genre_collection_version)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @conditional_get(genre_version)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
     @action(detail=False, methods=['get'])
+    @conditional_get(genre_collection_version)
     def statistic(self, request):
-        genres_with_book_counts = Genre.objects.annotate(book_count=Count('books'))
+        # book_count поддерживается сигналами (см. first_app/signals.py), поэтому хватает одного чтения
+        genres_with_book_counts = Genre.objects.values_list('id', 'name', 'book_count')
         data = [
             {
-                "id": genre.id,
-                "genre": genre.name,
-                "book_count": genre.book_count
+                "id": genre_id,
+                "genre": name,
+                "book_count": book_count
             }
-            for genre in genres_with_book_counts
+            for genre_id, name, book_count in genres_with_book_counts
         ]
         return Response(data)
 
@@ -56,7 +149,7 @@ class GenreViewSet(viewsets.ModelViewSet):
 #     lookup_url_kwarg = 'genre_name'  # Указывает параметр URL 'genre_name' для получения значения
 
 
-class BookPagination(PageNumberPagination):
+class BookPagination(CachedCountPagination):
     page_size = 5  # Количество элементов на странице
     page_size_query_param = 'page_size'
     max_page_size = 100
@@ -67,17 +160,54 @@ class BookPagination(PageNumberPagination):
 #     ordering = 'published_date'
 
 
-class BookListCreateView(ListCreateAPIView):
-    queryset = Book.objects.select_related('publisher').prefetch_related('genres').all()
+class BookListCreateView(AdmissionControlMixin, SparseFieldsetMixin, BookRowListMixin, ListCreateAPIView):
+    queryset = Book.objects.select_related('publisher', 'author').prefetch_related('genres').all()
     serializer_class = BookSerializer
     pagination_class = BookPagination
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
-    filterset_fields = ['author', 'publisher']
-    search_fields = ['title', 'author', 'published_date']
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, OrderingFilter]
+    filterset_class = BookFilter
+    search_fields = ['title', 'author__name', 'published_date']
     ordering_fields = ['published_date', 'price']
+    # NDJSON - для пакетной загрузки (см. create_batch)
+    parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, NDJSONParser]
+
+    @property
+    def paginator(self):
+        # Keyset-режим включается параметром ?pagination=cursor или настройкой BOOKS_PAGINATION
+        if not hasattr(self, '_paginator'):
+            mode = self.request.query_params.get('pagination', settings.BOOKS_PAGINATION)
+            if mode == 'cursor':
+                self._paginator = BookKeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+    def get_admission_pool(self, request):
+        # Ограничиваются только дорогие чтения: поиск, фасеты и глубокие страницы (большой OFFSET)
+        if request.method not in READ_METHODS:
+            return None
+        params = request.query_params
+        offset = self.paginator.get_offset(request) if isinstance(self.paginator, CachedCountPagination) else 0
+        if (params.get(api_settings.SEARCH_PARAM) or params.get('facets')
+                or offset >= settings.ADMISSION_CONTROL['DEEP_PAGE_OFFSET']):
+            return super().get_admission_pool(request)
+        return None
+
+    @conditional_get(book_collection_version)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    def extend_page_data(self, data, queryset):
+        # ?facets=true или ?facets=publisher,genre - счётчики по текущей выборке рядом со страницей
+        facets = parse_facets(self.request.query_params.get('facets'))
+        if facets:
+            data['facets'] = compute_facets(queryset, facets)
 
     # Добавление кастомной логики перед сохранением
     def create(self, request, *args, **kwargs):
+        # Массив JSON или NDJSON - пакетная загрузка
+        if isinstance(request.data, list):
+            return self.create_batch(request)
         # Получение данных из запроса
         data = request.data.copy()
         # Кастомная логика: Установка значения по умолчанию для автора, если не указан
@@ -88,40 +218,132 @@ class BookListCreateView(ListCreateAPIView):
         self.perform_create(serializer)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def create_batch(self, request):
+        items = request.data
+        if len(items) > settings.BOOKS_BULK_MAX_ITEMS:
+            return Response({'error': f'Batch cannot contain more than {settings.BOOKS_BULK_MAX_ITEMS} books'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = ingest_books(items)
+        created = sum(1 for result in results if result['status'] == status.HTTP_201_CREATED)
+        if created == len(results):
+            response_status = status.HTTP_201_CREATED
+        elif created == 0:
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_207_MULTI_STATUS
+        return Response({'created': created, 'failed': len(results) - created, 'results': results},
+                        status=response_status)
+
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context['include_related'] = self.request.query_params.get('include_related', 'false').lower() == 'true'
         return context
 
 
-class BookDetailUpdateDeleteView(RetrieveUpdateDestroyAPIView):
-    queryset = Book.objects.all()
+class BookExportView(GenericAPIView):
+    """
+    Потоковая выгрузка всех живых книг в NDJSON или CSV с теми же фильтрами, что и /books/.
+    Строки читаются порциями через iterator(), поэтому память не зависит от размера каталога.
+    """
+    queryset = Book.objects.filter(is_banned=False)
+    filter_backends = BookListCreateView.filter_backends
+    filterset_class = BookListCreateView.filterset_class
+    search_fields = BookListCreateView.search_fields
+    ordering_fields = BookListCreateView.ordering_fields
+
+    def get(self, request, export_format, *args, **kwargs):
+        # База выбирается сейчас: строки читаются уже после middleware, когда чтение с реплики выключено
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.using(queryset.db)
+        response = StreamingHttpResponse(
+            stream_books(queryset, export_format, settings.BOOKS_EXPORT_CHUNK_SIZE),
+            content_type=CONTENT_TYPES[export_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="books.{export_format}"'
+        return response
+
+
+def is_discounted(book):
+    """Цена со скидкой меньше цены; book - экземпляр Book или строка values_list с price и discounted_price."""
+    if book.discounted_price is not None and book.price is not None:
+        return book.discounted_price < book.price
+    return False
+
+
+def book_not_found(pk):
+    return NotFound(detail=f"Book with id '{pk}' not found or is banned.")
+
+
+def build_book_entries(queryset, pks, request):
+    """
+    Записи кэша книг (first_app/cache.py, get_cached_books): полное представление книги
+    со всеми полями и is_discounted и её updated_at. Одним запросом, с основной базы:
+    копия с отстающей реплики прожила бы в кэше весь таймаут.
+    """
+    books = list(queryset.using(DEFAULT_DB_ALIAS).filter(pk__in=pks, is_banned=False))
+    # Без контекста представления: в нём ?fields=, а в кэше лежат все поля
+    serializer = BookSerializer(books, many=True, context={'request': request})
+    entries = {}
+    for book, data in zip(books, serializer.data):
+        data = dict(data)
+        data['is_discounted'] = is_discounted(book)
+        entries[book.pk] = {'data': data, 'updated_at': book.updated_at}
+    return entries
+
+
+class BookDetailUpdateDeleteView(SparseFieldsetMixin, RetrieveUpdateDestroyAPIView):
+    queryset = Book.objects.select_related('author')
     serializer_class = BookSerializer
+    extra_fields = ('is_discounted',)
 
     def get_object(self):
         # Получение параметра pk из URL
         pk = self.kwargs.get('pk')
 
+        queryset = self.queryset
+        if self.request.method in READ_METHODS:
+            # Только столбцы выбранных полей; для is_discounted нужны обе цены
+            fields = self.get_requested_fields()
+            prices = ('price', 'discounted_price') if fields is None or 'is_discounted' in fields else ()
+            queryset = restrict_queryset(queryset, self.get_serializer(), prices)
+
         # Попытка найти объект по pk, исключая запрещенные
         try:
-            book = self.queryset.get(pk=pk, is_banned=False)
+            book = queryset.get(pk=pk, is_banned=False)
         except Book.DoesNotExist:
             # Обработка ошибки, если объект не найден или запрещен
-            raise NotFound(detail=f"Book with id '{pk}' not found or is banned.")
+            raise book_not_found(pk)
 
         return book
 
+    def get_cached_book(self):
+        # Одна запись кэша на запрос: из неё берутся и версия для ETag, и тело ответа
+        if not hasattr(self, '_cached_book'):
+            self._cached_book = get_cached_book(self.kwargs.get('pk'), self.build_cached_books)
+        return self._cached_book
+
+    def build_cached_books(self, pks):
+        return build_book_entries(self.queryset, pks, self.request)
+
     # Переопределение метода для добавления кастомной логики
+    @conditional_get(book_version)
     def retrieve(self, request, *args, **kwargs):
-        response = super().retrieve(request, *args, **kwargs)
+        fields = self.get_requested_fields()
+        if settings.BOOK_CACHE:
+            entry = self.get_cached_book()
+            if entry is None:
+                raise book_not_found(self.kwargs.get('pk'))
+            return Response(select_fields(entry['data'], fields))
+
+        instance = self.get_object()
+        data = self.get_serializer(instance).data
 
         # Добавление поля к ответу, проверяющего, что цена со скидкой меньше цены
-        if response.data.get('discounted_price') is not None and response.data.get('price') is not None:
-            response.data['is_discounted'] = response.data['discounted_price'] < response.data['price']
-        else:
-            response.data['is_discounted'] = False
+        if fields is None or 'is_discounted' in fields:
+            data['is_discounted'] = is_discounted(instance)
 
-        return response
+        return Response(data)
 
     # Добавление кастомной проверки перед обновлением
     def update(self, request, *args, **kwargs):
@@ -146,18 +368,81 @@ class BookDetailUpdateDeleteView(RetrieveUpdateDestroyAPIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class ExpensiveBooksView(ListAPIView):
+class BookBatchView(SparseFieldsetMixin, GenericAPIView):
+    """
+    Несколько книг одним запросом: GET /books/batch/?ids=3,1,2. Книги - в порядке ids
+    в том же виде, что у /books/<pk>/ (с is_discounted), ненайденные, удалённые и забаненные
+    id - в missing. Поддерживаются ?fields=/?exclude= и ?include_related=true (названия жанров).
+    """
+    queryset = Book.objects.select_related('author')
+    serializer_class = BookSerializer
+    extra_fields = ('is_discounted',)
+    ids_query_param = 'ids'
+
+    def get_ids(self):
+        value = self.request.query_params.get(self.ids_query_param, '')
+        try:
+            ids = [int(pk) for pk in value.split(',') if pk.strip()]
+        except ValueError:
+            raise ValidationError({self.ids_query_param: ['Must be a comma-separated list of integers.']})
+        # Повторы отдаются один раз, на месте первого
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            raise ValidationError({self.ids_query_param: ['This parameter is required.']})
+        if len(ids) > settings.BOOKS_BATCH_MAX_IDS:
+            raise ValidationError({self.ids_query_param: [f'At most {settings.BOOKS_BATCH_MAX_IDS} ids per request.']})
+        return ids
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['include_related'] = self.request.query_params.get('include_related', 'false').lower() == 'true'
+        return context
+
+    def build_cached_books(self, pks):
+        return build_book_entries(self.queryset, pks, self.request)
+
+    def get_books(self, ids):
+        """{pk: представление} выбранных полей одним запросом; жанры - одним prefetch, если они нужны."""
+        fields = self.get_requested_fields()
+        prices = ('price', 'discounted_price') if fields is None or 'is_discounted' in fields else ()
+        queryset = restrict_queryset(self.get_queryset(), self.get_serializer(), prices)
+        books = list(queryset.filter(pk__in=ids, is_banned=False))
+        found = {}
+        for book, data in zip(books, self.get_serializer(books, many=True).data):
+            if prices:
+                data['is_discounted'] = is_discounted(book)
+            found[book.pk] = data
+        return found
+
+    def batch_response_data(self, ids, found):
+        fields = self.get_requested_fields()
+        return {
+            'results': [select_fields(found[pk], fields) for pk in ids if pk in found],
+            'missing': [pk for pk in ids if pk not in found],
+        }
+
+    def get(self, request, *args, **kwargs):
+        ids = self.get_ids()
+        # Представления без жанров - из кэша книг (как у /books/<pk>/), промахи читаются одним запросом
+        if settings.BOOK_CACHE and not self.get_serializer_context()['include_related']:
+            found = {pk: entry['data'] for pk, entry in get_cached_books(ids, self.build_cached_books).items()}
+        else:
+            found = self.get_books(ids)
+        return Response(self.batch_response_data(ids, found))
+
+
+class ExpensiveBooksView(AdmissionControlMixin, SparseFieldsetMixin, BookRowListMixin, ListAPIView):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
+    pagination_class = ExpensiveBooksPagination
 
-    def list(self, request, *args, **kwargs):
-        # Вычисление средней цены
-        average_price = Book.objects.aggregate(average_price=Avg('price'))['average_price']
-        # Получение книг с ценой выше средней
-        queryset = Book.objects.filter(price__gt=average_price)
-        # Сериализация данных
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+    def get_queryset(self):
+        # Средняя цена берётся из кэша (сбрасывается сигналами при изменении книг),
+        # поэтому на странице остаётся один диапазонный запрос по индексу цены
+        average_price = get_average_price()
+        if average_price is None:
+            return Book.objects.none()
+        return super().get_queryset().filter(price__gt=average_price)
 
 
 # class BookListCreateView(GenericAPIView):
@@ -332,8 +617,85 @@ class BookListView(APIView, PageNumberPagination):
         return self.page_size  # Использование значения по умолчанию
 
 
+def get_date_range(year, month=None, day=None):
+    """
+    Полуинтервал [start, end) для года, месяца или дня. В отличие от
+    published_date__year/__month/__day, такое сравнение может использовать индекс по дате.
+    """
+    try:
+        year = int(year)
+        if day is not None:
+            start = datetime.date(year, int(month), int(day))
+            end = start + datetime.timedelta(days=1)
+        elif month is not None:
+            start = datetime.date(year, int(month), 1)
+            end = datetime.date(year + 1, 1, 1) if start.month == 12 else datetime.date(year, start.month + 1, 1)
+        else:
+            start = datetime.date(year, 1, 1)
+            end = datetime.date(year + 1, 1, 1)
+    except (ValueError, OverflowError):
+        raise NotFound(detail='Invalid date.')
+    return start, end
+
+
+@api_view(['GET'])
+def books_by_date_view(request, year, month=None, day=None):
+    start, end = get_date_range(year, month, day)
+    books = Book.objects.filter(published_date__gte=start, published_date__lt=end)
+    fields = get_requested_fields(request, BookSerializer)
+    serializer = BookRowSerializer(context={'fields': fields} if fields is not None else None)
+    date = '-'.join(part for part in (year, month, day) if part is not None)
+    return Response({'date': date, 'books': serializer.to_representation_many(serializer.get_queryset(books))})
+
+
+@api_view(['GET'])
+def admission_stats_view(request):
+    """Счётчики пулов admission control (first_app/admission.py) этого процесса."""
+    return Response({'pid': os.getpid(), 'pools': admission_stats()})
+
+
+# Группировка для календаря; день - это само значение published_date
+CALENDAR_GROUPS = {
+    'day': None,
+    'month': TruncMonth,
+    'year': TruncYear,
+}
+
+
 @api_view(['GET'])
-def books_by_date_view(request, year, month, day):
-    books = Book.objects.filter(published_date__year=year, published_date__month=month, published_date__day=day)
-    serializer = BookSerializer(books, many=True)
-    return Response({'date': f"{year}-{month}-{day}", 'books': serializer.data})
+def books_calendar_view(request):
+    """
+    Гистограмма числа книг по дням, месяцам или годам одним GROUP BY-запросом.
+    Параметры: group=day|month|year, start и end (YYYY-MM-DD, end не включается).
+    """
+    group = request.query_params.get('group', 'day')
+    if group not in CALENDAR_GROUPS:
+        raise ValidationError({'group': [f'Must be one of: {", ".join(CALENDAR_GROUPS)}.']})
+
+    bounds = {}
+    for name in ('start', 'end'):
+        value = request.query_params.get(name)
+        if value:
+            try:
+                bounds[name] = parse_date(value)
+            except ValueError:
+                bounds[name] = None
+            if bounds[name] is None:
+                raise ValidationError({name: ['Date has wrong format. Use YYYY-MM-DD.']})
+
+    books = Book.objects.order_by()
+    if 'start' in bounds:
+        books = books.filter(published_date__gte=bounds['start'])
+    if 'end' in bounds:
+        books = books.filter(published_date__lt=bounds['end'])
+
+    trunc = CALENDAR_GROUPS[group]
+    period = F('published_date') if trunc is None else trunc('published_date')
+    rows = books.values(period=period).annotate(count=Count('id')).order_by('period').values_list('period', 'count')
+
+    return Response({
+        'group': group,
+        'start': request.query_params.get('start'),
+        'end': request.query_params.get('end'),
+        'periods': [{'period': period.isoformat(), 'count': count} for period, count in rows],
+    })